@@ -13,88 +13,181 @@
 #    You should have received a copy of the GNU Lesser General Public
 #    License along with DEAP. If not, see <http://www.gnu.org/licenses/>.
 
+import os
 import random
 import numpy
 import sys
-import pymop.factory
+import yaml
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from moea_d import MOEAD
+from evaluation import from_config
+from archive import ParetoArchive
+from problems import get_problem, individual_class
+from population import cx_simulated_binary_bounded, mut_polynomial_bounded
+from profiling import PhaseTimer, Profiler, Trace
+from accumulator import PopulationStatistics
+from cache import cache_from_config
+from sampling import IndexSampler
+from results import writer_from_config
+from checkpoint import Checkpointer
+from termination import stop_reason, termination_from_config
+from surrogate import surrogate_from_config
+from sorting import sel_nsga2
 
 from deap import base
-from deap import creator
 from deap import tools
 
 
-MAX_WEIGHT = 100
-
-NGEN = 100
-MU = 100
-LAMBDA = 2
-CXPB = 0.7
-MUTPB = 0.2
-UP = 1
-LOW = 0
-
 # Create random items and store them in the items' dictionary.
-def attribute_solution(UP, LOW, size):
-    return [random.uniform(low, up) for low, up in zip([LOW]*size, [UP]*size)]
-
-
-def main(seed, size, objectives, p):
-    random.seed(seed)
-
-    # Create the item dictionary: item name is an integer, and value is
-    # a (weight, value) 2-uple.
-    problem = pymop.factory.get_problem(p, n_var=size, n_obj=objectives)
-    creator.create("MultiObject_Min", base.Fitness, weights=(-1,)*objectives)
-    creator.create("Individual", list, fitness=creator.MultiObject_Min)
+def attribute_solution(UP, LOW):
+    return [random.uniform(low, up) for low, up in zip(LOW, UP)]
+
+
+def run(cfg, seed=None, verbose=True):
+    """
+    Runs MOEA/D with the parameters of cfg (see base_moead.yaml).
+
+    With a thread or process `evaluator`, every evaluation goes through its pool (array_evaluate is
+    ignored): the children of batch_size subproblems are evaluated together with batch_size > 0, up to
+    in_flight children at a time with in_flight > 0, and only the two children of one subproblem
+    otherwise. The serial evaluator evaluates every batch, or the two children of a subproblem without
+    batch_size, as one 2-D array with array_evaluate.
+    Returns the final population and the logbook.
+    """
+    if seed is not None:
+        random.seed(seed)
+        numpy.random.seed(seed)
+
+    size = cfg['NDIM']
+    MU = cfg['pop_size']
+
+    problem = get_problem(cfg['problem_name'], size, cfg.get('n_obj', 3))
+    objectives = problem.n_obj
+    UP = problem.up
+    LOW = problem.low
+    Individual = individual_class(objectives)
     toolbox = base.Toolbox()
 
     # Attribute generator
-    toolbox.register("generate_solution", attribute_solution, UP, LOW, size)
+    toolbox.register("generate_solution", attribute_solution, UP, LOW)
     # Structure initializers
-    toolbox.register('Individual', tools.initIterate, creator.Individual, toolbox.generate_solution)
+    toolbox.register('Individual', tools.initIterate, Individual, toolbox.generate_solution)
     toolbox.register("population", tools.initRepeat, list, toolbox.Individual)
 
-    toolbox.register("evaluate", problem.evaluate, return_values_of=["F"])
-
-    toolbox.register('mate', tools.cxSimulatedBinaryBounded, eta=20.0, low=0, up=1)
-    toolbox.register('mutate', tools.mutPolynomialBounded, eta=20.0, low=0, up=1, indpb=1 / size)
-    toolbox.register("select", tools.selNSGA2)
+    toolbox.register("evaluate", problem.evaluate)
+
+    toolbox.register('mate', tools.cxSimulatedBinaryBounded, eta=20.0, low=LOW, up=UP)
+    toolbox.register('mutate', tools.mutPolynomialBounded, eta=20.0, low=LOW, up=UP, indpb=1 / size)
+    if cfg.get('array_variation', False):
+        # the parents of a batch are mated and mutated as 2-D arrays
+        toolbox.register('mate', cx_simulated_binary_bounded, eta=20.0, low=LOW, up=UP)
+        toolbox.register('mutate', mut_polynomial_bounded, eta=20.0, low=LOW, up=UP, indpb=1 / size)
+    toolbox.register("select", sel_nsga2)
+    # evaluation backend (serial, thread or process pool)
+    evaluator = from_config(cfg)
+    toolbox.register("map", evaluator.map)
+    toolbox.register("submit", evaluator.submit)
+    parallel = evaluator.backend != "serial"
+    if parallel and verbose and cfg.get('batch_size', 0) == 0 and cfg.get('in_flight', 0) == 0:
+        print("run: the {} evaluator evaluates the two children of one subproblem at a time, "
+              "set batch_size or in_flight to evaluate more of them in parallel".format(evaluator.backend))
+    # memoization of the evaluations (cache: true), see cache.py
+    cache = cache_from_config(cfg, problem)
+    if cache is not None:
+        cache.instrument(toolbox)
 
     pop = toolbox.population(n=MU)
-    hof = tools.ParetoFront()
-
-    stats = {}
-
-    def lambda_factory(idx):
-        return lambda ind: ind.fitness.values[idx]
-
-    fitness_tags = ["Weight", "Value"]
-    for tag in fitness_tags:
-        s = tools.Statistics(key=lambda_factory(
-            fitness_tags.index(tag)
-        ))
-        stats[tag] = s
-
-    mstats = tools.MultiStatistics(**stats)
-    mstats.register("avg", numpy.mean, axis=0)
-    mstats.register("std", numpy.std, axis=0)
-    mstats.register("min", numpy.min, axis=0)
-    mstats.register("max", numpy.max, axis=0)
-
-    ea = MOEAD(pop, toolbox, MU, CXPB, MUTPB, ngen=NGEN, stats=mstats, halloffame=hof, nr=LAMBDA)
-    pop = ea.execute()
-
-    return pop, stats, hof
+    hof = ParetoArchive()
+
+    if cfg.get('streaming_stats', True):
+        # avg/std/min/max of the objectives, updated as the solutions are replaced
+        mstats = PopulationStatistics()
+    else:
+        stats = {}
+
+        def lambda_factory(idx):
+            return lambda ind: ind.fitness.values[idx]
+
+        fitness_tags = ["f{}".format(i + 1) for i in range(objectives)]
+        for tag in fitness_tags:
+            s = tools.Statistics(key=lambda_factory(
+                fitness_tags.index(tag)
+            ))
+            stats[tag] = s
+
+        mstats = tools.MultiStatistics(**stats)
+        mstats.register("avg", numpy.mean, axis=0)
+        mstats.register("std", numpy.std, axis=0)
+        mstats.register("min", numpy.min, axis=0)
+        mstats.register("max", numpy.max, axis=0)
+
+    # per phase timing (timing: true), trace of the logbook records and opt-in profiler, the phases of
+    # the asynchronous loop (wait) and of the surrogate declared with the others to be in the header
+    phases = ["variation", "mating_selection", "evaluate", "update_problem", "hv"]
+    if cfg.get('in_flight', 0) > 0:
+        phases.append("wait")
+    if cfg.get('surrogate'):
+        phases.append("surrogate")
+    timer = PhaseTimer(cfg.get('timing', False), phases)
+    # periodic checkpoints (checkpoint: path), resumed with resume: true
+    checkpointer = Checkpointer(cfg.get('checkpoint'), cfg.get('checkpoint_every', 10))
+    saved = checkpointer.load() if cfg.get('resume', False) else None
+    trace = Trace(cfg.get('trace'), append=saved is not None)
+    profiler = Profiler(cfg.get('profile'), cfg.get('profile_output'))
+    # the population of every logbook record streamed to a result directory (results: path), see results.py
+    results = writer_from_config(cfg, size, objectives, append=saved is not None)
+
+    # permutations and parents drawn in bulk from a numpy generator seeded with the run (sampler: numpy),
+    # or one at a time with the random module as in jMetal (sampler: python)
+    if cfg.get('sampler', 'numpy') not in ('numpy', 'python'):
+        print("run: unknown sampler", cfg.get('sampler'))
+        raise ValueError("sampler must be 'numpy' or 'python'")
+    sampler = IndexSampler(seed) if cfg.get('sampler', 'numpy') == 'numpy' else None
+    # early termination on convergence or budgets (hv_window, max_time, ...), see termination.py
+    termination = termination_from_config(cfg)
+    # surrogate pre-screening of the children (surrogate: rbf or gp), see surrogate.py
+    surrogate = surrogate_from_config(cfg, problem, refit=20)
+
+    profiler.start()
+    # the profile is written even if the run fails
+    try:
+        ea = MOEAD(pop, toolbox, MU, cfg['cx_prob'], cfg['mutate_prob'], ngen=cfg['n_gen'], stats=mstats,
+                   halloffame=hof, T=cfg.get('T', 20), nr=cfg.get('nr', 2), delta=cfg.get('delta', 0.9),
+                   verbose=verbose, vectorized=cfg.get('vectorized', True), batchSize=cfg.get('batch_size', 0),
+                   arrayEvaluate=cfg.get('array_evaluate', True), arrayVariation=cfg.get('array_variation', False),
+                   timer=timer, trace=trace, logEvery=cfg.get('log_every', 1), checkpoint=checkpointer,
+                   inFlight=cfg.get('in_flight', 0), weightMethod=cfg.get('weight_method', 'auto'),
+                   sampler=sampler, results=results, termination=termination, surrogate=surrogate,
+                   surrogateCandidates=cfg.get('surrogate_candidates', 4),
+                   surrogateFraction=cfg.get('surrogate_fraction', 0.5),
+                   parallelEvaluate=parallel, dataDirectory=cfg.get('data_directory', 'weights'),
+                   weightsFile=cfg.get('weights_file'), cacheWeights=cfg.get('cache_weights', False),
+                   cacheNeighbourhood=cfg.get('cache_neighbourhood', False))
+        pop = ea.execute(saved)
+    finally:
+        profiler.stop()
+    ea.logbook_.stop_reason = stop_reason(termination)
+    if verbose and termination is not None and termination.reason is not None:
+        print('Stopped at sweep {}: {}'.format(termination.gen, termination.message))
+    checkpointer.close()
+    trace.close()
+    if results is not None:
+        results.close()
+    evaluator.close()
+    if cache is not None:
+        if verbose:
+            print(cache.summary())
+        cache.close()
+
+    return pop, ea.logbook_
 
 
 if __name__ == "__main__":
-    PROBLEM = "dtlz2"
-    objectives = 3
-    size = 30
-    seed = 64
+    with open('base_moead.yaml', encoding='utf-8') as f:
+        cfg = yaml.load(f.read(), Loader=yaml.FullLoader)
 
-    pop, stats, hof = main(seed, size, objectives, PROBLEM)
+    pop, logbook = run(cfg, cfg.get('seed'))
 
     pop = [str(p) + " " + str(p.fitness.values) for p in pop]
-    hof = [str(h) + " " + str(h.fitness.values) for h in hof]
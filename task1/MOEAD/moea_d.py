@@ -1,28 +1,68 @@
-from deap.tools.emo import uniform_reference_points
 from deap import tools, algorithms
 import random
 import math
+import time
+import numpy
+import os
+import hashlib
+from concurrent.futures import FIRST_COMPLETED, wait
 from copy import deepcopy
-from deap.benchmarks.tools import hypervolume
+from indicators import HypervolumeIndicator
+from archive import ParetoArchive
+from weights import get_weights, lattice_divisions, load_weights
+from profiling import PhaseTimer, Trace
+from accumulator import PopulationStatistics
+from checkpoint import arrays_individuals, rng_state, set_rng_state
+try:
+    from scipy.spatial import cKDTree
+except ImportError:
+    cKDTree = None
+
+# Number of float entries of the distance block computed at once in initNeighbourhood
+NEIGHBOURHOOD_BLOCK = 2 ** 22
+# Population size from which the neighbourhood is built with a KD-tree (requires scipy)
+KDTREE_MIN_SIZE = 10000
 
 
 class MOEAD(object):
 
     def __init__(self, population, toolbox, mu, cxpb, mutpb, ngen=0, maxEvaluations=0,
-                 T=20, nr=2, delta=0.9, stats=None, halloffame=None, verbose=__debug__, dataDirectory="weights"):
+                 T=20, nr=2, delta=0.9, stats=None, halloffame=None, verbose=__debug__, dataDirectory="weights",
+                 vectorized=False, batchSize=0, cacheNeighbourhood=False, weightsFile=None, cacheWeights=False,
+                 arrayEvaluate=False, arrayVariation=False, timer=None, trace=None, logEvery=1,
+                 checkpoint=None, inFlight=0, weightMethod="auto", sampler=None, results=None,
+                 termination=None, surrogate=None, surrogateCandidates=4, surrogateFraction=0.5,
+                 parallelEvaluate=False):
 
         self.populationSize_ = int(0)
+        self.evaluations_ = int(0)
 
         # Reference the DEAP toolbox to the algorithm
         self.toolbox = toolbox
 
+        # Number of subproblems whose offspring are evaluated together, 0 evaluates the children of each
+        # subproblem in turn (one 2-D array with arrayEvaluate, each child on its own otherwise).
+        # With arrayEvaluate toolbox.evaluate is called on a 2-D array, otherwise batches use toolbox.map.
+        self.batchSize = batchSize
+        self.arrayEvaluate = arrayEvaluate
+        # toolbox.map evaluates in parallel (thread or process evaluation.Evaluator): every evaluation goes
+        # through it, the children of a subproblem together without batchSize, and arrayEvaluate is ignored
+        self.parallelEvaluate = parallelEvaluate
+        # Mate and mutate the parents of a batch as 2-D arrays (toolbox.mate/mutate from population.py)
+        self.arrayVariation = arrayVariation
+        # Wall time spent evaluating during the current sweep
+        self.evaluationTime_ = 0.0
+
         # Stores the population
         self.population = []
         if population:
             self.population = population
-            fitnesses = self.toolbox.map(self.toolbox.evaluate, self.population)
-            for ind, fit in zip(self.population, fitnesses):
-                ind.fitness.values = fit
+            if self.batchSize > 0 or self.arrayEvaluate:
+                self.evaluateBatch(self.population)
+            else:
+                fitnesses = self.toolbox.map(self.toolbox.evaluate, self.population)
+                for ind, fit in zip(self.population, fitnesses):
+                    ind.fitness.values = fit
 
             self.populationSize_ = mu
 
@@ -67,15 +107,7 @@ class MOEAD(object):
         self.ngen = ngen
         self.paretoFront = halloffame
         # spilt
-        self.p = 1
-        while True:
-            num_vector = 1
-            for i in range(1, self.n_objectives):
-                num_vector *= ((self.p + self.n_objectives - i) / i)
-            if num_vector <= self.populationSize_:
-                self.p += 1
-            else:
-                break
+        self.p = lattice_divisions(self.n_objectives, self.populationSize_)
         self.maxEvaluations = -1
         if maxEvaluations == ngen == 0:
             print("maxEvaluations or ngen must be greater than 0.")
@@ -86,22 +118,81 @@ class MOEAD(object):
             self.maxEvaluations = maxEvaluations
 
         self.dataDirectory_ = dataDirectory
+        # Store/reuse the neighbourhood of a weight set in dataDirectory_
+        self.cacheNeighbourhood = cacheNeighbourhood
+        # Weight set file to use instead of dataDirectory_ (e.g. test.csv)
+        self.weightsFile = weightsFile
+        # Save a generated weight set to dataDirectory_ so the next runs load it
+        self.cacheWeights = cacheWeights
+        # Generation of the weight set when no file holds it (one of weights.METHODS)
+        self.weightMethod = weightMethod
         self.functionType_ = "_TCHE1"
         self.stats = stats
         self.verbose = verbose
+        # Sweeps between two logbook records, 0 records after every subproblem
+        self.logEvery = logEvery
+        # A PopulationStatistics is kept up to date by updateProblem instead of being compiled from scratch
+        self.streamingStats_ = isinstance(stats, PopulationStatistics)
+        # Number of children evaluated concurrently in the asynchronous mode (executeAsync), which
+        # submits the evaluations with toolbox.submit (e.g. evaluation.Evaluator.submit).
+        # 0 runs the synchronous sweeps.
+        self.inFlight = inFlight
+        if inFlight > 0 and not hasattr(toolbox, "submit"):
+            print("Error in MOEAD.__init__: inFlight > 0 requires toolbox.submit.")
+            raise ValueError("toolbox.submit is not assigned")
+        # Periodic checkpoints of the state of execute (checkpoint.Checkpointer)
+        self.checkpoint = checkpoint
+        # Index sampling with a numpy generator (sampling.IndexSampler): the permutation, mating types
+        # and parents of a sweep are drawn at once. None uses the random module like the jMetal code.
+        self.sampler = sampler
+        self.types_ = None
+        self.parents_ = None
+        # Phase timing (profiling.PhaseTimer) and trace of the logbook records (profiling.Trace)
+        self.timer = timer if timer is not None else PhaseTimer(False)
+        self.trace = trace if trace is not None else Trace()
+        # Population written with every logbook record (results.ResultWriter)
+        self.results = results
+        # Early termination checked at the end of every sweep (termination.Termination), on top of maxEvaluations.
+        # Its max_evaluations budget also caps the children evaluated during the sweep (withinBudget).
+        self.termination = termination
+        self.stopped_ = False
+        # Pre-screening of the children with a model of the objectives (surrogate.Surrogate): surrogateCandidates
+        # times more children than evaluated are generated for a subproblem, the fraction surrogateFraction of
+        # its children with the best predicted Tchebycheff value is evaluated.
+        self.surrogate = surrogate
+        self.surrogateCandidates = surrogateCandidates
+        self.surrogateFraction = surrogateFraction
+        if self.timer.enabled:
+            self.matingSelection = self.timer.wrap("mating_selection", self.matingSelection)
+            self.updateProblem = self.timer.wrap("update_problem", self.updateProblem)
+
+        # Array-backed mode: lambda_, z_ and the population objectives (F_) are kept in numpy arrays
+        # and the scalarization of a whole neighbourhood is computed in one batch.
+        self.vectorized = vectorized
+        self.F_ = None
 
         ### Code brough up from the execute function
         self.T_ = T
         self.delta_ = delta
 
-    def execute(self):
-        print("Executing MOEA/D")
+    def execute(self, saved=None):
+        """
+        saved : (arrays, state) of a checkpoint written by a previous run (Checkpointer.load()), the
+                run is resumed from it
+        """
+        if self.verbose:
+            print("Executing MOEA/D")
 
         logbook = tools.Logbook()
-        logbook.header = ['gen', 'evals'] + (self.stats.fields if self.stats else [])
+        self.logbook_ = logbook
+        logbook.header = ['gen', 'evals', 'hv'] + self.timer.fields + (self.stats.fields if self.stats else [])
 
         self.evaluations_ = 0
-        print("POPSIZE:", self.populationSize_)
+        # Number of completed sweeps over the subproblems
+        self.sweeps_ = 0
+        self.stopped_ = False
+        if self.verbose:
+            print("POPSIZE:", self.populationSize_)
 
 
         # 2-D list of size populationSize * T_
@@ -114,70 +205,449 @@ class MOEAD(object):
         self.lambda_ = [[None for _ in range(self.n_objectives)] for i in range(self.populationSize_)]
 
         # STEP 1. Initialization
-        self.initUniformWeight()
-        self.initNeighbourhood()
-        self.initIdealPoint()
+        if saved is None:
+            self.initUniformWeight()
+            self.initNeighbourhood()
+            if self.vectorized:
+                self.initArrays()
+            self.initIdealPoint()
+        else:
+            logbook = self.restoreState(*saved)
+            self.logbook_ = logbook
+
+        # Hypervolume of the population, updated with the solutions replaced during each sweep
+        self.hypervolume_ = HypervolumeIndicator([11.0] * self.n_objectives)
+        with self.timer.phase("hv"):
+            hypervolume = self.hypervolume_.update(self.population)
+
+        if self.paretoFront is not None and saved is None:
+            self.paretoFront.update(self.population)
+        if self.surrogate is not None and saved is None:
+            self.learn(self.population)
+
+        if self.streamingStats_:
+            self.stats.reset(self.population)
+        if saved is None:
+            self.logRecord(logbook, hv=hypervolume)
+        if self.verbose:
+            print(logbook.stream)
 
-        record = self.stats.compile(self.population) if self.stats is not None else {}
+        if self.inFlight > 0:
+            self.executeAsync(logbook)
+            return self.population
+
+        while self.evaluations_ < self.maxEvaluations and not self.stopped_:
+            permutation = self.newSweep()
+
+            # With batchSize the offspring of a whole chunk of subproblems are generated from the same
+            # population and evaluated in a single call before the updates are applied in order.
+            chunk = self.batchSize if self.batchSize > 0 else 1
+            for start in range(0, self.populationSize_, chunk):
+                batch = self.withinBudget(self.generateBatch(permutation[start:start + chunk]))
+                if not batch:
+                    break
+
+                # Evaluation
+                start_time = time.perf_counter()
+                if self.batchSize > 0:
+                    self.evaluateBatch([child for _, _, offspring in batch for child in offspring])
+                elif self.arrayEvaluate or self.parallelEvaluate:
+                    # the children of the subproblem in one 2-D array, or through toolbox.map in parallel
+                    for _, _, offspring in batch:
+                        self.evaluateBatch(offspring)
+                else:
+                    for _, _, offspring in batch:
+                        for child in offspring:
+                            fit = self.toolbox.evaluate(child)
+                            self.evaluations_ += 1
+                            child.fitness.values = fit
+                elapsed = time.perf_counter() - start_time
+                self.evaluationTime_ += elapsed
+                self.timer.add("evaluate", elapsed)
+                if self.surrogate is not None:
+                    self.learn([child for _, _, offspring in batch for child in offspring])
+
+                # STEP 2.3 Repair
+                # TODO: Add this as an option to repair invalid individuals?
+
+                for n, type_, offspring in batch:
+                    # STEP 2.4: Update z_
+                    for child in offspring:
+                        self.updateReference(child)
+
+                        # STEP 2.5 Update of solutions (population update)
+                        self.updateProblem(child, n, type_)
+
+                    if self.logEvery == 0:
+                        self.logRecord(logbook)
+
+            self.endSweep(logbook)
+        return self.population
+
+    """
+    " executeAsync
+    " @param logbook
+    """
+
+    def executeAsync(self, logbook):
+        """
+        Asynchronous steady-state loop. Up to inFlight children are evaluated at the same time through
+        toolbox.submit, each one tagged with its subproblem and mating type. The results are applied
+        (updateReference, updateProblem) in completion order, ties in submission order, and the
+        offspring of the next subproblem of the permutation is generated from the current population
+        as soon as a slot is free. A sweep ends every populationSize_ subproblems applied.
+        The checkpoints hold the state at the end of a sweep without the children in flight, so a
+        resumed asynchronous run does not replay the same trajectory.
+        """
+        pending = {}  # future -> (submission number, subproblem, type_, child)
+        remaining = {}  # subproblem start number -> children not applied yet
+        queue = []
+        submitted = 0
+        started = 0
+        applied = 0
+        while True:
+            # evaluationsLeft is None without max_evaluations
+            while (len(pending) < self.inFlight and self.evaluations_ + len(pending) < self.maxEvaluations
+                   and self.evaluationsLeft(len(pending)) != 0 and not self.stopped_):
+                if not queue:
+                    queue = self.newSweep()[::-1]
+                n = queue.pop()
+                batch = self.withinBudget(self.generateBatch([n]), len(pending))
+                for _, type_, offspring in batch:
+                    for child in offspring:
+                        future = self.toolbox.submit(self.toolbox.evaluate, child)
+                        pending[future] = (submitted, started, n, type_, child)
+                        submitted += 1
+                remaining[started] = sum(len(offspring) for _, _, offspring in batch)
+                started += 1
+            if not pending:
+                break
 
-        logbook.record(gen=self.ngen, evals=self.evaluations_, **record)
+            start_time = time.perf_counter()
+            done, _ = wait(list(pending), return_when=FIRST_COMPLETED)
+            elapsed = time.perf_counter() - start_time
+            self.evaluationTime_ += elapsed
+            self.timer.add("wait", elapsed)
+
+            finished = sorted(done, key=lambda f: pending[f][0])
+            for future in finished:
+                pending[future][4].fitness.values = future.result()
+            if self.surrogate is not None:
+                self.learn([pending[future][4] for future in finished])
+            for future in finished:
+                _, start, n, type_, child = pending.pop(future)
+                self.evaluations_ += 1
+
+                # STEP 2.4: Update z_
+                self.updateReference(child)
+                # STEP 2.5 Update of solutions (population update)
+                self.updateProblem(child, n, type_)
+
+                remaining[start] -= 1
+                if remaining[start] == 0:
+                    del remaining[start]
+                    applied += 1
+                    if self.logEvery == 0:
+                        self.logRecord(logbook)
+                    if applied % self.populationSize_ == 0:
+                        self.endSweep(logbook)
+        # a sweep cut by the max_evaluations budget ends as in execute, where the termination stops the run
+        if applied % self.populationSize_ and self.evaluationsLeft() == 0:
+            self.endSweep(logbook)
+
+    """
+    " endSweep
+    " @param logbook
+    """
+
+    def endSweep(self, logbook):
+        """Updates the hypervolume, records, checkpoints and prints the end of a sweep."""
+        with self.timer.phase("hv"):
+            hypervolume = self.hypervolume_.update(self.population)
+        self.sweeps_ += 1
+        if self.logEvery > 0 and self.sweeps_ % self.logEvery == 0:
+            self.logRecord(logbook, hv=hypervolume)
+        if self.termination is not None:
+            F = self.F_ if self.vectorized else [ind.fitness.values for ind in self.population]
+            self.stopped_ = self.termination.update(self.sweeps_, self.evaluations_, hypervolume, F)
+        if self.checkpoint is not None and self.checkpoint.due(self.sweeps_):
+            self.checkpoint.save(*self.checkpointState(logbook))
         if self.verbose:
             print(logbook.stream)
+            print('***********************evaluate time: {}, hypervolume:{}, evaluation wall time: {:.3f}s'.format(
+                self.evaluations_, hypervolume, self.evaluationTime_))
+        self.evaluationTime_ = 0.0
+
+    """
+    " checkpointState / restoreState
+    """
+
+    def checkpointState(self, logbook):
+        """
+        Returns the state of execute at the end of a sweep as (arrays, state): the population, the
+        weights, the neighbourhood, the ideal point and the hall of fame as numpy arrays, the counters,
+        the random states and the logbook as python objects.
+        """
+        arrays = {"X": numpy.array(self.population, dtype=float),
+                  "F": numpy.array([ind.fitness.values for ind in self.population], dtype=float),
+                  "lambda": numpy.asarray(self.lambda_, dtype=float),
+                  "neighbourhood": numpy.asarray(self.neighbourhood_, dtype=int),
+                  "z": numpy.asarray(self.z_, dtype=float)}
+        if self.paretoFront is not None and len(self.paretoFront):
+            arrays["hof_X"] = numpy.array(list(self.paretoFront), dtype=float)
+            arrays["hof_F"] = numpy.array([ind.fitness.values for ind in self.paretoFront], dtype=float)
+        state = {"evaluations": self.evaluations_, "sweeps": self.sweeps_, "rng": rng_state(), "logbook": logbook}
+        if self.sampler is not None:
+            state["sampler"] = self.sampler.getstate()
+        if self.termination is not None:
+            state["termination"] = self.termination.getstate()
+        if self.surrogate is not None:
+            state["surrogate"] = self.surrogate.getstate()
+        return arrays, state
+
+    def restoreState(self, arrays, state):
+        """Restores a state returned by checkpointState (in place of STEP 1). Returns the logbook."""
+        individual = type(self.population[0])
+        self.population = arrays_individuals(individual, arrays["X"], arrays["F"])
+        self.lambda_ = arrays["lambda"]
+        self.neighbourhood_ = arrays["neighbourhood"]
+        self.z_ = arrays["z"]
+        if self.vectorized:
+            self.initArrays()
+        else:
+            self.lambda_ = self.lambda_.tolist()
+            self.neighbourhood_ = self.neighbourhood_.tolist()
+            self.z_ = self.z_.tolist()
+        if self.paretoFront is not None:
+            self.paretoFront.clear()
+            if "hof_X" in arrays:
+                self.paretoFront.update(arrays_individuals(individual, arrays["hof_X"], arrays["hof_F"]))
+        self.evaluations_ = state["evaluations"]
+        self.sweeps_ = state["sweeps"]
+        set_rng_state(state["rng"])
+        if self.sampler is not None and "sampler" in state:
+            self.sampler.setstate(state["sampler"])
+        if self.termination is not None and "termination" in state:
+            self.termination.setstate(state["termination"])
+        if self.surrogate is not None and "surrogate" in state:
+            self.surrogate.setstate(state["surrogate"])
+        return state["logbook"]
+
+    """
+    " logRecord
+    " @param logbook
+    """
+
+    def logRecord(self, logbook, **kargs):
+        """
+        Records the statistics of the population and the phase times since the previous record in the
+        logbook, writes the record (without the statistics) to the trace and the population with the
+        record to the results. gen is the number of completed sweeps, kargs are added to the record (e.g. hv).
+        """
+        record = self.stats.compile(self.population) if self.stats is not None else {}
+        entry = dict(gen=self.sweeps_, evals=self.evaluations_, **kargs, **self.timer.lap())
+        logbook.record(**entry, **record)
+        self.trace.write(entry)
+        if self.results is not None:
+            F = self.F_ if self.vectorized else [ind.fitness.values for ind in self.population]
+            self.results.write(self.sweeps_, numpy.array(self.population, dtype=float), F, logbook[-1])
 
-        while self.evaluations_ < self.maxEvaluations:
+    """
+    " newSweep
+    """
+
+    def newSweep(self):
+        """
+        Returns the order of the subproblems of a new sweep. With a sampler, the mating types and parents
+        of all the subproblems are drawn at the same time (read by selectParents).
+        """
+        if self.sampler is None:
             permutation = [None] * self.populationSize_  # Of type int
             self.randomPermutations(permutation, self.populationSize_)
+            return permutation
+        with self.timer.phase("mating_selection"):
+            permutation, self.types_, self.parents_ = self.sampler.sweep(self.populationSize_, self.neighbourhood_,
+                                                                         self.delta_)
+        return permutation
 
-            for i in range(self.populationSize_):
-                n = permutation[i]
-                rnd = random.random()
+    """
+    " selectParents / redrawParents / generateOffspring
+    " @param n
+    """
 
-                # STEP 2.1: Mating selection based on probability
-                if rnd < self.delta_:
-                    type_ = 1
-                else:
-                    type_ = 2
+    def selectParents(self, n):
+        """
+        n : index of the subproblem
+        Returns the indexes of the two parents selected for subproblem n and the mating type used.
+        """
+        if self.sampler is not None:
+            # drawn for the whole sweep by newSweep
+            return self.parents_[n].tolist(), int(self.types_[n])
 
-                p = list()  # Vector of type integer
-                self.matingSelection(p, n, 2, type_)
+        rnd = random.random()
 
-                # STEP 2.2: Reproduction
-                parents = [None] * 2
+        # STEP 2.1: Mating selection based on probability
+        if rnd < self.delta_:
+            type_ = 1
+        else:
+            type_ = 2
 
-                candidates = list(self.population[:])
-                parents[0] = deepcopy(candidates[p[0]])
-                parents[1] = deepcopy(candidates[p[1]])
-                children = self.toolbox.mate(parents[0], parents[1])
+        p = list()  # Vector of type integer
+        self.matingSelection(p, n, 2, type_)
+        return p, type_
 
-                # Apply mutation
-                children = [self.toolbox.mutate(child) for child in children]
-                # Evaluation
-                offspring = []
-                # children = algorithms.varAnd(parents, self.toolbox, cxpb=self.cxpb, mutpb=self.mutpb)
-                for child in children:
-                    fit = self.toolbox.evaluate(child[0])
-                    self.evaluations_ += 1
-                    child[0].fitness.values = fit
-                    offspring.append(child[0])
+    def redrawParents(self, subproblems):
+        """
+        subproblems : indexes of subproblems already mated in the sweep
+        Draws new mating types and parents for them with the sampler (selectParents draws them on every
+        call without a sampler).
+        """
+        if self.sampler is None:
+            return
+        subproblems = numpy.asarray(subproblems, dtype=int)
+        with self.timer.phase("mating_selection"):
+            self.types_[subproblems], self.parents_[subproblems] = self.sampler.mates(
+                self.populationSize_, numpy.asarray(self.neighbourhood_)[subproblems], self.delta_)
+
+    def generateOffspring(self, p):
+        """
+        p : indexes of the two parents (selectParents)
+        Returns the (unevaluated) children of the parents.
+        """
+        # STEP 2.2: Reproduction
+        parents = [None] * 2
 
-                # STEP 2.3 Repair
-                # TODO: Add this as an option to repair invalid individuals?
+        candidates = list(self.population[:])
+        parents[0] = deepcopy(candidates[p[0]])
+        parents[1] = deepcopy(candidates[p[1]])
+        children = self.toolbox.mate(parents[0], parents[1])
 
-                # STEP 2.4: Update z_
-                for child in offspring:
-                    self.updateReference(child)
+        # Apply mutation
+        children = [self.toolbox.mutate(child) for child in children]
+        # children = algorithms.varAnd(parents, self.toolbox, cxpb=self.cxpb, mutpb=self.mutpb)
+        return [child[0] for child in children]
 
-                    # STEP 2.5 Update of solutions (population update)
-                    self.updateProblem(child, n, type_)
+    def generateOffspringArray(self, subproblems, selected):
+        """
+        subproblems : indexes of the subproblems of the batch
+        selected    : parents and mating type of each subproblem (selectParents)
+        Same as generateOffspring for a batch of subproblems, with toolbox.mate and toolbox.mutate
+        being the array operators of population.py: the parents are gathered in two 2-D arrays, mated
+        and mutated at once, and only the children are turned into individuals (no deepcopy).
+        Returns a list of (subproblem, type_, children).
+        """
+        X1 = numpy.array([self.population[p[0]] for p, _ in selected], dtype=float)
+        X2 = numpy.array([self.population[p[1]] for p, _ in selected], dtype=float)
+        X1, X2 = self.toolbox.mate(X1, X2)
+        X1 = self.toolbox.mutate(X1)
+        X2 = self.toolbox.mutate(X2)
 
-                record = self.stats.compile(self.population) if self.stats is not None else {}
+        individual = type(self.population[0])
+        return [(n, type_, [individual(x1.tolist()), individual(x2.tolist())])
+                for n, (_, type_), x1, x2 in zip(subproblems, selected, X1, X2)]
+
+    """
+    " generateBatch / screenOffspring / evaluationsLeft / withinBudget / learn
+    " @param subproblems
+    """
 
-                logbook.record(gen=self.ngen, evals=self.evaluations_, **record)
+    def generateBatch(self, subproblems):
+        """
+        subproblems : indexes of the subproblems of the batch
+        Returns a list of (subproblem, type_, children) to evaluate, pre-screened when a surrogate is ready.
+        """
+        batch = self.variation(subproblems)
+        if self.surrogate is None or not self.surrogate.ready:
+            return batch
+        return self.screenOffspring(subproblems, batch)
 
-            if self.verbose:
-                print(logbook.stream)
-            print('***********************evaluate time: {}, hypervolume:{}'.format(self.evaluations_, hypervolume(self.population, [11.0, 11.0, 11.0])))
-        return self.population
+    def variation(self, subproblems):
+        """
+        Returns a list of (subproblem, type_, children) for the subproblems. The parents are selected out
+        of the variation phase, the mating selection has its own phase.
+        """
+        if self.arrayVariation:
+            selected = [self.selectParents(n) for n in subproblems]
+            with self.timer.phase("variation"):
+                return self.generateOffspringArray(subproblems, selected)
+        batch = []
+        for n in subproblems:
+            p, type_ = self.selectParents(n)
+            with self.timer.phase("variation"):
+                batch.append((n, type_, self.generateOffspring(p)))
+        return batch
+
+    def screenOffspring(self, subproblems, batch):
+        """
+        Generates surrogateCandidates times more children than evaluated for every subproblem of the batch
+        and keeps for each one the children of lowest predicted Tchebycheff value on its weight vector.
+        Returns a list of (subproblem, type_, [child]).
+        """
+        produced = len(batch[0][2])
+        keep = max(1, int(round(self.surrogateFraction * produced)))
+        for _ in range(-(-self.surrogateCandidates * keep // produced) - 1):
+            # every round mates new parents
+            self.redrawParents(subproblems)
+            batch = batch + self.variation(subproblems)
+
+        with self.timer.phase("surrogate"):
+            candidates = [(n, type_, child) for n, type_, offspring in batch for child in offspring]
+            subproblem = numpy.array([n for n, _, _ in candidates])
+            predicted = self.surrogate.predict(numpy.array([child for _, _, child in candidates], dtype=float))
+            values = self.fitnessFunctionArray(predicted, numpy.asarray(self.lambda_, dtype=float)[subproblem])
+            # by subproblem, then predicted value
+            order = numpy.lexsort((values, subproblem))
+            first = numpy.searchsorted(subproblem[order], subproblem[order])
+            chosen = order[numpy.arange(len(order)) - first < keep]
+        # in the order of the subproblems of the batch
+        rank = {n: i for i, n in enumerate(subproblems)}
+        chosen = sorted(chosen, key=lambda i: (rank[candidates[i][0]], i))
+        return [(candidates[i][0], candidates[i][1], [candidates[i][2]]) for i in chosen]
+
+    def evaluationsLeft(self, pending=0):
+        """Evaluations left in the max_evaluations budget after pending more ones, None without it."""
+        if self.termination is None:
+            return None
+        return self.termination.remaining(self.evaluations_ + pending)
+
+    def withinBudget(self, batch, pending=0):
+        """The children of the batch within the max_evaluations budget, the first ones in batch order."""
+        left = self.evaluationsLeft(pending)
+        if left is None:
+            return batch
+        kept = []
+        for n, type_, offspring in batch:
+            offspring = offspring[:left]
+            left -= len(offspring)
+            if offspring:
+                kept.append((n, type_, offspring))
+        return kept
+
+    def learn(self, individuals):
+        """Adds evaluated individuals to the training points of the surrogate."""
+        self.surrogate.add(numpy.array(individuals, dtype=float),
+                           numpy.array([ind.fitness.values for ind in individuals], dtype=float))
+
+    """
+    " evaluateBatch
+    " @param individuals
+    """
+
+    def evaluateBatch(self, individuals):
+        """
+        Evaluates the individuals with a single call to toolbox.evaluate on a 2-D array (one row per
+        individual), as done by problems.Problem.evaluate. Without arrayEvaluate, or with parallelEvaluate,
+        the individuals go through toolbox.map instead (e.g. an evaluation.Evaluator pool).
+        """
+        if not individuals:
+            return
+        if self.arrayEvaluate and not self.parallelEvaluate:
+            F = numpy.atleast_2d(self.toolbox.evaluate(numpy.asarray(individuals, dtype=float)))
+        else:
+            F = self.toolbox.map(self.toolbox.evaluate, individuals)
+        for ind, fit in zip(individuals, F):
+            ind.fitness.values = tuple(fit)
+        self.evaluations_ += len(individuals)
 
     """
     " initUniformWeight
@@ -189,7 +659,14 @@ class MOEAD(object):
         http://dces.essex.ac.uk/staff/qzhang/MOEAcompetition/CEC09final/code/ZhangMOEADcode/moead030510.rar)
 
         """
-        if self.n_objectives == 2:
+        if self.weightsFile is not None:
+            weights = load_weights(self.weightsFile)
+            if weights.shape != (self.populationSize_, self.n_objectives):
+                print("MOEAD.initUniformWeight: {} holds {} weights of dimension {}, expected {} of dimension {}."
+                      .format(self.weightsFile, weights.shape[0], weights.shape[1], self.populationSize_, self.n_objectives))
+                raise ValueError
+            self.lambda_ = [list(x) for x in weights]
+        elif self.n_objectives == 2:
             for n in range(self.populationSize_):
                 a = 1.0 * float(n) / (self.populationSize_ - 1)
                 self.lambda_[n][0] = a
@@ -198,30 +675,94 @@ class MOEAD(object):
             """
             Ported from Java code written by Wudong Liu 
             (Source: http://dces.essex.ac.uk/staff/qzhang/moead/moead-java-source.zip)
-            """
 
-            self.lambda_ = list()
-            all_weights = uniform_reference_points(self.n_objectives, self.p)
-            # Trim number of weights to fit population size
-            self.lambda_ = sorted((list(x) for x in all_weights), key=lambda x: sum(x), reverse=True)
-            self.lambda_ = random.sample(self.lambda_, self.populationSize_)
+            The set W<n_objectives>D_<populationSize_>.dat is loaded from dataDirectory_ when it exists,
+            otherwise populationSize_ weights are generated with weightMethod (and saved with cacheWeights).
+            """
+            weights = get_weights(self.n_objectives, self.populationSize_, self.dataDirectory_, save=self.cacheWeights,
+                                  method=self.weightMethod)
+            self.lambda_ = [list(x) for x in weights]
 
     """ 
     " initNeighbourhood
     """
 
     def initNeighbourhood(self):
-        x = [None] * self.populationSize_ # Of type float
-        idx = [None] * self.populationSize_ #Of type int
-
-        for i in range(self.populationSize_):
-            for j in range(self.populationSize_):
-                x[j] = self.distVector(self.lambda_[i], self.lambda_[j])
-                idx[j] = j
-            x_idx = dict(zip(idx, x))
-            idx = sorted(x_idx.items(), key=lambda kv: kv[1])
-            idx = [index for (index, value) in idx]
-            self.neighbourhood_.append(idx[0:self.T_]) #System.arraycopy(idx, 0, neighbourhood_[i], 0, T_)
+        """
+        Sets neighbourhood_[i] to the indexes of the T_ weight vectors closest to lambda_[i]
+        (including i itself), ties being broken by the lower index. With cacheNeighbourhood the
+        result is stored in dataDirectory_, keyed by the weight set and T_.
+        """
+        weights = numpy.asarray(self.lambda_, dtype=float)
+        path = None
+        if self.cacheNeighbourhood:
+            key = hashlib.sha1(repr(weights.shape).encode() + weights.tobytes()).hexdigest()[:16]
+            path = os.path.join(self.dataDirectory_, "neighbourhood_{}_T{}.npy".format(key, self.T_))
+            if os.path.exists(path):
+                self.neighbourhood_ = numpy.load(path).tolist()
+                return
+
+        neighbourhood = self.nearestNeighbours(weights, self.T_)
+        if path is not None:
+            os.makedirs(self.dataDirectory_, exist_ok=True)
+            numpy.save(path, neighbourhood)
+        self.neighbourhood_ = neighbourhood.tolist()
+
+    def nearestNeighbours(self, weights, T):
+        """
+        weights : array of shape (N, n_objectives)
+        T       : number of neighbours
+        Returns an (N, T) integer array with the T nearest weight vectors of each row, sorted by distance,
+        ties being broken by the lower index.
+        The distances are computed by blocks of rows and only the T smallest of each row are sorted.
+        For N >= KDTREE_MIN_SIZE a KD-tree is used when scipy is installed: it finds the vectors within
+        the T-th distance of each row, whose distances are computed again as in the blocked path and
+        sorted the same way, so both paths give the same neighbourhoods.
+        """
+        N = len(weights)
+        T = min(T, N)
+        neighbourhood = numpy.empty((N, T), dtype=int)
+        if cKDTree is not None and N >= KDTREE_MIN_SIZE:
+            tree = cKDTree(weights)
+            dist, _ = tree.query(weights, k=T)
+            kth = numpy.asarray(dist, dtype=float).reshape(N, T)[:, T - 1]
+            # margin over the T-th distance of the tree, the candidates are filtered on the exact distances
+            balls = tree.query_ball_point(weights, kth * (1.0 + 1e-9) + 1e-12)
+            for i in range(N):
+                candidates = numpy.asarray(balls[i], dtype=int)
+                d = numpy.sqrt(((weights[i] - weights[candidates]) ** 2).sum(axis=1))
+                neighbourhood[i] = self.closest(d, candidates, T)
+            return neighbourhood
+
+        rows = max(1, NEIGHBOURHOOD_BLOCK // (N * weights.shape[1]))
+        for start in range(0, N, rows):
+            block = weights[start:start + rows]
+            dist = numpy.sqrt(((block[:, numpy.newaxis, :] - weights[numpy.newaxis, :, :]) ** 2).sum(axis=2))
+            # T-th smallest distance of each row, every index at or below it is a candidate
+            kth = numpy.partition(dist, T - 1, axis=1)[:, T - 1]
+            for r in range(len(block)):
+                candidates = numpy.flatnonzero(dist[r] <= kth[r])
+                neighbourhood[start + r] = self.closest(dist[r, candidates], candidates, T)
+        return neighbourhood
+
+    def closest(self, distances, candidates, T):
+        """The T candidates of lowest distance, ties broken by the lower index."""
+        return candidates[numpy.lexsort((candidates, distances))[:T]]
+
+    """
+    " initArrays
+    """
+
+    def initArrays(self):
+        """
+        Moves the weight vectors, the neighbourhood, the ideal point and the objectives of the
+        population into numpy arrays for the array-backed mode.
+        """
+        self.lambda_ = numpy.asarray(self.lambda_, dtype=float)
+        self.neighbourhood_ = numpy.asarray(self.neighbourhood_, dtype=int)
+        self.z_ = numpy.asarray(self.z_, dtype=float)
+        self.F_ = numpy.array([ind.fitness.values for ind in self.population], dtype=float)
+
     """
     " initPopulation
     " Not implemented: population should be passed as argument
@@ -279,6 +820,9 @@ class MOEAD(object):
     """
 
     def updateReference(self, individual):
+        if self.vectorized:
+            numpy.minimum(self.z_, individual.fitness.values, out=self.z_)
+            return
         for n in range(self.n_objectives):
             if individual.fitness.values[n] < self.z_[n]:
                 self.z_[n] = individual.fitness.values[n]
@@ -296,15 +840,16 @@ class MOEAD(object):
         id : index of the subproblem
         type : update solutions in neighbourhood (type = 1) or whole population otherwise.
         """
+        if self.vectorized:
+            return self.updateProblemArray(individual, id_, type_)
+
         time = 0
 
         if type_ == 1:
             size = len(self.neighbourhood_[id_])
         else:
             size = len(self.population)
-        perm = [None] * size
-
-        self.randomPermutations(perm, size)
+        perm = self.updatePermutation(size)
 
         for i in range(size):
             if type_ == 1:
@@ -318,10 +863,59 @@ class MOEAD(object):
             if f2 < f1: # minimization, JMetal default
             # if f2 >= f1:  # maximization assuming DEAP weights paired with fitness
                 self.population[k] = individual
+                if self.streamingStats_:
+                    self.stats.replace(k, individual.fitness.values)
                 time += 1
             if time >= self.nr_:
-                self.paretoFront.update(self.population)
+                self.updateArchive(individual, time)
                 return
+        self.updateArchive(individual, time)
+
+    def updateProblemArray(self, individual, id_, type_):
+        """
+        Array-backed version of updateProblem. The candidate and the current solutions are scalarized
+        for the whole neighbourhood (or population) at once; the first nr_ improvements in permutation
+        order are replaced, which gives the same result as the sequential loop.
+        """
+        if type_ == 1:
+            size = len(self.neighbourhood_[id_])
+        else:
+            size = len(self.population)
+        perm = self.updatePermutation(size)
+
+        if type_ == 1:
+            idx = self.neighbourhood_[id_][perm]
+        else:
+            idx = numpy.asarray(perm, dtype=int)
+
+        f = numpy.asarray(individual.fitness.values, dtype=float)
+        lambdas = self.lambda_[idx]
+        f1 = self.fitnessFunctionArray(self.F_[idx], lambdas)
+        f2 = self.fitnessFunctionArray(f[numpy.newaxis, :], lambdas)
+
+        replaced = idx[f2 < f1][:self.nr_]
+        for k in replaced:
+            self.population[k] = individual
+        self.F_[replaced] = f
+        if self.streamingStats_ and len(replaced):
+            self.stats.replace(replaced, f)
+
+        self.updateArchive(individual, len(replaced))
+
+    def updateArchive(self, individual, replaced):
+        """
+        individual : the candidate passed to updateProblem
+        replaced   : number of solutions it replaced
+        A ParetoArchive only receives the new individual when it entered the population; any other
+        hall of fame (e.g. tools.ParetoFront) is updated with the whole population after nr_ replacements.
+        """
+        if self.paretoFront is None:
+            return
+        if isinstance(self.paretoFront, ParetoArchive):
+            if replaced > 0:
+                self.paretoFront.insert(individual)
+        elif replaced >= self.nr_:
+            self.paretoFront.update(self.population)
 
     def minFastSort(self, x, idx, n, m ):
         """
@@ -365,6 +959,19 @@ class MOEAD(object):
 
         return fitness
 
+    def fitnessFunctionArray(self, F, lambdas):
+        """
+        F       : objective vectors, array of shape (n, n_objectives) or (1, n_objectives)
+        lambdas : weight vectors, array of shape (n, n_objectives)
+        Returns the scalarized value of each row of F for the matching weight vector.
+        """
+        if self.functionType_ == "_TCHE1":
+            diff = numpy.abs(F - self.z_)
+            return (diff * numpy.where(lambdas == 0, 0.0001, lambdas)).max(axis=1)
+        else:
+            print("MOEAD.fitnessFunctionArray: unknown type", self.functionType_)
+            raise NotImplementedError
+
     #######################################################################
     # Ported from the Utils.java class
     #######################################################################
@@ -375,6 +982,14 @@ class MOEAD(object):
             sum_ += ((vector1[n] - vector2[n]) * (vector1[n] - vector2[n]))
         return math.sqrt(sum_)
 
+    def updatePermutation(self, size):
+        """Order in which updateProblem visits size solutions, drawn by the sampler if any."""
+        if self.sampler is not None:
+            return self.sampler.permutation(size)
+        perm = [None] * size
+        self.randomPermutations(perm, size)
+        return perm
+
     def randomPermutations(self, perm, size):
         """
         perm : int list
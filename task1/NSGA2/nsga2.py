@@ -1,140 +1,313 @@
-import math
+import os
+import sys
 import numpy as np
-from deap import creator, base, tools, algorithms
+from deap import base, tools, algorithms
 import random
-from deap.benchmarks.tools import hypervolume
-import matplotlib.pyplot as plt
 import yaml
 
-with open('base_nsga2.yaml', encoding='utf-8') as f:
-    cfg = yaml.load(f.read(), Loader=yaml.FullLoader)
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from evaluation import from_config
+from indicators import HypervolumeIndicator
+from problems import get_problem, individual_class
+from sorting import NSGA2Selector, sel_nsga2, sort_nondominated
+from population import ArrayPopulation, array_selection, cx_simulated_binary_bounded, mut_polynomial_bounded, var_and
+from profiling import PhaseTimer, Profiler, Trace
+from results import writer_from_config
+from cache import cache_from_config
+from checkpoint import Checkpointer, arrays_individuals, individuals_arrays, rng_state, set_rng_state
+from termination import stop_reason, termination_from_config
+from surrogate import screened_size, surrogate_from_config
 
-print('CFG:', cfg)
-
-# parameter setting
-
-NDIM = cfg['NDIM']
-N_pop = cfg['pop_size']
-max_gen = cfg['n_gen']
-cx_prob = cfg['cx_prob']
-mutate_prob = cfg['mutate_prob']
-
-domain = {'zdt1': [[0]*NDIM, [1]*NDIM],
-          'zdt2': [[0]*NDIM, [1]*NDIM],
-          'zdt3': [[0]*NDIM, [1]*NDIM],
-          'zdt4': [[0]+[-5]*9, [1] + [5]*9]}
-# define a smallest unit, i.e., individual.
-creator.create("MultiObjective_Min", base.Fitness, weights=(-1.0, -1.0))
-creator.create("Individual", list, fitness=creator.MultiObjective_Min)
 
 # define individuals' features in domain with read-encoding.
 def gen_ind_fea(low, up):
     return [random.uniform(l, u) for l, u in zip(low, up)]
 
-# Given the LOW and UP of problem to generate individual
-LOW = domain[cfg['problem_name']][0]
-UP = domain[cfg['problem_name']][1]
-toolbox = base.Toolbox()
-toolbox.register("attributed_fea", gen_ind_fea, LOW, UP)
-toolbox.register("Individual", tools.initIterate, creator.Individual, toolbox.attributed_fea)
-
-# create population
-toolbox.register("Population", tools.initRepeat, list, toolbox.Individual)
-pop = toolbox.Population(n=N_pop)
-
-# define the solving problem, e.g., ZDT1
-def ZDT1(ind):
-    f1 = ind[0]
-    g = 1 + 9/(len(ind)-1) * sum(ind[1:])
-    f2 = 1 - math.sqrt(f1/g)
-    return f1, f2
-
-# register the evaluating function and some other important function.
-toolbox.register("evaluate", ZDT1)
-toolbox.register("select_gen", tools.selTournamentDCD)
-toolbox.register("select", tools.selNSGA2)
-toolbox.register("mate", tools.cxSimulatedBinaryBounded, eta=20.0, low=LOW, up=UP)
-toolbox.register("mutate", tools.mutPolynomialBounded, eta=20.0, low=LOW, up=UP, indpb=1.0/NDIM)
-
-# logging
-stats = tools.Statistics(key=lambda ind: ind.fitness.values)
-stats.register("avg", np.mean)
-stats.register("std", np.std)
-stats.register("max", np.max)
-stats.register("min", np.min)
-
-logbook = tools.Logbook()
-
-# GA loop
-fitness = map(toolbox.evaluate, pop)
-for ind, fit in zip(pop, fitness):
-    ind.fitness.values = fit
-
-logbook.header = ['gen', 'avg', 'std', 'max', 'min']
-record = stats.compile(pop)
-logbook.record(gen=0, **record)
-# get pareto front
-pop = toolbox.select(pop, k=N_pop)
-# offsprings
-offsprings = toolbox.select_gen(pop, N_pop)
-offsprings = algorithms.varAnd(offsprings, toolbox, cx_prob, mutate_prob)
-best_hv = 0
-# begin the second iter...
-for iter in range(1, max_gen):
-
-    fitness = map(toolbox.evaluate, offsprings)
-    for ind, fit in zip(offsprings, fitness):
-        ind.fitness.values = fit
-    combined_pop = pop + offsprings
-    pop = toolbox.select(combined_pop, k=N_pop)
-
-    offsprings = toolbox.select_gen(pop, k=N_pop)
-    offsprings = algorithms.varAnd(offsprings, toolbox, cx_prob, mutate_prob)
-    record = stats.compile(pop)
-    logbook.record(gen=0, **record)
-    if iter % 10 == 0:
-        hv = hypervolume(pop, [11.0, 11.0])
-        print('***************iter:{}*****************'.format(iter))
-        if hv > best_hv:
-            print('HV indicator:{:.4f}, improved: {:.4f}'.format(hv, hv - best_hv))
-            best_hv = hv
-        print(record)
-
-
-# stream
-hv = hypervolume(pop, [11.0, 11.0])
-bestInd = tools.selBest(pop, 1)[0]
-bestFit = bestInd.fitness.values
-print('Best solution:', bestInd)
-print('min of the function:', bestFit)
-print('HV: ', hv)
-
-front = tools.emo.sortNondominated(pop, len(pop))[0]
-# visual
-for ind in front:
-    plt.plot(ind.fitness.values[0], ind.fitness.values[1], 'r.', ms=2)
-plt.xlabel('f1')
-plt.ylabel('f2')
-# plt.tight_layout()
-plt.show()
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
 
+def run(cfg, seed=None, verbose=True, migration=None):
+    """
+    Runs NSGA-II with the parameters of cfg (see base_nsga2.yaml).
+    migration(gen, pop) is called after the environmental selection of every generation (island
+    model, see islands.py). It returns None or the decision variables and objectives (X, F) of
+    immigrants, which go through the environmental selection with the population.
+    Returns the final population and the logbook.
+    """
+    if seed is not None:
+        random.seed(seed)
+        np.random.seed(seed)
+
+    # parameter setting
+    NDIM = cfg['NDIM']
+    N_pop = cfg['pop_size']
+    max_gen = cfg['n_gen']
+    cx_prob = cfg['cx_prob']
+    mutate_prob = cfg['mutate_prob']
+
+    # define the solving problem, e.g., ZDT1
+    problem = get_problem(cfg['problem_name'], NDIM, cfg.get('n_obj'))
+    # define a smallest unit, i.e., individual.
+    Individual = individual_class(problem.n_obj)
+
+    # Given the LOW and UP of problem to generate individual
+    LOW = problem.low
+    UP = problem.up
+    toolbox = base.Toolbox()
+    toolbox.register("attributed_fea", gen_ind_fea, LOW, UP)
+    toolbox.register("Individual", tools.initIterate, Individual, toolbox.attributed_fea)
+
+    # create population
+    toolbox.register("Population", tools.initRepeat, list, toolbox.Individual)
+    pop = toolbox.Population(n=N_pop)
+
+    # register the evaluating function and some other important function.
+    toolbox.register("evaluate", problem.evaluate)
+    toolbox.register("select_gen", tools.selTournamentDCD)
+    toolbox.register("select", sel_nsga2)
+    toolbox.register("mate", tools.cxSimulatedBinaryBounded, eta=20.0, low=LOW, up=UP)
+    toolbox.register("mutate", tools.mutPolynomialBounded, eta=20.0, low=LOW, up=UP, indpb=1.0/NDIM)
+    # evaluation backend (serial, thread or process pool)
+    evaluator = from_config(cfg)
+    toolbox.register("map", evaluator.map)
+    # memoization of the evaluations (cache: true), see cache.py
+    cache = cache_from_config(cfg, problem)
+    if cache is not None:
+        cache.instrument(toolbox)
+
+    # array-backed population: decision variables and objectives are kept in numpy arrays
+    array_population = cfg.get('population', 'list') == 'array'
+    if array_population:
+        toolbox.register("select_gen", array_selection(tools.selTournamentDCD))
+        toolbox.register("select", array_selection(sel_nsga2))
+        toolbox.register("mate", cx_simulated_binary_bounded, eta=20.0, low=LOW, up=UP)
+        toolbox.register("mutate", mut_polynomial_bounded, eta=20.0, low=LOW, up=UP, indpb=1.0/NDIM)
+        toolbox.register("variate", var_and)
+        pop = ArrayPopulation.from_individuals(pop)
+    else:
+        toolbox.register("variate", algorithms.varAnd)
+    # numpy selection engine: ranks and crowding distances computed once per generation and reused by
+    # the mating tournaments (selection: engine, of tournament_size), or deap's operators (selection: deap)
+    if cfg.get('selection', 'engine') not in ('engine', 'deap'):
+        print("run: unknown selection", cfg.get('selection'))
+        raise ValueError("selection must be 'engine' or 'deap'")
+    if cfg.get('selection', 'engine') == 'engine':
+        selector = NSGA2Selector(cfg.get('tournament_size', 2))
+        toolbox.register("select", selector.select)
+        toolbox.register("select_gen", selector.select_mates)
+
+    def evaluate_population(population):
+        if array_population:
+            return population.evaluate(toolbox.evaluate, toolbox.map)
+        # offspring left unchanged by the variation keep the fitness of their parent
+        invalid_ind = [ind for ind in population if not ind.fitness.valid]
+        fitness = toolbox.map(toolbox.evaluate, invalid_ind)
+        for ind, fit in zip(invalid_ind, fitness):
+            ind.fitness.values = fit
+        return len(invalid_ind)
+
+    # per phase timing (timing: true), per generation trace file and opt-in profiler
+    phases = ["select", "select_gen", "variate", "evaluate", "hv"]
+    if cfg.get('surrogate'):
+        phases.insert(phases.index("evaluate"), "surrogate")
+    timer = PhaseTimer(cfg.get('timing', False), phases)
+    timer.instrument(toolbox, "select", "select_gen", "variate")
+    evaluate_population = timer.wrap("evaluate", evaluate_population)
+    # periodic checkpoints of the state of the loop (checkpoint: path), resumed with resume: true
+    checkpointer = Checkpointer(cfg.get('checkpoint'), cfg.get('checkpoint_every', 10))
+    saved = checkpointer.load() if cfg.get('resume', False) else None
+    trace = Trace(cfg.get('trace'), append=saved is not None)
+    profiler = Profiler(cfg.get('profile'), cfg.get('profile_output'))
+    # every generation streamed to a result directory (results: path), see results.py
+    results = writer_from_config(cfg, NDIM, problem.n_obj, append=saved is not None)
+    # early termination on convergence or budgets (hv_window, max_time, ...), see termination.py
+    termination = termination_from_config(cfg)
+    # surrogate pre-screening of the offspring (surrogate: rbf or gp), see surrogate.py
+    surrogate = surrogate_from_config(cfg, problem)
+
+    def population_arrays(name, population):
+        if array_population:
+            X, F, crowding = population.X, population.F, population.crowding
+        else:
+            X, F, crowding = individuals_arrays(population)
+        return {name + "_X": X, name + "_F": F, name + "_crowding": crowding}
+
+    def arrays_population(arrays, name):
+        X, F, crowding = arrays[name + "_X"], arrays[name + "_F"], arrays[name + "_crowding"]
+        if array_population:
+            return ArrayPopulation(X, Individual.fitness, F, crowding)
+        return arrays_individuals(Individual, X, F, crowding)
+
+    def within_budget(offsprings):
+        """The offspring evaluated within max_evaluations: the valid ones and the first invalid ones."""
+        left = termination.remaining(evals) if termination is not None else None
+        if left is None:
+            return offsprings
+        if array_population:
+            dropped = np.flatnonzero(offsprings.invalid)[left:]
+            if not len(dropped):
+                return offsprings
+            return offsprings.take(np.setdiff1d(np.arange(len(offsprings)), dropped))
+        kept = []
+        for ind in offsprings:
+            if not ind.fitness.valid:
+                if left == 0:
+                    continue
+                left -= 1
+            kept.append(ind)
+        return kept
+
+    def generate_offspring(population):
+        if surrogate is None or not surrogate.ready:
+            offsprings = toolbox.select_gen(population, k=N_pop)
+            return toolbox.variate(offsprings, toolbox, cx_prob, mutate_prob)
+        # surrogate_candidates times more candidates than evaluated offspring, the best predicted ones are kept
+        k = screened_size(cfg, N_pop)
+        rounds = -(-cfg.get('surrogate_candidates', 4) * k // N_pop)
+        candidates = toolbox.variate(toolbox.select_gen(population, k=N_pop), toolbox, cx_prob, mutate_prob)
+        for _ in range(rounds - 1):
+            candidates = candidates + toolbox.variate(toolbox.select_gen(population, k=N_pop), toolbox, cx_prob,
+                                                      mutate_prob)
+        with timer.phase("surrogate"):
+            arrays = population_arrays("candidates", candidates)
+            invalid = np.flatnonzero(np.isnan(arrays["candidates_F"]).any(axis=1))
+            F = population_arrays("pop", population)["pop_F"]
+            chosen = invalid[surrogate.screen(arrays["candidates_X"][invalid], F, k)]
+        if array_population:
+            return candidates.take(chosen)
+        return [candidates[i] for i in chosen]
+
+    def update_surrogate(population):
+        if surrogate is not None:
+            arrays = population_arrays("pop", population)
+            surrogate.add(arrays["pop_X"], arrays["pop_F"])
+
+    # logging
+    stats = tools.Statistics(key=lambda ind: ind.fitness.values)
+    stats.register("avg", np.mean)
+    stats.register("std", np.std)
+    stats.register("max", np.max)
+    stats.register("min", np.min)
+
+    logbook = tools.Logbook()
+    logbook.header = ['gen', 'evals', 'eval_time', 'hv'] + timer.fields + ['avg', 'std', 'max', 'min']
+    hv_indicator = HypervolumeIndicator([11.0] * problem.n_obj)
+
+    def log(gen, evals, record):
+        with timer.phase("hv"):
+            hv = hv_indicator.update(pop)
+        entry = dict(gen=gen, evals=evals, eval_time=evaluator.lap(), hv=hv, **timer.lap())
+        logbook.record(**entry, **record)
+        trace.write(entry)
+        if results is not None:
+            arrays = population_arrays("pop", pop)
+            results.write(gen, arrays["pop_X"], arrays["pop_F"], logbook[-1])
+        return hv
+
+    # GA loop
+    profiler.start()
+    # the profile is written even if the run fails
+    try:
+        if saved is None:
+            evals = evaluate_population(pop)
+            update_surrogate(pop)
+            log(0, evals, stats.compile(pop))
+            # get pareto front
+            pop = toolbox.select(pop, k=N_pop)
+            # offsprings
+            offsprings = generate_offspring(pop)
+            best_hv = 0
+            start = 1
+        else:
+            arrays, state = saved
+            pop = arrays_population(arrays, "pop")
+            offsprings = arrays_population(arrays, "offsprings")
+            evals, best_hv, logbook = state['evals'], state['best_hv'], state['logbook']
+            set_rng_state(state['rng'])
+            if termination is not None and state.get('termination') is not None:
+                termination.setstate(state['termination'])
+            if surrogate is not None and state.get('surrogate') is not None:
+                surrogate.setstate(state['surrogate'])
+            start = state['gen'] + 1
+        # begin the second iter...
+        for iter in range(start, max_gen):
+
+            offsprings = within_budget(offsprings)
+            evals += evaluate_population(offsprings)
+            update_surrogate(offsprings)
+            combined_pop = pop + offsprings
+            pop = toolbox.select(combined_pop, k=N_pop)
+            immigrants = migration(iter, pop) if migration is not None else None
+            if immigrants is not None:
+                X, F = immigrants
+                if array_population:
+                    immigrants = ArrayPopulation(X, Individual.fitness, F)
+                else:
+                    immigrants = arrays_individuals(Individual, X, F)
+                pop = toolbox.select(pop + immigrants, k=N_pop)
+
+            offsprings = generate_offspring(pop)
+            record = stats.compile(pop)
+            hv = log(iter, evals, record)
+            if verbose and iter % 10 == 0:
+                print('***************iter:{}*****************'.format(iter))
+                if hv > best_hv:
+                    print('HV indicator:{:.4f}, improved: {:.4f}'.format(hv, hv - best_hv))
+                    best_hv = hv
+                print(record)
+            stop = (termination is not None
+                    and termination.update(iter, evals, hv, population_arrays("pop", pop)["pop_F"]))
+            if checkpointer.due(iter):
+                arrays = population_arrays("pop", pop)
+                arrays.update(population_arrays("offsprings", offsprings))
+                checkpointer.save(arrays, {'gen': iter, 'evals': evals, 'best_hv': best_hv, 'rng': rng_state(),
+                                           'logbook': logbook,
+                                           'termination': termination.getstate() if termination else None,
+                                           'surrogate': surrogate.getstate() if surrogate else None})
+            if stop:
+                break
+
+    finally:
+        profiler.stop()
+    checkpointer.close()
+    trace.close()
+    if results is not None:
+        results.close()
+    evaluator.close()
+    logbook.stop_reason = stop_reason(termination)
+    if verbose:
+        print('Evaluation time: {:.2f}s'.format(evaluator.total))
+        if termination is not None and termination.reason is not None:
+            print('Stopped at generation {}: {}'.format(termination.gen, termination.message))
+    if cache is not None:
+        if verbose:
+            print(cache.summary())
+        cache.close()
+    if array_population:
+        pop = pop.to_individuals(Individual)
+    return pop, logbook
+
+
+if __name__ == "__main__":
+    import matplotlib.pyplot as plt
+
+    with open('base_nsga2.yaml', encoding='utf-8') as f:
+        cfg = yaml.load(f.read(), Loader=yaml.FullLoader)
+
+    print('CFG:', cfg)
+    pop, logbook = run(cfg, cfg.get('seed'))
+
+    # stream
+    hv = logbook[-1]['hv']
+    bestInd = tools.selBest(pop, 1)[0]
+    bestFit = bestInd.fitness.values
+    print('Best solution:', bestInd)
+    print('min of the function:', bestFit)
+    print('HV: ', hv)
+
+    front = sort_nondominated(pop, len(pop))[0]
+    # visual
+    for ind in front:
+        plt.plot(ind.fitness.values[0], ind.fitness.values[1], 'r.', ms=2)
+    plt.xlabel('f1')
+    plt.ylabel('f2')
+    # plt.tight_layout()
+    plt.show()
@@ -1,93 +1,267 @@
-from deap import base, tools, algorithms, creator
+import os
+import sys
+from deap import base, tools, algorithms
 import numpy as np
 import random
-from deap.benchmarks.tools import hypervolume
-import pymop.factory
+import yaml
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from evaluation import from_config
+from indicators import HypervolumeIndicator
+from problems import get_problem, individual_class
+from sorting import NSGA3Selector, sel_nsga3
+from population import ArrayPopulation, array_selection, cx_simulated_binary_bounded, mut_polynomial_bounded, var_and
+from profiling import PhaseTimer, Profiler, Trace
+from results import writer_from_config
+from cache import cache_from_config
+from checkpoint import Checkpointer, arrays_individuals, individuals_arrays, rng_state, set_rng_state
+from termination import stop_reason, termination_from_config
+from surrogate import screened_size, surrogate_from_config
 
-def attribute_solution(UP, LOW, size):
-    return [random.uniform(low, up) for low, up in zip([LOW]*size, [UP]*size)]
 
+def attribute_solution(UP, LOW):
+    return [random.uniform(low, up) for low, up in zip(LOW, UP)]
 
-def ZDT1(ind):
-    f1 = ind[0]
-    g = 1 + 9/(len(ind)-1) * sum(ind[1:])
-    f2 = 1 - np.sqrt(f1/g)
-    return f1, f2
 
+def run(cfg, seed=None, verbose=True, migration=None):
+    """
+    Runs NSGA-III with the parameters of cfg (see base_nsga3.yaml).
+    migration(gen, pop) is called after the environmental selection of every generation (island
+    model, see islands.py). It returns None or the decision variables and objectives (X, F) of
+    immigrants, which go through the environmental selection with the population.
+    Returns the final population and the logbook.
+    """
+    if seed is not None:
+        random.seed(seed)
+        np.random.seed(seed)
 
-UP = 1
-LOW = 0
-size = 30
-N = 200
-N_gen = 250
-cx_prob = 0.8
-mut_prob = 0.2
-random.seed(2022)
-PROBLEM = "dtlz2"
-problem = pymop.factory.get_problem(PROBLEM, n_var=size, n_obj=3)
-# generate individual
-creator.create("MultiObject_Min", base.Fitness, weights=(-1, -1, -1))
-creator.create("Individual", list, fitness=creator.MultiObject_Min)
+    size = cfg['NDIM']
+    N = cfg['pop_size']
+    N_gen = cfg['n_gen']
+    cx_prob = cfg['cx_prob']
+    mut_prob = cfg['mutate_prob']
+    # keep the population in numpy arrays (population.ArrayPopulation)
+    ARRAY_POPULATION = cfg.get('population', 'list') == 'array'
 
-toolbox = base.Toolbox()
-toolbox.register("generate_solution", attribute_solution, UP, LOW, size)
-toolbox.register('Individual', tools.initIterate, creator.Individual, toolbox.generate_solution)
-toolbox.register("population", tools.initRepeat, list, toolbox.Individual)
-toolbox.register("evaluate", problem.evaluate, return_values_of=["F"])
+    problem = get_problem(cfg['problem_name'], size, cfg.get('n_obj', 3))
+    UP = problem.up
+    LOW = problem.low
+    # generate individual
+    Individual = individual_class(problem.n_obj)
 
-toolbox.register('select_to_mate', tools.selTournament, tournsize=2)
-toolbox.register('select', tools.selNSGA3)
-toolbox.register('mate', tools.cxSimulatedBinaryBounded, eta=20.0, low=0, up=1)
-toolbox.register('mutate', tools.mutPolynomialBounded, eta=20.0, low=0, up=1, indpb=1/size)
+    toolbox = base.Toolbox()
+    toolbox.register("generate_solution", attribute_solution, UP, LOW)
+    toolbox.register('Individual', tools.initIterate, Individual, toolbox.generate_solution)
+    toolbox.register("population", tools.initRepeat, list, toolbox.Individual)
+    toolbox.register("evaluate", problem.evaluate)
 
-# generate population
+    toolbox.register('select_to_mate', tools.selTournament, tournsize=2)
+    toolbox.register('select', sel_nsga3)
+    toolbox.register('mate', tools.cxSimulatedBinaryBounded, eta=20.0, low=LOW, up=UP)
+    toolbox.register('mutate', tools.mutPolynomialBounded, eta=20.0, low=LOW, up=UP, indpb=1/size)
+    # evaluation backend (serial, thread or process pool)
+    evaluator = from_config(cfg)
+    toolbox.register("map", evaluator.map)
+    # memoization of the evaluations (cache: true), see cache.py
+    cache = cache_from_config(cfg, problem)
+    if cache is not None:
+        cache.instrument(toolbox)
+    if ARRAY_POPULATION:
+        toolbox.register('select_to_mate', array_selection(tools.selTournament), tournsize=2)
+        toolbox.register('select', array_selection(sel_nsga3))
+        toolbox.register('mate', cx_simulated_binary_bounded, eta=20.0, low=LOW, up=UP)
+        toolbox.register('mutate', mut_polynomial_bounded, eta=20.0, low=LOW, up=UP, indpb=1/size)
+    # numpy selection engine keeping the ideal, extreme points and intercepts across generations
+    # (selection: engine), or the stateless sel_nsga3 (selection: deap)
+    if cfg.get('selection', 'engine') not in ('engine', 'deap'):
+        print("run: unknown selection", cfg.get('selection'))
+        raise ValueError("selection must be 'engine' or 'deap'")
+    selector = None
+    if cfg.get('selection', 'engine') == 'engine':
+        selector = NSGA3Selector()
+        toolbox.register('select', selector.select)
 
-pop = toolbox.population(n=N)
-fitnesses = toolbox.map(toolbox.evaluate, pop)
-for fitness, ind in zip(fitnesses, pop):
-    ind.fitness.values = fitness
-ref_points = tools.uniform_reference_points(nobj=3, p=12)
-pop = toolbox.select(pop, k=N, ref_points=ref_points)
-hyper_volume = hypervolume(pop, [11.0, 11.0, 11.0])
-print('gen: {}, hypervolume:{}'.format(0, hyper_volume))
-# logging
-stats = tools.Statistics()
-stats.register("max", np.max)
-stats.register("min", np.min)
-stats.register("mean", np.mean)
-stats.register("std", np.std)
-recode = stats.compile(pop)
-logbook = tools.Logbook()
-logbook.record(gen=0, **recode)
+    # per phase timing (timing: true), per generation trace file and opt-in profiler
+    phases = ["select_to_mate", "variate", "evaluate", "select", "hv"]
+    if cfg.get('surrogate'):
+        phases.insert(phases.index("evaluate"), "surrogate")
+    timer = PhaseTimer(cfg.get('timing', False), phases)
+    timer.instrument(toolbox, "select_to_mate", "select")
+    # periodic checkpoints of the state of the loop (checkpoint: path), resumed with resume: true
+    checkpointer = Checkpointer(cfg.get('checkpoint'), cfg.get('checkpoint_every', 10))
+    saved = checkpointer.load() if cfg.get('resume', False) else None
+    trace = Trace(cfg.get('trace'), append=saved is not None)
+    profiler = Profiler(cfg.get('profile'), cfg.get('profile_output'))
+    # every generation streamed to a result directory (results: path), see results.py
+    results = writer_from_config(cfg, size, problem.n_obj, append=saved is not None)
+    # early termination on convergence or budgets (hv_window, max_time, ...), see termination.py
+    termination = termination_from_config(cfg)
+    # surrogate pre-screening of the offspring (surrogate: rbf or gp), see surrogate.py
+    surrogate = surrogate_from_config(cfg, problem)
 
-# generate new population
-for gen in range(1, N_gen):
-    parents = toolbox.select_to_mate(pop, k=N)
-    offsprings = algorithms.varAnd(parents, toolbox, cxpb=cx_prob, mutpb=mut_prob)
-    invalid_ind = [ind for ind in offsprings if not ind.fitness.valid]
-    fitnesses = toolbox.map(toolbox.evaluate, invalid_ind)
+    def population_arrays(population):
+        if ARRAY_POPULATION:
+            return population.X, population.F
+        X, F, _ = individuals_arrays(population)
+        return X, F
 
-    for fitness, ind in zip(fitnesses, invalid_ind):
-        ind.fitness.values = fitness
-    combined_pop = pop + invalid_ind
+    def export(gen):
+        if results is None:
+            return
+        X, F = population_arrays(pop)
+        results.write(gen, X, F, logbook[-1])
 
-    pop = toolbox.select(combined_pop, k=N, ref_points=ref_points)
-    recode = stats.compile(pop)
-    logbook.record(gen=gen, **recode)
-    if gen % 10 == 0:
-        hyper_volume = hypervolume(pop, [11.0, 11.0, 11.0])
-        print('***********iter:{}, hypervolume:{}'.format(gen, hyper_volume))
-
-logbook.header = 'gen', 'max', 'min', 'mean', 'std'
-print(logbook.stream)
+    def variate(population):
+        parents = toolbox.select_to_mate(population, k=N)
+        with timer.phase("variate"):
+            if ARRAY_POPULATION:
+                return var_and(parents, toolbox, cxpb=cx_prob, mutpb=mut_prob)
+            return algorithms.varAnd(parents, toolbox, cxpb=cx_prob, mutpb=mut_prob)
 
+    def screen_offspring(population, offsprings):
+        # surrogate_candidates times more candidates than evaluated offspring, the best predicted ones are kept
+        k = screened_size(cfg, N)
+        for _ in range(-(-cfg.get('surrogate_candidates', 4) * k // N) - 1):
+            offsprings = offsprings + variate(population)
+        with timer.phase("surrogate"):
+            X, F = population_arrays(offsprings)
+            invalid = np.flatnonzero(np.isnan(F).any(axis=1))
+            chosen = invalid[surrogate.screen(X[invalid], population_arrays(population)[1], k)]
+        if ARRAY_POPULATION:
+            return offsprings.take(chosen)
+        return [offsprings[i] for i in chosen]
 
+    # generate population
 
+    profiler.start()
+    # the profile is written even if the run fails
+    try:
+        pop = toolbox.population(n=N)
+        ref_points = tools.uniform_reference_points(nobj=problem.n_obj, p=cfg.get('ref_p', 12))
+        hv_indicator = HypervolumeIndicator([11.0] * problem.n_obj)
+        # logging
+        stats = tools.Statistics()
+        stats.register("max", np.max)
+        stats.register("min", np.min)
+        stats.register("mean", np.mean)
+        stats.register("std", np.std)
+        logbook = tools.Logbook()
+        if saved is None:
+            with timer.phase("evaluate"):
+                if ARRAY_POPULATION:
+                    # rows evaluated through toolbox.map (evaluator pool and cache), as the list population
+                    pop = ArrayPopulation.from_individuals(pop)
+                    evals = pop.evaluate(toolbox.evaluate, toolbox.map)
+                else:
+                    fitnesses = toolbox.map(toolbox.evaluate, pop)
+                    for fitness, ind in zip(fitnesses, pop):
+                        ind.fitness.values = fitness
+                    evals = len(pop)
+            if surrogate is not None:
+                surrogate.add(*population_arrays(pop))
+            pop = toolbox.select(pop, k=N, ref_points=ref_points)
+            with timer.phase("hv"):
+                hyper_volume = hv_indicator.update(pop)
+            if verbose:
+                print('gen: {}, hypervolume:{}'.format(0, hyper_volume))
+            recode = stats.compile(pop)
+            entry = dict(gen=0, evals=evals, eval_time=evaluator.lap(), hv=hyper_volume, **timer.lap())
+            logbook.record(**entry, **recode)
+            trace.write(entry)
+            export(0)
+            start = 1
+        else:
+            arrays, state = saved
+            if ARRAY_POPULATION:
+                pop = ArrayPopulation(arrays['X'], Individual.fitness, arrays['F'])
+            else:
+                pop = arrays_individuals(Individual, arrays['X'], arrays['F'])
+            evals, logbook = state['evals'], state['logbook']
+            set_rng_state(state['rng'])
+            if selector is not None and state.get('selector') is not None:
+                selector.setstate(state['selector'])
+            if termination is not None and state.get('termination') is not None:
+                termination.setstate(state['termination'])
+            if surrogate is not None and state.get('surrogate') is not None:
+                surrogate.setstate(state['surrogate'])
+            start = state['gen'] + 1
 
+        # generate new population
+        for gen in range(start, N_gen):
+            offsprings = variate(pop)
+            if surrogate is not None and surrogate.ready:
+                offsprings = screen_offspring(pop, offsprings)
+            # the offspring beyond the evaluation budget (max_evaluations) are dropped
+            left = termination.remaining(evals) if termination is not None else None
+            if ARRAY_POPULATION:
+                with timer.phase("evaluate"):
+                    invalid_ind = offsprings.take(np.flatnonzero(offsprings.invalid)[:left])
+                    invalid_ind.evaluate(toolbox.evaluate, toolbox.map)
+            else:
+                with timer.phase("evaluate"):
+                    invalid_ind = [ind for ind in offsprings if not ind.fitness.valid][:left]
+                    fitnesses = toolbox.map(toolbox.evaluate, invalid_ind)
 
+                    for fitness, ind in zip(fitnesses, invalid_ind):
+                        ind.fitness.values = fitness
+            evals += len(invalid_ind)
+            if surrogate is not None:
+                surrogate.add(*population_arrays(invalid_ind))
+            combined_pop = pop + invalid_ind
 
+            pop = toolbox.select(combined_pop, k=N, ref_points=ref_points)
+            immigrants = migration(gen, pop) if migration is not None else None
+            if immigrants is not None:
+                X, F = immigrants
+                if ARRAY_POPULATION:
+                    immigrants = ArrayPopulation(X, Individual.fitness, F)
+                else:
+                    immigrants = arrays_individuals(Individual, X, F)
+                pop = toolbox.select(pop + immigrants, k=N, ref_points=ref_points)
+            recode = stats.compile(pop)
+            with timer.phase("hv"):
+                hyper_volume = hv_indicator.update(pop)
+            entry = dict(gen=gen, evals=evals, eval_time=evaluator.lap(), hv=hyper_volume, **timer.lap())
+            logbook.record(**entry, **recode)
+            trace.write(entry)
+            export(gen)
+            if verbose and gen % 10 == 0:
+                print('***********iter:{}, hypervolume:{}'.format(gen, hyper_volume))
+            if termination is not None or checkpointer.due(gen):
+                X, F = population_arrays(pop)
+            stop = termination is not None and termination.update(gen, evals, hyper_volume, F)
+            if checkpointer.due(gen):
+                checkpointer.save({'X': X, 'F': F},
+                                  {'gen': gen, 'evals': evals, 'rng': rng_state(), 'logbook': logbook,
+                                   'selector': selector.getstate() if selector is not None else None,
+                                   'termination': termination.getstate() if termination is not None else None,
+                                   'surrogate': surrogate.getstate() if surrogate is not None else None})
+            if stop:
+                break
 
+    finally:
+        profiler.stop()
+    logbook.stop_reason = stop_reason(termination)
+    if verbose and termination is not None and termination.reason is not None:
+        print('Stopped at generation {}: {}'.format(termination.gen, termination.message))
+    checkpointer.close()
+    trace.close()
+    if results is not None:
+        results.close()
+    evaluator.close()
+    if cache is not None:
+        if verbose:
+            print(cache.summary())
+        cache.close()
+    if ARRAY_POPULATION:
+        pop = pop.to_individuals(Individual)
+    logbook.header = ['gen', 'evals', 'eval_time', 'hv'] + timer.fields + ['max', 'min', 'mean', 'std']
+    return pop, logbook
 
 
+if __name__ == "__main__":
+    with open('base_nsga3.yaml', encoding='utf-8') as f:
+        cfg = yaml.load(f.read(), Loader=yaml.FullLoader)
 
+    pop, logbook = run(cfg, cfg.get('seed'))
+    print(logbook.stream)
@@ -0,0 +1,76 @@
+"""
+Statistics of the objectives of a population maintained as its individuals are replaced, for the
+steady-state loops (MOEA/D) where compiling tools.Statistics after every child costs O(N) each time.
+
+    stats = PopulationStatistics()
+    stats.reset(pop)
+    pop[k] = child
+    stats.replace(k, child.fitness.values)
+    record = stats.compile(pop)       # {"avg": ..., "std": ..., "min": ..., "max": ...}
+
+compile gives the same values as a tools.Statistics on the fitness values with numpy.mean, std,
+min and max (axis=0), so PopulationStatistics can be passed where such a Statistics is expected.
+"""
+import numpy
+
+
+class PopulationStatistics(object):
+
+    fields = ["avg", "std", "min", "max"]
+
+    def __init__(self):
+        self.F = None
+
+    def reset(self, population):
+        """Starts tracking the fitness values of population (the individuals are not kept)."""
+        self.F = numpy.array([ind.fitness.values for ind in population], dtype=float)
+        # sums of the deviations to a fixed shift, to limit the cancellation in the variance
+        self.shift = self.F.mean(axis=0)
+        self._refresh()
+
+    def _refresh(self):
+        D = self.F - self.shift
+        self.sum = D.sum(axis=0)
+        self.sumsq = (D ** 2).sum(axis=0)
+        self.min = self.F.min(axis=0)
+        self.max = self.F.max(axis=0)
+        self.stale = numpy.zeros(self.F.shape[1], dtype=bool)
+        # replacements since the sums were computed from scratch
+        self.changes = 0
+
+    def replace(self, index, values):
+        """
+        index  : position (or array of positions) of the replaced individuals in the population
+        values : fitness values of the new individuals
+        """
+        old = numpy.array(self.F[index], dtype=float, ndmin=2)
+        self.F[index] = values
+        new = numpy.array(self.F[index], dtype=float, ndmin=2)
+
+        self.sum += (new - self.shift).sum(axis=0) - (old - self.shift).sum(axis=0)
+        self.sumsq += ((new - self.shift) ** 2).sum(axis=0) - ((old - self.shift) ** 2).sum(axis=0)
+        # a bound that left the population is recomputed by compile
+        self.stale |= numpy.any((old == self.min) & (new > self.min), axis=0)
+        self.stale |= numpy.any((old == self.max) & (new < self.max), axis=0)
+        numpy.minimum(self.min, new.min(axis=0), out=self.min)
+        numpy.maximum(self.max, new.max(axis=0), out=self.max)
+
+        self.changes += len(new)
+        if self.changes >= len(self.F):
+            # bounds the rounding errors accumulated by the updates of the sums
+            self._refresh()
+
+    def compile(self, population=None):
+        """Returns the statistics of the tracked values (of population on the first call)."""
+        if self.F is None:
+            self.reset(population)
+        if numpy.any(self.stale):
+            self.min[self.stale] = self.F[:, self.stale].min(axis=0)
+            self.max[self.stale] = self.F[:, self.stale].max(axis=0)
+            self.stale[:] = False
+        n = len(self.F)
+        mean = self.sum / n
+        return {"avg": self.shift + mean,
+                "std": numpy.sqrt(numpy.maximum(self.sumsq / n - mean ** 2, 0.0)),
+                "min": self.min.copy(),
+                "max": self.max.copy()}
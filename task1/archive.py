@@ -0,0 +1,120 @@
+"""
+Non-dominated archive with incremental insertion, usable in place of tools.ParetoFront.
+
+The objective vectors (minimized, i.e. -wvalues) of the archived individuals are stored in one
+contiguous numpy array, so the dominance checks of a new individual against the whole archive are
+two vectorized comparisons. With a capacity, the most crowded member is dropped when the archive
+overflows.
+"""
+from copy import deepcopy
+
+import numpy
+
+
+def crowding_distance(F):
+    """Crowding distance of each row of F (n x m), boundary points get infinity."""
+    n, m = F.shape
+    distance = numpy.zeros(n)
+    if n <= 2:
+        distance[:] = numpy.inf
+        return distance
+    for j in range(m):
+        order = numpy.argsort(F[:, j], kind="stable")
+        values = F[order, j]
+        distance[order[0]] = distance[order[-1]] = numpy.inf
+        span = values[-1] - values[0]
+        if span > 0:
+            distance[order[1:-1]] += (values[2:] - values[:-2]) / span
+    return distance
+
+
+class ParetoArchive(object):
+
+    def __init__(self, capacity=None, similar=None):
+        """
+        capacity : maximal number of archived individuals, None for unbounded
+        similar  : equality test of two individuals with the same objectives (default ==), as in
+                   tools.ParetoFront an individual is not added twice
+        """
+        self.capacity = capacity
+        self.similar = similar if similar is not None else (lambda a, b: a == b)
+        self.items = []
+        self._F = numpy.empty((0, 0))
+        self.size = 0
+
+    @property
+    def objectives(self):
+        """Objective vectors of the archived individuals, shape (len(self), n_objectives)."""
+        return self._F[:self.size]
+
+    def _append(self, individual, f):
+        if self.size == len(self._F):
+            grown = numpy.empty((max(16, 2 * len(self._F)), len(f)))
+            if self.size:
+                grown[:self.size] = self._F[:self.size]
+            self._F = grown
+        self._F[self.size] = f
+        self.items.append(deepcopy(individual))
+        self.size += 1
+
+    def _keep(self, mask):
+        self.items = [item for item, keep in zip(self.items, mask) if keep]
+        kept = self._F[:self.size][mask]
+        self.size = len(kept)
+        self._F[:self.size] = kept
+
+    def insert(self, individual):
+        """
+        Adds the individual if no archived individual dominates it and removes the ones it dominates.
+        Returns True when the individual was added.
+        """
+        f = -numpy.asarray(individual.fitness.wvalues, dtype=float)
+        F = self.objectives
+        if self.size:
+            not_worse = numpy.all(F <= f, axis=1)
+            if numpy.any(not_worse & numpy.any(F < f, axis=1)):
+                return False
+            for i in numpy.flatnonzero(not_worse):
+                # same objectives
+                if self.similar(self.items[i], individual):
+                    return False
+            dominated = numpy.all(F >= f, axis=1) & numpy.any(F > f, axis=1)
+            if numpy.any(dominated):
+                self._keep(~dominated)
+        self._append(individual, f)
+
+        if self.capacity is not None and self.size > self.capacity:
+            self.prune(self.capacity)
+        return True
+
+    def prune(self, size):
+        """Removes the most crowded individuals, one at a time, until `size` are left."""
+        while self.size > size:
+            mask = numpy.ones(self.size, dtype=bool)
+            mask[numpy.argmin(crowding_distance(self.objectives))] = False
+            self._keep(mask)
+
+    def update(self, population):
+        """Inserts every individual of the population (same as tools.ParetoFront.update)."""
+        for individual in population:
+            self.insert(individual)
+
+    def clear(self):
+        self.items = []
+        self._F = numpy.empty((0, 0))
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, i):
+        return self.items[i]
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __reversed__(self):
+        return reversed(self.items)
+
+    def __str__(self):
+        return str(self.items)
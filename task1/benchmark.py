@@ -0,0 +1,241 @@
+"""
+Benchmark of the deap drivers against the pymoo baseline of evaluate_algorithm.py.
+
+    python benchmark.py --output benchmark.json
+    python benchmark.py --baseline benchmark.json --output current.json
+
+Every case (implementation x algorithm x problem x objective count x population size) is run with a
+fixed seed in a fresh interpreter, one case at a time, and records the wall time, the evaluations per
+second, the peak resident memory of the process, the time of each phase found in the logbook (the
+`*_time` columns: evaluation, selection, ...) and the HV and IGD of the final front. The results are
+written as JSON. With --baseline, the cases slower, bigger or worse than the stored results by more
+than the tolerances are reported and the exit status is 1.
+
+The pymoo cases are skipped when pymoo is not installed.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy
+import deap
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from indicators import HypervolumeIndicator, igd
+from problems import get_problem
+from runner import ALGORITHMS, load_config
+from sorting import sort_nondominated
+
+try:
+    import pymoo
+except ImportError:
+    pymoo = None
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+CONFIGS = {"NSGA2": os.path.join(HERE, "NSGA2", "base_nsga2.yaml"),
+           "NSGA3": os.path.join(HERE, "NSGA3", "base_nsga3.yaml"),
+           "MOEAD": os.path.join(HERE, "MOEAD", "base_moead.yaml")}
+
+# default grid
+IMPLEMENTATIONS = ["deap", "pymoo"]
+PROBLEMS = ["zdt1", "zdt2", "zdt3", "zdt4", "dtlz2"]
+POP_SIZES = [100]
+# number of objectives of the DTLZ problems, the ZDT problems are bi-objective
+OBJECTIVES = [3]
+N_GEN = 100
+SEED = 1
+# number of points of the reference front of the IGD
+FRONT_POINTS = 1000
+
+
+def cases(algorithms, implementations, problems, pop_sizes, objectives):
+    for implementation in implementations:
+        for algorithm in algorithms:
+            for problem in problems:
+                for n_obj in ([2] if problem.startswith("zdt") else objectives):
+                    for pop_size in pop_sizes:
+                        yield {'implementation': implementation, 'algorithm': algorithm, 'problem': problem,
+                               'n_obj': n_obj, 'pop_size': pop_size}
+
+
+def case_key(case):
+    return "{implementation}/{algorithm}/{problem}/m{n_obj}/n{pop_size}".format(**case)
+
+
+def case_config(case, n_gen):
+    cfg = load_config(CONFIGS[case['algorithm']])
+    cfg.update(problem_name=case['problem'], n_obj=case['n_obj'], pop_size=case['pop_size'], n_gen=n_gen,
+               evaluator="serial", timing=True)
+    return cfg
+
+
+def _run_deap(cfg, seed):
+    pop, logbook = ALGORITHMS[cfg['algorithm_name']](cfg, seed, False)
+    front = sort_nondominated(pop, len(pop), first_front_only=True)[0]
+    phases = {}
+    for field in logbook.header or []:
+        if field.endswith("_time"):
+            phases[field] = float(sum(logbook.select(field)))
+    F = numpy.array([ind.fitness.values for ind in front])
+    return F, int(logbook[-1]['evals']), phases
+
+
+def _run_pymoo(cfg, seed):
+    from pymoo.algorithms.moo.moead import MOEAD
+    from pymoo.algorithms.moo.nsga2 import NSGA2
+    from pymoo.algorithms.moo.nsga3 import NSGA3
+    from pymoo.optimize import minimize
+    from pymoo.problems import get_problem as pymoo_problem
+    from pymoo.util.ref_dirs import get_reference_directions
+
+    name = cfg['problem_name']
+    if name.startswith("zdt"):
+        problem = pymoo_problem(name, n_var=cfg['NDIM'])
+    else:
+        problem = pymoo_problem(name, n_var=cfg['NDIM'], n_obj=cfg['n_obj'])
+    if cfg['algorithm_name'] == "NSGA2":
+        algorithm = NSGA2(pop_size=cfg['pop_size'])
+    else:
+        ref_dirs = get_reference_directions("energy", problem.n_obj, cfg['pop_size'], seed=seed)
+        if cfg['algorithm_name'] == "NSGA3":
+            algorithm = NSGA3(pop_size=cfg['pop_size'], ref_dirs=ref_dirs)
+        else:
+            algorithm = MOEAD(ref_dirs, n_neighbors=cfg.get('T', 20), prob_neighbor_mating=cfg.get('delta', 0.9))
+    res = minimize(problem, algorithm, ('n_gen', cfg['n_gen']), seed=seed, verbose=False)
+    return res.opt.get("F"), int(res.algorithm.evaluator.n_eval), {}
+
+
+def run_case(case, n_gen, seed):
+    """Runs one case in this process. Returns the measures (see the module docstring)."""
+    cfg = case_config(case, n_gen)
+    start = time.perf_counter()
+    if case['implementation'] == "pymoo":
+        F, evaluations, phases = _run_pymoo(cfg, seed)
+    else:
+        F, evaluations, phases = _run_deap(cfg, seed)
+    wall_time = time.perf_counter() - start
+
+    problem = get_problem(case['problem'], cfg['NDIM'], case['n_obj'])
+    result = dict(case, key=case_key(case), seed=seed, n_gen=n_gen,
+                  wall_time=wall_time,
+                  evaluations=evaluations,
+                  evals_per_s=evaluations / wall_time,
+                  phases=phases,
+                  hv=HypervolumeIndicator([11.0] * case['n_obj']).reset(F),
+                  igd=igd(F, problem.pareto_front(FRONT_POINTS)))
+    if resource is not None:
+        # kilobytes on Linux, bytes on macOS
+        scale = 1.0 if sys.platform == "darwin" else 1024.0
+        result['peak_memory_mb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / 2 ** 20
+    return result
+
+
+def run_benchmark(cases, n_gen=N_GEN, seed=SEED, repeat=1, verbose=True):
+    """
+    Runs every case `repeat` times, each time in a new interpreter, and keeps the fastest run.
+    Returns the list of the results.
+    """
+    context = multiprocessing.get_context("spawn")
+    results = []
+    for case in cases:
+        if case['implementation'] == "pymoo" and pymoo is None:
+            if verbose:
+                print("skipped {} (pymoo is not installed)".format(case_key(case)), file=sys.stderr)
+            continue
+        best = None
+        for _ in range(repeat):
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                result = executor.submit(run_case, case, n_gen, seed).result()
+            if best is None or result['wall_time'] < best['wall_time']:
+                best = result
+        results.append(best)
+        if verbose:
+            print("{key}: {wall_time:.2f}s, {evals_per_s:.0f} evals/s, hv={hv:.4f}, igd={igd:.4f}".format(**best),
+                  file=sys.stderr)
+    return results
+
+
+def compare(results, baseline, tolerance=0.2, quality_tolerance=0.01):
+    """
+    Compares the results with the baseline results (matched on their key). Returns the regressions,
+    as messages: wall time or peak memory higher than (1 + tolerance) times the baseline, HV lower
+    or IGD higher by more than quality_tolerance (relative).
+    """
+    reference = {result['key']: result for result in baseline}
+    regressions = []
+
+    def check(key, measure, value, base, limit):
+        if base and value > base * (1.0 + limit):
+            regressions.append("{}: {} {:.4g} vs {:.4g} in the baseline (+{:.1%})".format(
+                key, measure, value, base, value / base - 1.0))
+
+    for result in results:
+        base = reference.get(result['key'])
+        if base is None:
+            continue
+        check(result['key'], "wall_time", result['wall_time'], base['wall_time'], tolerance)
+        if 'peak_memory_mb' in result and 'peak_memory_mb' in base:
+            check(result['key'], "peak_memory_mb", result['peak_memory_mb'], base['peak_memory_mb'], tolerance)
+        check(result['key'], "igd", result['igd'], base['igd'], quality_tolerance)
+        # a lower hypervolume is a regression
+        if result['hv'] < base['hv'] * (1.0 - quality_tolerance):
+            regressions.append("{}: hv {:.4g} vs {:.4g} in the baseline ({:.1%})".format(
+                result['key'], result['hv'], base['hv'], result['hv'] / base['hv'] - 1.0))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark of the deap drivers and the pymoo baseline.")
+    parser.add_argument("--algorithms", nargs="+", default=sorted(CONFIGS), choices=sorted(CONFIGS))
+    parser.add_argument("--implementations", nargs="+", default=IMPLEMENTATIONS, choices=IMPLEMENTATIONS)
+    parser.add_argument("--problems", nargs="+", default=PROBLEMS)
+    parser.add_argument("--pop-sizes", type=int, nargs="+", default=POP_SIZES)
+    parser.add_argument("--objectives", type=int, nargs="+", default=OBJECTIVES,
+                        help="numbers of objectives of the DTLZ problems")
+    parser.add_argument("--n-gen", type=int, default=N_GEN)
+    parser.add_argument("--seed", type=int, default=SEED)
+    parser.add_argument("--repeat", type=int, default=1, help="runs of every case, the fastest is kept")
+    parser.add_argument("--output", default="benchmark.json")
+    parser.add_argument("--baseline", help="results of a previous benchmark to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="relative increase of wall time or memory reported as a regression")
+    parser.add_argument("--quality-tolerance", type=float, default=0.01,
+                        help="relative HV decrease or IGD increase reported as a regression")
+    args = parser.parse_args(argv)
+
+    grid = cases(args.algorithms, args.implementations, args.problems, args.pop_sizes, args.objectives)
+    results = run_benchmark(grid, args.n_gen, args.seed, args.repeat)
+    meta = {'python': platform.python_version(),
+            'numpy': numpy.__version__,
+            'deap': deap.__version__,
+            'pymoo': getattr(pymoo, "__version__", None),
+            'machine': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'n_gen': args.n_gen,
+            'seed': args.seed}
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump({'meta': meta, 'results': results}, f, indent=1)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)['results']
+        regressions = compare(results, baseline, args.tolerance, args.quality_tolerance)
+        for message in regressions:
+            print("REGRESSION", message)
+        if regressions:
+            sys.exit(1)
+        print("no regression against", args.baseline)
+
+
+if __name__ == "__main__":
+    main()
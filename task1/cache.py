@@ -0,0 +1,190 @@
+"""
+Memoization of the evaluations, in front of toolbox.evaluate and of the evaluation backend:
+
+    cache = EvaluationCache(toolbox.evaluate, maxsize=100000, tolerance=0.0, path="evaluations.sqlite")
+    cache.instrument(toolbox)
+    fitness = toolbox.evaluate(x)                   # one individual or a 2-D array of rows
+    fitnesses = toolbox.map(toolbox.evaluate, individuals)
+
+The key of a decision vector is a hash of its bytes, or of the vector rounded to multiples of
+`tolerance` (near-duplicates then share the fitness of the first one evaluated). The most recently
+used `maxsize` fitnesses are kept in memory. With `path`, every fitness is also stored in a SQLite
+file, read back by later runs (or by other processes) with the same problem. The cached map and
+submit only send the missing vectors to the backend, the cache itself never goes to the workers.
+hits, misses and hit_rate count the lookups.
+
+The drivers enable it with the `cache` key of their config (see cache_from_config).
+"""
+import hashlib
+import sqlite3
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+import numpy
+
+
+class EvaluationCache(object):
+
+    def __init__(self, evaluate, maxsize=100000, tolerance=0.0, path=None, namespace=""):
+        """
+        evaluate  : evaluation function of one decision vector (or of a 2-D array, one row each)
+        maxsize   : number of fitnesses kept in memory (least recently used dropped first)
+        tolerance : quantization step of the keys, 0 for exact vectors
+        path      : SQLite file of the persistent store, None keeps the fitnesses in memory only
+        namespace : hashed with the vectors, so that different problems can share the store
+        """
+        self.evaluate = evaluate
+        self.maxsize = maxsize
+        self.tolerance = tolerance
+        self.path = path
+        self.namespace = namespace
+        self.memory = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.db = None
+        if path is not None:
+            self.db = sqlite3.connect(path, check_same_thread=False)
+            self.db.execute("CREATE TABLE IF NOT EXISTS fitness (key BLOB PRIMARY KEY, value BLOB)")
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def summary(self):
+        return "Evaluation cache: {} hits, {} misses, hit rate {:.1%}".format(self.hits, self.misses, self.hit_rate)
+
+    def instrument(self, toolbox):
+        """Registers the cache as toolbox.evaluate and wraps toolbox.map and toolbox.submit (if any)."""
+        toolbox.register("evaluate", self)
+        toolbox.register("map", self.cached_map(toolbox.map))
+        if hasattr(toolbox, "submit"):
+            toolbox.register("submit", self.cached_submit(toolbox.submit))
+
+    def key(self, x):
+        x = numpy.asarray(x, dtype=float)
+        if self.tolerance > 0:
+            x = numpy.round(x / self.tolerance).astype(numpy.int64)
+        h = hashlib.blake2b(self.namespace.encode(), digest_size=16)
+        h.update(x.tobytes())
+        return h.digest()
+
+    def lookup(self, key):
+        """Fitness of key (counted as a hit), None when unknown (counted as a miss)."""
+        with self.lock:
+            value = self.memory.get(key)
+            if value is not None:
+                self.memory.move_to_end(key)
+            elif self.db is not None:
+                row = self.db.execute("SELECT value FROM fitness WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    value = numpy.frombuffer(row[0], dtype=float)
+                    self._remember(key, value)
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return value
+
+    def _remember(self, key, value):
+        self.memory[key] = value
+        if len(self.memory) > self.maxsize:
+            self.memory.popitem(last=False)
+
+    def store(self, keys, values):
+        with self.lock:
+            for key, value in zip(keys, values):
+                self._remember(key, numpy.array(value, dtype=float))
+            if self.db is not None:
+                self.db.executemany("INSERT OR REPLACE INTO fitness VALUES (?, ?)",
+                                    [(key, numpy.asarray(value, dtype=float).tobytes())
+                                     for key, value in zip(keys, values)])
+                self.db.commit()
+
+    def __call__(self, x):
+        X = numpy.asarray(x, dtype=float)
+        if X.ndim == 1:
+            key = self.key(X)
+            value = self.lookup(key)
+            if value is None:
+                value = numpy.asarray(self.evaluate(x), dtype=float).reshape(-1)
+                self.store([key], [value])
+            return value.copy()
+
+        keys = [self.key(row) for row in X]
+        values = [self.lookup(key) for key in keys]
+        missing = [i for i, value in enumerate(values) if value is None]
+        if missing:
+            computed = numpy.atleast_2d(numpy.asarray(self.evaluate(X[missing]), dtype=float))
+            self.store([keys[i] for i in missing], computed)
+            for i, value in zip(missing, computed):
+                values[i] = value
+        return numpy.array(values)
+
+    def cached_map(self, map_):
+        """
+        Wraps a map (e.g. evaluation.Evaluator.map): map(cache, items) looks the items up and sends only
+        the missing ones to map_ with the underlying evaluate. Other functions go to map_ unchanged.
+        """
+        def cached(func, *iterables):
+            if func is not self:
+                return map_(func, *iterables)
+            items = list(iterables[0])
+            keys = [self.key(item) for item in items]
+            values = [self.lookup(key) for key in keys]
+            missing = [i for i, value in enumerate(values) if value is None]
+            if missing:
+                computed = list(map_(self.evaluate, [items[i] for i in missing]))
+                self.store([keys[i] for i in missing], computed)
+                for i, value in zip(missing, computed):
+                    values[i] = numpy.asarray(value, dtype=float)
+            return [value.copy() for value in values]
+        return cached
+
+    def cached_submit(self, submit):
+        """Wraps a submit (e.g. evaluation.Evaluator.submit): a hit returns a future already done."""
+        def cached(func, *args):
+            if func is not self:
+                return submit(func, *args)
+            key = self.key(args[0])
+            value = self.lookup(key)
+            if value is not None:
+                future = Future()
+                future.set_result(value.copy())
+                return future
+            future = submit(self.evaluate, *args)
+            future.add_done_callback(lambda done: done.exception() or self.store([key], [done.result()]))
+            return future
+        return cached
+
+    def close(self):
+        if self.db is not None:
+            self.db.close()
+            self.db = None
+
+    def __getstate__(self):
+        # a copy sent to another process keeps the fitnesses in memory but not the connection
+        state = self.__dict__.copy()
+        state["lock"] = None
+        state["db"] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
+        if self.path is not None:
+            self.db = sqlite3.connect(self.path, check_same_thread=False)
+
+
+def cache_from_config(cfg, problem):
+    """
+    EvaluationCache of problem.evaluate with the `cache_size`, `cache_tolerance` and `cache_path` keys of
+    a config, None if `cache` is false. The keys are specific to the problem and its dimensions.
+    """
+    if not cfg.get('cache', False):
+        return None
+    namespace = "{}/{}/{}".format(problem.name, problem.n_var, problem.n_obj)
+    return EvaluationCache(problem.evaluate, cfg.get('cache_size', 100000), cfg.get('cache_tolerance', 0.0),
+                           cfg.get('cache_path'), namespace)
@@ -0,0 +1,149 @@
+"""
+Checkpoints of the state of a run, written in the background and restored to resume the run.
+
+    checkpointer = Checkpointer("run.npz", every=10)
+    saved = checkpointer.load()                     # None when there is no checkpoint
+    ...
+    for gen in range(start, max_gen):
+        ...
+        if checkpointer.due(gen):
+            checkpointer.save({"X": X, "F": F}, {"gen": gen, "rng": rng_state(), "logbook": logbook})
+    checkpointer.close()
+
+A checkpoint is a single .npz file: the arrays (decision variables, objectives, weights, ...) are
+stored as numpy blocks and the other python objects (counters, random states, logbook) are pickled
+into one more uint8 block. The arrays are copied and the state pickled by save, in the calling
+thread, then the file is written by a background thread to a temporary file renamed over the
+previous checkpoint, so a killed run always leaves a complete checkpoint.
+"""
+import os
+import pickle
+import random
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy
+
+_STATE = "_state"
+
+
+def rng_state():
+    """States of the random and numpy.random generators."""
+    return {"random": random.getstate(), "numpy": numpy.random.get_state()}
+
+
+def set_rng_state(state):
+    random.setstate(state["random"])
+    numpy.random.set_state(state["numpy"])
+
+
+def individuals_arrays(individuals):
+    """
+    Decision variables, objectives (NaN rows for invalid fitnesses) and crowding distances (NaN when
+    not assigned) of a list of individuals, as three arrays.
+    """
+    n_objectives = len(individuals[0].fitness.weights)
+    X = numpy.array(individuals, dtype=float)
+    F = numpy.array([ind.fitness.values if ind.fitness.valid else [numpy.nan] * n_objectives
+                     for ind in individuals], dtype=float)
+    crowding = numpy.array([getattr(ind.fitness, "crowding_dist", numpy.nan) for ind in individuals], dtype=float)
+    return X, F, crowding
+
+
+def arrays_individuals(individual_class, X, F, crowding=None):
+    """Inverse of individuals_arrays."""
+    individuals = []
+    for i, (x, f) in enumerate(zip(X, F)):
+        ind = individual_class(x.tolist())
+        if not numpy.any(numpy.isnan(f)):
+            ind.fitness.values = tuple(f)
+        if crowding is not None and not numpy.isnan(crowding[i]):
+            ind.fitness.crowding_dist = float(crowding[i])
+        individuals.append(ind)
+    return individuals
+
+
+def _blocks(arrays, state):
+    blocks = {name: numpy.array(value) for name, value in arrays.items()}
+    blocks[_STATE] = numpy.frombuffer(pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL), dtype=numpy.uint8)
+    return blocks
+
+
+def _write_blocks(path, blocks):
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix=".checkpoint-", suffix=".npz")
+    try:
+        # mkstemp creates the file readable by its owner only
+        os.chmod(tmp, 0o644)
+        with os.fdopen(fd, "wb") as f:
+            numpy.savez(f, **blocks)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        os.remove(tmp)
+        raise
+
+
+def write_checkpoint(path, arrays, state):
+    """Writes the arrays and the pickled state to path (.npz) atomically."""
+    _write_blocks(path, _blocks(arrays, state))
+
+
+def read_checkpoint(path):
+    """Returns the arrays and the state written by write_checkpoint."""
+    with numpy.load(path, allow_pickle=False) as data:
+        arrays = {name: data[name] for name in data.files if name != _STATE}
+        state = pickle.loads(data[_STATE].tobytes())
+    return arrays, state
+
+
+class Checkpointer(object):
+
+    def __init__(self, path=None, every=1):
+        """
+        path  : checkpoint file (.npz), None disables the checkpoints
+        every : number of generations (sweeps for MOEA/D) between two checkpoints
+        """
+        self.path = path
+        self.every = max(1, int(every))
+        self._executor = None
+        self._pending = None
+
+    @property
+    def enabled(self):
+        return self.path is not None
+
+    def due(self, gen):
+        return self.enabled and gen % self.every == 0
+
+    def save(self, arrays, state):
+        """
+        Snapshots the arrays and the state and writes them in the background. A previous write still in
+        progress is waited for first, so the checkpoints are written in order.
+        """
+        if not self.enabled:
+            return
+        blocks = _blocks(arrays, state)
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1)
+        self.wait()
+        self._pending = self._executor.submit(_write_blocks, self.path, blocks)
+
+    def wait(self):
+        """Waits for the write in progress, if any (and raises its error)."""
+        if self._pending is not None:
+            pending, self._pending = self._pending, None
+            pending.result()
+
+    def load(self):
+        """Returns (arrays, state) of the checkpoint file, None if there is none."""
+        if not self.enabled or not os.path.exists(self.path):
+            return None
+        return read_checkpoint(self.path)
+
+    def close(self):
+        self.wait()
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
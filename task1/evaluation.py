@@ -0,0 +1,105 @@
+"""
+Evaluation backends for the drivers. An Evaluator replaces the toolbox map:
+
+    evaluator = Evaluator("process", workers=8, chunksize=4)
+    toolbox.register("map", evaluator.map)
+    fitnesses = toolbox.map(toolbox.evaluate, invalid_ind)
+
+Individuals are sent to the workers as plain lists, so the creator classes do not have to be
+importable in the worker processes. The time spent in map is accumulated and read with lap(),
+once per generation.
+
+submit schedules a single evaluation and returns a future, for the asynchronous loops:
+
+    toolbox.register("submit", evaluator.submit)
+    future = toolbox.submit(toolbox.evaluate, child)
+"""
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+
+BACKENDS = ("serial", "thread", "process")
+
+
+def _plain(item):
+    # creator.Individual -> list, everything else is sent as is
+    if hasattr(item, "fitness"):
+        return list(item)
+    return item
+
+
+class Evaluator(object):
+
+    def __init__(self, backend="serial", workers=None, chunksize=1):
+        """
+        backend   : "serial", "thread" or "process"
+        workers   : number of threads/processes, None uses the executor default (number of cores)
+        chunksize : number of items sent to a worker process at once
+        """
+        if backend not in BACKENDS:
+            print("Evaluator: unknown backend", backend)
+            raise ValueError("backend must be one of {}".format(BACKENDS))
+        self.backend = backend
+        self.workers = workers
+        self.chunksize = max(1, int(chunksize))
+        self.executor = None
+        if backend == "thread":
+            self.executor = ThreadPoolExecutor(max_workers=workers)
+        elif backend == "process":
+            self.executor = ProcessPoolExecutor(max_workers=workers)
+
+        # wall time spent in map since the last lap / since creation
+        self.elapsed = 0.0
+        self.total = 0.0
+
+    def map(self, func, *iterables):
+        start = time.perf_counter()
+        if self.executor is None:
+            results = list(map(func, *iterables))
+        else:
+            iterables = [[_plain(item) for item in iterable] for iterable in iterables]
+            results = list(self.executor.map(func, *iterables, chunksize=self.chunksize))
+        spent = time.perf_counter() - start
+        self.elapsed += spent
+        self.total += spent
+        return results
+
+    def submit(self, func, *args):
+        """
+        Schedules func(*args) and returns a concurrent.futures.Future. The serial backend calls func at
+        once and returns a future that is already done.
+        """
+        if self.executor is None:
+            future = Future()
+            try:
+                future.set_result(func(*args))
+            except Exception as e:
+                future.set_exception(e)
+            return future
+        return self.executor.submit(func, *[_plain(arg) for arg in args])
+
+    def lap(self):
+        """Returns the evaluation wall time since the previous call."""
+        elapsed, self.elapsed = self.elapsed, 0.0
+        return elapsed
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __getstate__(self):
+        # the executor cannot be pickled, a copy sent to a worker evaluates serially
+        state = self.__dict__.copy()
+        state["executor"] = None
+        return state
+
+
+def from_config(cfg):
+    """Builds the Evaluator described by the `evaluator`, `workers` and `chunksize` keys of a config."""
+    return Evaluator(cfg.get("evaluator", "serial"), cfg.get("workers") or None, cfg.get("chunksize", 1))
@@ -0,0 +1,177 @@
+"""
+Hypervolume indicator of a changing set of points (minimization).
+
+    hv = HypervolumeIndicator([11.0, 11.0])
+    for gen in ...:
+        value = hv.update(pop)
+
+In 2-D and 3-D the volume is exact and recomputed by every update that changes the points (sorted
+staircase in 2-D, sweep of the third objective in 3-D), which costs about as much as deap's
+hypervolume. With more objectives the volume is a Monte-Carlo estimate on a fixed sample of the box
+[lower, ref_point], lower being the ideal point of the points: only the points that entered or left
+the set since the previous update are processed, the samples are drawn again when a point gets
+below the lower corner.
+
+igd(F, front) is the inverted generational distance of the objectives F to a reference front.
+"""
+import bisect
+from collections import Counter
+
+import numpy
+
+# Number of boolean entries of the dominance block computed at once by the Monte-Carlo estimate
+SAMPLE_BLOCK = 2 ** 23
+
+
+def _hv2d(points, ref):
+    """Exact hypervolume of 2-D points (n x 2 array) strictly better than ref."""
+    if len(points) == 0:
+        return 0.0
+    points = points[numpy.lexsort((points[:, 1], points[:, 0]))]
+    # keep the staircase: each point must improve the best second objective seen so far
+    best = numpy.minimum.accumulate(points[:, 1])
+    keep = numpy.ones(len(points), dtype=bool)
+    keep[1:] = points[1:, 1] < best[:-1]
+    front = points[keep]
+    widths = numpy.append(front[1:, 0], ref[0]) - front[:, 0]
+    return float(numpy.sum(widths * (ref[1] - front[:, 1])))
+
+
+class _Staircase(object):
+    """2-D non-dominated front with its dominated area, updated on insertion."""
+
+    def __init__(self, ref):
+        self.ref = ref
+        self.xs = []
+        self.ys = []
+        self.area = 0.0
+
+    def _term(self, i):
+        next_x = self.xs[i + 1] if i + 1 < len(self.xs) else self.ref[0]
+        return (next_x - self.xs[i]) * (self.ref[1] - self.ys[i])
+
+    def insert(self, x, y):
+        pos = bisect.bisect_left(self.xs, x)
+        if pos > 0 and self.ys[pos - 1] <= y:
+            return
+        if pos < len(self.xs) and self.xs[pos] == x and self.ys[pos] <= y:
+            return
+        end = pos
+        while end < len(self.xs) and self.ys[end] >= y:
+            end += 1
+        removed = sum(self._term(i) for i in range(pos - 1 if pos > 0 else pos, end))
+        del self.xs[pos:end]
+        del self.ys[pos:end]
+        self.xs.insert(pos, x)
+        self.ys.insert(pos, y)
+        added = sum(self._term(i) for i in range(pos - 1 if pos > 0 else pos, pos + 1))
+        self.area += added - removed
+
+
+def _hv3d(points, ref):
+    """Exact hypervolume of 3-D points (n x 3 array) strictly better than ref, by sweeping the third objective."""
+    if len(points) == 0:
+        return 0.0
+    points = points[numpy.argsort(points[:, 2], kind="stable")]
+    stairs = _Staircase(ref)
+    volume = 0.0
+    for i in range(len(points)):
+        stairs.insert(points[i, 0], points[i, 1])
+        next_z = points[i + 1, 2] if i + 1 < len(points) else ref[2]
+        volume += stairs.area * (next_z - points[i, 2])
+    return volume
+
+
+class HypervolumeIndicator(object):
+
+    def __init__(self, ref_point, lower=None, samples=100000, seed=None):
+        """
+        ref_point : reference point, as for deap.benchmarks.tools.hypervolume
+        lower     : lower corner of the sampled box for more than 3 objectives (default: the ideal
+                    point of the first points tracked), moved down when a point gets below it
+        samples   : number of Monte-Carlo samples for more than 3 objectives
+        """
+        self.ref = numpy.asarray(ref_point, dtype=float)
+        self.n_objectives = len(self.ref)
+        self.points = Counter()
+        self.volume = 0.0
+
+        self.exact = self.n_objectives <= 3
+        if not self.exact:
+            self.lower = None if lower is None else numpy.asarray(lower, dtype=float)
+            self.n_samples = samples
+            self.rng = numpy.random.RandomState(seed)
+            self.samples = None
+
+    def _hv(self, points):
+        if self.n_objectives == 1:
+            return float(self.ref[0] - points[:, 0].min()) if len(points) else 0.0
+        if self.n_objectives == 2:
+            return _hv2d(points, self.ref)
+        return _hv3d(points, self.ref)
+
+    def _draw(self, ideal):
+        """Draws the samples of the box [lower, ref_point], lower being moved down to ideal if needed."""
+        self.lower = ideal if self.lower is None else numpy.minimum(self.lower, ideal)
+        # one contiguous column per objective
+        self.samples = numpy.asfortranarray(self.lower + self.rng.rand(self.n_samples, self.n_objectives)
+                                            * (self.ref - self.lower))
+        self.box = float(numpy.prod(self.ref - self.lower))
+        # number of tracked points dominating each sample
+        self.counts = numpy.zeros(self.n_samples, dtype=numpy.int32)
+
+    def _sample(self, points, step):
+        """Adds step to the counts of the samples dominated by each of the points (rows of an array)."""
+        points = numpy.asarray(points, dtype=float).reshape(-1, self.n_objectives)
+        rows = max(1, SAMPLE_BLOCK // len(self.samples))
+        for start in range(0, len(points), rows):
+            block = points[start:start + rows]
+            dominated = block[:, 0, numpy.newaxis] <= self.samples[:, 0]
+            for j in range(1, self.n_objectives):
+                dominated &= block[:, j, numpy.newaxis] <= self.samples[:, j]
+            self.counts += step * dominated.sum(axis=0, dtype=numpy.int32)
+        self.volume = self.box * numpy.count_nonzero(self.counts) / len(self.samples)
+
+    def reset(self, points):
+        """Replaces the tracked points and recomputes the volume from scratch."""
+        self.points = Counter(tuple(p) for p in points)
+        values = numpy.array(list(self.points), dtype=float).reshape(-1, self.n_objectives)
+        if self.exact:
+            self.volume = self._hv(values[numpy.all(values < self.ref, axis=1)])
+            return self.volume
+        if not len(values):
+            self.volume = 0.0
+            return self.volume
+        self._draw(values.min(axis=0))
+        self._sample(list(self.points.elements()), 1)
+        return self.volume
+
+    def update(self, population):
+        """
+        Tracks the objective vectors of the population (individuals with a fitness, minimized as in
+        deap's hypervolume) and returns the hypervolume of the population.
+        """
+        points = Counter(tuple(-w for w in ind.fitness.wvalues) for ind in population)
+        if points == self.points:
+            return self.volume
+        if self.exact:
+            return self.reset(points.elements())
+        ideal = numpy.array(list(points), dtype=float).min(axis=0)
+        if self.samples is None or numpy.any(ideal < self.lower):
+            return self.reset(points.elements())
+        self._sample(list((self.points - points).elements()), -1)
+        self._sample(list((points - self.points).elements()), 1)
+        self.points = points
+        return self.volume
+
+
+def igd(F, front):
+    """
+    Inverted generational distance: mean over the points of the reference front (shape (p, m)) of
+    the euclidean distance to the nearest row of F (shape (n, m)).
+    """
+    F = numpy.asarray(F, dtype=float)
+    front = numpy.asarray(front, dtype=float)
+    # |a - b|^2 = |a|^2 + |b|^2 - 2 a.b, without the (p, n, m) array of the differences
+    d2 = (front ** 2).sum(axis=1)[:, numpy.newaxis] + (F ** 2).sum(axis=1) - 2.0 * front.dot(F.T)
+    return float(numpy.sqrt(numpy.maximum(d2.min(axis=1), 0.0)).mean())
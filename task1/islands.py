@@ -0,0 +1,265 @@
+"""
+Island model: several NSGA-II / NSGA-III populations evolving in separate processes and exchanging
+their best individuals every `migration_interval` generations.
+
+    python islands.py NSGA2/base_nsga2.yaml --islands 4 --topology ring --interval 10 --migrants 5
+
+Each island runs the driver of the config (nsga2.run or nsga3.run, whole loop: selection, variation
+and evaluation) with the seed seed + index, and a Migration hook. At a migration generation the hook
+sends the chosen emigrants (decision variables and objectives, as numpy arrays) to the inboxes of the
+destination islands ("ring": the next island, "full": all the others), then waits for the migrants
+of its sources, which go through the environmental selection with the population. The emigrants are
+the first individuals of the non-dominated sorting ("front", ties broken by crowding distance) or
+random individuals ("random"). The final populations are merged into a global front.
+
+An island raising an exception reports it to run_islands and sends a FAILED message to every inbox,
+the islands waiting for migrants stop with a MigrationError. run_islands then terminates the islands
+still running and raises the exception of the island (a RuntimeError for an island killed without
+reporting one, e.g. by a signal).
+
+The output paths of the config (checkpoint, results, trace, cache_path, profile_output) get the
+index of the island before their extension, e.g. run.pkl becomes run_island0.pkl, run_island1.pkl, ... so the
+islands neither overwrite nor resume from the files of each other.
+
+The island keys of a config (islands, topology, migration_interval, migrants, migrant_selection)
+are the defaults of the command line.
+"""
+import argparse
+import multiprocessing
+import os
+import pickle
+import queue
+import sys
+
+import numpy
+import yaml
+from deap import tools
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from checkpoint import arrays_individuals, individuals_arrays
+from population import ArrayPopulation
+from problems import individual_class
+from runner import ALGORITHMS, suffixed_config
+from sorting import crowding_distances, nondominated_ranks, sort_nondominated
+from termination import TERMINATION_KEYS, termination_from_config
+
+TOPOLOGIES = ("ring", "full")
+SELECTIONS = ("front", "random")
+# generation of the message sent to the inboxes by a failed island
+FAILED = -1
+# seconds between two checks of the island processes while waiting for their results
+POLL_INTERVAL = 1.0
+
+
+class MigrationError(RuntimeError):
+    """Raised in an island waiting for the migrants of an island which failed."""
+
+
+def destinations(index, n_islands, topology):
+    """Islands receiving the emigrants of island index."""
+    if topology == "ring":
+        return [(index + 1) % n_islands] if n_islands > 1 else []
+    return [i for i in range(n_islands) if i != index]
+
+
+def island_config(cfg, index):
+    """Config of the island index, its output paths suffixed by the index (see the module docstring)."""
+    return suffixed_config(cfg, "island{}".format(index))
+
+
+def population_arrays(population):
+    """Decision variables and objectives of a list of individuals or an ArrayPopulation."""
+    if isinstance(population, ArrayPopulation):
+        return population.X, population.F
+    X, F, _ = individuals_arrays(population)
+    return X, F
+
+
+def select_migrants(F, k, selection="front", rng=numpy.random):
+    """Indexes of the k emigrants among the objectives F (minimized)."""
+    k = min(k, len(F))
+    if selection == "random":
+        return rng.choice(len(F), k, replace=False)
+    ranks = nondominated_ranks(-F)
+    crowding = numpy.empty(len(F))
+    for rank in numpy.unique(ranks):
+        front = numpy.flatnonzero(ranks == rank)
+        crowding[front] = crowding_distances(F[front])
+    # lowest rank first, most isolated first within a front
+    return numpy.lexsort((-crowding, ranks))[:k]
+
+
+class Migration(object):
+
+    def __init__(self, index, inboxes, topology="ring", interval=10, migrants=5, selection="front", seed=None):
+        """
+        index    : index of the island
+        inboxes  : one multiprocessing queue per island, receiving (gen, source, X, F) messages
+        """
+        if topology not in TOPOLOGIES:
+            print("Migration: unknown topology", topology)
+            raise ValueError("topology must be one of {}".format(TOPOLOGIES))
+        if selection not in SELECTIONS:
+            print("Migration: unknown migrant selection", selection)
+            raise ValueError("selection must be one of {}".format(SELECTIONS))
+        self.index = index
+        self.inboxes = inboxes
+        self.destinations = destinations(index, len(inboxes), topology)
+        self.sources = sum(index in destinations(i, len(inboxes), topology) for i in range(len(inboxes)))
+        self.interval = max(1, int(interval))
+        self.migrants = migrants
+        self.selection = selection
+        # own generator, the migrations do not change the random streams of the loop
+        self.rng = numpy.random.RandomState(seed)
+        # messages of later migrations received early
+        self.early = {}
+
+    def __call__(self, gen, pop):
+        if gen % self.interval != 0 or not self.destinations:
+            return None
+        X, F = population_arrays(pop)
+        chosen = select_migrants(F, self.migrants, self.selection, self.rng)
+        for destination in self.destinations:
+            self.inboxes[destination].put((gen, self.index, X[chosen], F[chosen]))
+
+        received = self.early.pop(gen, [])
+        while len(received) < self.sources:
+            message = self.inboxes[self.index].get()
+            if message[0] == FAILED:
+                raise MigrationError("island {} failed".format(message[1]))
+            if message[0] == gen:
+                received.append(message)
+            else:
+                self.early.setdefault(message[0], []).append(message)
+        # same order whatever the arrival order
+        received.sort(key=lambda message: message[1])
+        return (numpy.concatenate([message[2] for message in received]),
+                numpy.concatenate([message[3] for message in received]))
+
+    def fail(self):
+        """Tells all the islands that this one failed (its migrants will not come)."""
+        for inbox in self.inboxes:
+            inbox.put((FAILED, self.index, None, None))
+
+
+def _island(cfg, seed, migration, results):
+    try:
+        pop, logbook = ALGORITHMS[cfg['algorithm_name']](cfg, seed, False, migration=migration)
+    except MigrationError:
+        # stopped by the failure of another island, reported by that island
+        return
+    except Exception as e:
+        try:
+            pickle.dumps(e)
+        except Exception:
+            e = RuntimeError(repr(e))
+        results.put((migration.index, e))
+        migration.fail()
+        return
+    X, F = population_arrays(pop)
+    results.put((migration.index, X, F, logbook))
+
+
+def _collect(processes, results):
+    """
+    Results of the island processes sorted by island. Terminates the other islands and raises the
+    exception of the first island which fails.
+    """
+    finished = {}
+    while len(finished) < len(processes):
+        try:
+            result = results.get(timeout=POLL_INTERVAL)
+        except queue.Empty:
+            # an island killed without reporting an exception (a normal exit has already sent its result)
+            crashed = [index for index, process in enumerate(processes)
+                       if index not in finished and process.exitcode not in (None, 0)]
+            if not crashed:
+                continue
+            result = (crashed[0], RuntimeError("island {} exited with code {}".format(
+                crashed[0], processes[crashed[0]].exitcode)))
+        if len(result) == 2:
+            for process in processes:
+                if process.is_alive():
+                    process.terminate()
+                process.join()
+            print("run_islands: island", result[0], "failed")
+            raise result[1]
+        finished[result[0]] = result
+    return [finished[index] for index in sorted(finished)]
+
+
+def run_islands(cfg, seed=None, verbose=True, islands=None, topology=None, interval=None, migrants=None,
+                selection=None):
+    """
+    Runs the islands of cfg (the arguments override the island keys of cfg) and merges their final
+    populations. Returns the global front and a logbook with, for every generation, the evaluations of
+    all the islands and the best hypervolume of an island.
+    """
+    if cfg.get('algorithm_name') not in ("NSGA2", "NSGA3"):
+        print("run_islands: unsupported algorithm", cfg.get('algorithm_name'))
+        raise ValueError("the island model runs NSGA2 or NSGA3")
+    islands = islands or cfg.get('islands', 4)
+    topology = topology or cfg.get('topology', "ring")
+    interval = interval or cfg.get('migration_interval', 10)
+    migrants = migrants or cfg.get('migrants', 5)
+    selection = selection or cfg.get('migrant_selection', "front")
+    if seed is None:
+        seed = cfg.get('seed')
+    # the islands already use the cores, they evaluate serially
+    cfg = dict(cfg, evaluator="serial")
+    # the islands run in step through the migrations, none of them stops early
+    if verbose and termination_from_config(cfg) is not None:
+        print("run_islands: the termination criteria are ignored by the island model")
+    cfg = {key: value for key, value in cfg.items() if key not in TERMINATION_KEYS}
+
+    inboxes = [multiprocessing.Queue() for _ in range(islands)]
+    results = multiprocessing.Queue()
+    processes = []
+    for index in range(islands):
+        island_seed = None if seed is None else seed + index
+        migration = Migration(index, inboxes, topology, interval, migrants, selection, island_seed)
+        process = multiprocessing.Process(target=_island,
+                                          args=(island_config(cfg, index), island_seed, migration, results))
+        process.start()
+        processes.append(process)
+
+    # read the results before joining, a process does not end while its queue holds data
+    finished = _collect(processes, results)
+    for process in processes:
+        process.join()
+
+    X = numpy.concatenate([result[1] for result in finished])
+    F = numpy.concatenate([result[2] for result in finished])
+    Individual = individual_class(F.shape[1])
+    pop = arrays_individuals(Individual, X, F)
+    front = sort_nondominated(pop, len(pop), first_front_only=True)[0]
+
+    logbook = tools.Logbook()
+    logbook.header = ['gen', 'evals', 'hv']
+    for records in zip(*[result[3] for result in finished]):
+        logbook.record(gen=records[0]['gen'], evals=sum(record['evals'] for record in records),
+                       hv=max(record['hv'] for record in records))
+    if verbose:
+        print(logbook.stream)
+        print('{} islands, global front of {} individuals'.format(islands, len(front)))
+    return front, logbook
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Island model for NSGA2/NSGA3.")
+    parser.add_argument("config", help="YAML config of NSGA2 or NSGA3")
+    parser.add_argument("--islands", type=int, default=None)
+    parser.add_argument("--topology", choices=TOPOLOGIES, default=None)
+    parser.add_argument("--interval", type=int, default=None, help="generations between two migrations")
+    parser.add_argument("--migrants", type=int, default=None, help="emigrants sent to each destination")
+    parser.add_argument("--selection", choices=SELECTIONS, default=None, help="choice of the emigrants")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    with open(args.config, encoding='utf-8') as f:
+        cfg = yaml.load(f.read(), Loader=yaml.FullLoader)
+    run_islands(cfg, args.seed, True, args.islands, args.topology, args.interval, args.migrants, args.selection)
+
+
+if __name__ == "__main__":
+    main()
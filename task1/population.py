@@ -0,0 +1,223 @@
+"""
+Array-backed population: decision variables and objectives of the whole population are two
+contiguous 2-D numpy arrays instead of a list of creator.Individual.
+
+The variation operators work on row arrays and are registered in the toolbox in place of the
+list based ones:
+
+    toolbox.register("mate", cx_simulated_binary_bounded, eta=20.0, low=LOW, up=UP)
+    toolbox.register("mutate", mut_polynomial_bounded, eta=20.0, low=LOW, up=UP, indpb=1.0/NDIM)
+    toolbox.register("select", array_selection(tools.selNSGA2))
+
+    pop = ArrayPopulation.from_individuals(pop)
+    offsprings = var_and(pop, toolbox, cx_prob, mutate_prob)
+    offsprings.evaluate(toolbox.evaluate, toolbox.map)
+
+Iterating over an ArrayPopulation yields lightweight rows carrying a fitness, so the deap
+selection operators, Statistics and the hypervolume work on it unchanged.
+"""
+import numpy
+
+
+def cx_simulated_binary_bounded(X1, X2, eta, low, up, rng=numpy.random):
+    """
+    Simulated binary crossover of the rows of X1 with the rows of X2 (same as
+    tools.cxSimulatedBinaryBounded applied pairwise), modifying both arrays in place.
+    low and up are scalars or sequences of the size of a row.
+    """
+    low = numpy.broadcast_to(numpy.asarray(low, dtype=float), X1.shape)
+    up = numpy.broadcast_to(numpy.asarray(up, dtype=float), X1.shape)
+    cross = (rng.random(X1.shape) <= 0.5) & (numpy.abs(X1 - X2) > 1e-14)
+    if not numpy.any(cross):
+        return X1, X2
+
+    x1 = numpy.minimum(X1, X2)[cross]
+    x2 = numpy.maximum(X1, X2)[cross]
+    xl = low[cross]
+    xu = up[cross]
+    rand = rng.random(x1.shape)
+
+    def spread(beta):
+        alpha = 2.0 - beta ** -(eta + 1)
+        return numpy.where(rand <= 1.0 / alpha,
+                           (rand * alpha) ** (1.0 / (eta + 1)),
+                           (1.0 / numpy.abs(2.0 - rand * alpha)) ** (1.0 / (eta + 1)))
+
+    beta_q = spread(1.0 + (2.0 * (x1 - xl) / (x2 - x1)))
+    c1 = numpy.clip(0.5 * (x1 + x2 - beta_q * (x2 - x1)), xl, xu)
+    beta_q = spread(1.0 + (2.0 * (xu - x2) / (x2 - x1)))
+    c2 = numpy.clip(0.5 * (x1 + x2 + beta_q * (x2 - x1)), xl, xu)
+
+    swap = rng.random(x1.shape) <= 0.5
+    X1[cross] = numpy.where(swap, c2, c1)
+    X2[cross] = numpy.where(swap, c1, c2)
+    return X1, X2
+
+
+def mut_polynomial_bounded(X, eta, low, up, indpb, rng=numpy.random):
+    """
+    Polynomial mutation of every row of X (same as tools.mutPolynomialBounded), in place.
+    Returns X.
+    """
+    low = numpy.broadcast_to(numpy.asarray(low, dtype=float), X.shape)
+    up = numpy.broadcast_to(numpy.asarray(up, dtype=float), X.shape)
+    mutate = rng.random(X.shape) <= indpb
+    if not numpy.any(mutate):
+        return X
+
+    x = X[mutate]
+    xl = low[mutate]
+    xu = up[mutate]
+    delta_1 = (x - xl) / (xu - xl)
+    delta_2 = (xu - x) / (xu - xl)
+    rand = rng.random(x.shape)
+    mut_pow = 1.0 / (eta + 1.)
+
+    lower = rand < 0.5
+    val = numpy.where(lower,
+                      2.0 * rand + (1.0 - 2.0 * rand) * (1.0 - delta_1) ** (eta + 1),
+                      2.0 * (1.0 - rand) + 2.0 * (rand - 0.5) * (1.0 - delta_2) ** (eta + 1))
+    delta_q = numpy.where(lower, val ** mut_pow - 1.0, 1.0 - val ** mut_pow)
+    X[mutate] = numpy.clip(x + delta_q * (xu - xl), xl, xu)
+    return X
+
+
+class _Row(object):
+    """Row of an ArrayPopulation as seen by the deap operators: a read-only sequence with a fitness."""
+    __slots__ = ("index", "x", "fitness")
+
+    def __init__(self, index, x, fitness):
+        self.index = index
+        self.x = x
+        self.fitness = fitness
+
+    def __len__(self):
+        return len(self.x)
+
+    def __getitem__(self, i):
+        return self.x[i]
+
+    def __iter__(self):
+        return iter(self.x)
+
+    def __repr__(self):
+        return repr(self.x.tolist())
+
+
+class ArrayPopulation(object):
+
+    def __init__(self, X, fitness_class, F=None, crowding=None):
+        """
+        X             : decision variables, shape (N, D)
+        fitness_class : deap Fitness class giving the weights (e.g. creator.MultiObjective_Min)
+        F             : objectives, shape (N, M), NaN rows are not evaluated
+        """
+        self.X = numpy.array(X, dtype=float, ndmin=2)
+        n_objectives = len(fitness_class.weights)
+        if F is None:
+            F = numpy.full((len(self.X), n_objectives), numpy.nan)
+        self.F = numpy.array(F, dtype=float, ndmin=2).reshape(len(self.X), n_objectives)
+        self.fitness_class = fitness_class
+        # crowding distance assigned by the last selection, read by selTournamentDCD
+        self.crowding = numpy.full(len(self.X), numpy.nan) if crowding is None else crowding
+
+    @classmethod
+    def from_individuals(cls, individuals):
+        fitness_class = type(individuals[0].fitness)
+        F = [ind.fitness.values if ind.fitness.valid else [numpy.nan] * len(fitness_class.weights)
+             for ind in individuals]
+        return cls(numpy.array(individuals, dtype=float), fitness_class, F)
+
+    def to_individuals(self, individual_class):
+        individuals = []
+        for x, f in zip(self.X, self.F):
+            ind = individual_class(x.tolist())
+            if not numpy.any(numpy.isnan(f)):
+                ind.fitness.values = tuple(f)
+            individuals.append(ind)
+        return individuals
+
+    @property
+    def invalid(self):
+        """Mask of the rows that have to be evaluated."""
+        return numpy.any(numpy.isnan(self.F), axis=1)
+
+    def evaluate(self, evaluate, map=None):
+        """
+        Evaluates the invalid rows. Without map, evaluate is called once on the 2-D array of these
+        rows (e.g. problems.Problem.evaluate), otherwise map(evaluate, rows) is used (e.g. toolbox.map).
+        Returns the number of evaluations.
+        """
+        rows = numpy.flatnonzero(self.invalid)
+        if len(rows):
+            if map is None:
+                self.F[rows] = evaluate(self.X[rows])
+            else:
+                self.F[rows] = numpy.array(list(map(evaluate, self.X[rows])), dtype=float)
+        return len(rows)
+
+    def rows(self):
+        rows = []
+        for i, f in enumerate(self.F):
+            fitness = self.fitness_class()
+            if not numpy.any(numpy.isnan(f)):
+                fitness.values = tuple(f)
+            if not numpy.isnan(self.crowding[i]):
+                fitness.crowding_dist = self.crowding[i]
+            rows.append(_Row(i, self.X[i], fitness))
+        return rows
+
+    def take(self, index, crowding=None):
+        index = numpy.asarray(index, dtype=int)
+        return ArrayPopulation(self.X[index], self.fitness_class, self.F[index],
+                               self.crowding[index] if crowding is None else crowding)
+
+    def copy(self):
+        return ArrayPopulation(self.X.copy(), self.fitness_class, self.F.copy(), self.crowding.copy())
+
+    def __add__(self, other):
+        return ArrayPopulation(numpy.vstack((self.X, other.X)), self.fitness_class, numpy.vstack((self.F, other.F)),
+                               numpy.concatenate((self.crowding, other.crowding)))
+
+    def __len__(self):
+        return len(self.X)
+
+    def __iter__(self):
+        return iter(self.rows())
+
+
+def array_selection(selector):
+    """
+    Wraps a deap selection operator (tools.selNSGA2, tools.selTournamentDCD, ...) so that it takes and
+    returns an ArrayPopulation. The crowding distances assigned by the operator are kept.
+    """
+    def select(population, k, **kargs):
+        chosen = selector(population.rows(), k, **kargs)
+        crowding = numpy.array([getattr(row.fitness, "crowding_dist", numpy.nan) for row in chosen], dtype=float)
+        return population.take([row.index for row in chosen], crowding)
+    return select
+
+
+def var_and(population, toolbox, cxpb, mutpb, rng=numpy.random):
+    """
+    Same as algorithms.varAnd on an ArrayPopulation: consecutive rows are mated with probability cxpb
+    and every row is mutated with probability mutpb. toolbox.mate and toolbox.mutate must be the array
+    operators of this module. The modified rows are invalidated.
+    """
+    offspring = population.copy()
+    X = offspring.X
+
+    mated = numpy.arange(1, len(offspring), 2)
+    mated = mated[rng.random(len(mated)) < cxpb]
+    if len(mated):
+        X1, X2 = toolbox.mate(X[mated - 1], X[mated])
+        X[mated - 1] = X1
+        X[mated] = X2
+        offspring.F[mated - 1] = numpy.nan
+        offspring.F[mated] = numpy.nan
+
+    mutants = numpy.flatnonzero(rng.random(len(offspring)) < mutpb)
+    if len(mutants):
+        X[mutants] = toolbox.mutate(X[mutants])
+        offspring.F[mutants] = numpy.nan
+    return offspring
@@ -0,0 +1,235 @@
+"""
+Problem registry shared by the drivers.
+
+    problem = get_problem("zdt1", n_var=30)
+    toolbox.register("evaluate", problem.evaluate)
+    F = problem.evaluate(X)                  # X of shape (N, n_var), F of shape (N, n_obj)
+    front = problem.pareto_front(100)
+
+The ZDT (ZDT1-4, ZDT6) and DTLZ (DTLZ1-7) objectives are evaluated with numpy on whole batches,
+one row per individual. problem.evaluate also accepts a single individual (a list or 1-D array),
+which makes it the evaluation function of a DEAP toolbox, and returns its objective vector.
+The bounds of the decision variables come from the `domain` table and the Pareto fronts are
+computed from their analytic expressions.
+"""
+import numpy
+from deap import base, creator
+
+from sorting import nondominated_ranks
+from weights import das_dennis, lattice_divisions
+
+
+def _unit(n_var):
+    return [[0] * n_var, [1] * n_var]
+
+
+domain = {'zdt1': _unit,
+          'zdt2': _unit,
+          'zdt3': _unit,
+          'zdt4': lambda n_var: [[0] + [-5] * (n_var - 1), [1] + [5] * (n_var - 1)],
+          'zdt6': _unit,
+          'dtlz1': _unit,
+          'dtlz2': _unit,
+          'dtlz3': _unit,
+          'dtlz4': _unit,
+          'dtlz5': _unit,
+          'dtlz6': _unit,
+          'dtlz7': _unit}
+
+
+# ZDT, X of shape (N, n_var)
+
+def zdt1(X, n_obj=2):
+    f1 = X[:, 0]
+    g = 1.0 + 9.0 / (X.shape[1] - 1) * X[:, 1:].sum(axis=1)
+    return numpy.column_stack([f1, g * (1.0 - numpy.sqrt(f1 / g))])
+
+
+def zdt2(X, n_obj=2):
+    f1 = X[:, 0]
+    g = 1.0 + 9.0 / (X.shape[1] - 1) * X[:, 1:].sum(axis=1)
+    return numpy.column_stack([f1, g * (1.0 - (f1 / g) ** 2)])
+
+
+def zdt3(X, n_obj=2):
+    f1 = X[:, 0]
+    g = 1.0 + 9.0 / (X.shape[1] - 1) * X[:, 1:].sum(axis=1)
+    return numpy.column_stack([f1, g * (1.0 - numpy.sqrt(f1 / g) - f1 / g * numpy.sin(10.0 * numpy.pi * f1))])
+
+
+def zdt4(X, n_obj=2):
+    f1 = X[:, 0]
+    Y = X[:, 1:]
+    g = 1.0 + 10.0 * Y.shape[1] + (Y * Y - 10.0 * numpy.cos(4.0 * numpy.pi * Y)).sum(axis=1)
+    return numpy.column_stack([f1, g * (1.0 - numpy.sqrt(f1 / g))])
+
+
+def zdt6(X, n_obj=2):
+    f1 = 1.0 - numpy.exp(-4.0 * X[:, 0]) * numpy.sin(6.0 * numpy.pi * X[:, 0]) ** 6
+    g = 1.0 + 9.0 * (X[:, 1:].sum(axis=1) / (X.shape[1] - 1.0)) ** 0.25
+    return numpy.column_stack([f1, g * (1.0 - (f1 / g) ** 2)])
+
+
+# DTLZ, the first n_obj - 1 variables are the position ones, the k = n_var - n_obj + 1 others the distance ones
+
+def _g1(X_M):
+    return 100.0 * (X_M.shape[1] + ((X_M - 0.5) ** 2 - numpy.cos(20.0 * numpy.pi * (X_M - 0.5))).sum(axis=1))
+
+
+def _g2(X_M):
+    return ((X_M - 0.5) ** 2).sum(axis=1)
+
+
+def _linear(X_, g):
+    # f_i = 0.5 (1 + g) x_1 ... x_{M-1-i} (1 - x_{M-i})
+    n = len(X_)
+    products = numpy.hstack([numpy.ones((n, 1)), numpy.cumprod(X_, axis=1)])
+    last = numpy.hstack([numpy.ones((n, 1)), 1.0 - X_[:, ::-1]])
+    return 0.5 * (1.0 + g)[:, numpy.newaxis] * products[:, ::-1] * last
+
+
+def _spherical(theta, g):
+    # f_i = (1 + g) cos(theta_1) ... cos(theta_{M-1-i}) sin(theta_{M-i}), theta in [0, pi / 2]
+    n = len(theta)
+    products = numpy.hstack([numpy.ones((n, 1)), numpy.cumprod(numpy.cos(theta), axis=1)])
+    last = numpy.hstack([numpy.ones((n, 1)), numpy.sin(theta[:, ::-1])])
+    return (1.0 + g)[:, numpy.newaxis] * products[:, ::-1] * last
+
+
+def _degenerate(X, g, n_obj):
+    # DTLZ5/6: every angle but the first one tends to pi / 4 as g tends to 0
+    t = (1.0 + 2.0 * g[:, numpy.newaxis] * X[:, 1:n_obj - 1]) / (2.0 * (1.0 + g[:, numpy.newaxis]))
+    return _spherical(numpy.pi / 2.0 * numpy.column_stack([X[:, 0], t]), g)
+
+
+def dtlz1(X, n_obj=3):
+    return _linear(X[:, :n_obj - 1], _g1(X[:, n_obj - 1:]))
+
+
+def dtlz2(X, n_obj=3):
+    return _spherical(numpy.pi / 2.0 * X[:, :n_obj - 1], _g2(X[:, n_obj - 1:]))
+
+
+def dtlz3(X, n_obj=3):
+    return _spherical(numpy.pi / 2.0 * X[:, :n_obj - 1], _g1(X[:, n_obj - 1:]))
+
+
+def dtlz4(X, n_obj=3, alpha=100.0):
+    return _spherical(numpy.pi / 2.0 * X[:, :n_obj - 1] ** alpha, _g2(X[:, n_obj - 1:]))
+
+
+def dtlz5(X, n_obj=3):
+    return _degenerate(X, _g2(X[:, n_obj - 1:]), n_obj)
+
+
+def dtlz6(X, n_obj=3):
+    return _degenerate(X, (X[:, n_obj - 1:] ** 0.1).sum(axis=1), n_obj)
+
+
+def dtlz7(X, n_obj=3):
+    F_ = X[:, :n_obj - 1]
+    g = 1.0 + 9.0 / (X.shape[1] - n_obj + 1) * X[:, n_obj - 1:].sum(axis=1)
+    h = n_obj - (F_ / (1.0 + g[:, numpy.newaxis]) * (1.0 + numpy.sin(3.0 * numpy.pi * F_))).sum(axis=1)
+    return numpy.column_stack([F_, (1.0 + g) * h])
+
+
+objectives = {'zdt1': zdt1, 'zdt2': zdt2, 'zdt3': zdt3, 'zdt4': zdt4, 'zdt6': zdt6,
+              'dtlz1': dtlz1, 'dtlz2': dtlz2, 'dtlz3': dtlz3, 'dtlz4': dtlz4, 'dtlz5': dtlz5,
+              'dtlz6': dtlz6, 'dtlz7': dtlz7}
+
+
+# Pareto fronts
+
+# ranges of f1 of the five pieces of the ZDT3 front
+ZDT3_REGIONS = [[0.0, 0.0830015349],
+                [0.182228780, 0.2577623634],
+                [0.4093136748, 0.4538821041],
+                [0.6183967944, 0.6525117038],
+                [0.8233317983, 0.8518328654]]
+
+
+def _zdt_front(name, n_points):
+    if name == 'zdt3':
+        lengths = numpy.array([up - low for low, up in ZDT3_REGIONS])
+        counts = numpy.maximum(2, numpy.round(n_points * lengths / lengths.sum()).astype(int))
+        f1 = numpy.concatenate([numpy.linspace(low, up, count) for (low, up), count in zip(ZDT3_REGIONS, counts)])
+        return numpy.column_stack([f1, 1.0 - numpy.sqrt(f1) - f1 * numpy.sin(10.0 * numpy.pi * f1)])
+    if name == 'zdt6':
+        f1 = numpy.linspace(0.2807753191, 1.0, n_points)
+    else:
+        f1 = numpy.linspace(0.0, 1.0, n_points)
+    if name in ('zdt2', 'zdt6'):
+        return numpy.column_stack([f1, 1.0 - f1 ** 2])
+    return numpy.column_stack([f1, 1.0 - numpy.sqrt(f1)])
+
+
+def _dtlz_front(name, n_obj, n_points):
+    if name in ('dtlz5', 'dtlz6'):
+        # a curve: the first angle spans [0, pi / 2], the other ones are pi / 4 (g = 0)
+        t = numpy.column_stack([numpy.linspace(0.0, 1.0, n_points), numpy.full((n_points, n_obj - 2), 0.5)])
+        return _spherical(numpy.pi / 2.0 * t, numpy.zeros(n_points))
+    if name == 'dtlz7':
+        # grid of the first objectives, f_M for g = 1, then the non-dominated points
+        side = max(2, int((16 * n_points) ** (1.0 / (n_obj - 1))))
+        grid = numpy.stack(numpy.meshgrid(*[numpy.linspace(0.0, 1.0, side)] * (n_obj - 1)), axis=-1)
+        F_ = grid.reshape(-1, n_obj - 1)
+        F = numpy.column_stack([F_, 2.0 * (n_obj - (F_ / 2.0 * (1.0 + numpy.sin(3.0 * numpy.pi * F_))).sum(axis=1))])
+        front = F[nondominated_ranks(-F) == 0]
+        step = max(1, len(front) // n_points)
+        return front[::step]
+    # images of the simplex-lattice with the most vectors up to n_points
+    W = das_dennis(n_obj, max(1, lattice_divisions(n_obj, n_points) - 1))
+    if name == 'dtlz1':
+        return 0.5 * W
+    return W / numpy.linalg.norm(W, axis=1)[:, numpy.newaxis]
+
+
+class Problem(object):
+
+    def __init__(self, name, n_var, n_obj=None):
+        name = name.lower()
+        if name not in domain:
+            print("get_problem: unknown problem", name)
+            raise ValueError("problem must be one of {}".format(sorted(domain)))
+        self.name = name
+        self.n_var = n_var
+        self.n_obj = 2 if name.startswith("zdt") else (n_obj or 3)
+        if name.startswith("dtlz") and n_var < self.n_obj:
+            print("get_problem: {} with {} objectives needs at least {} variables".format(name, self.n_obj, self.n_obj))
+            raise ValueError("n_var must be at least n_obj")
+        self.low, self.up = domain[name](n_var)
+        self.function = objectives[name]
+
+    def evaluate(self, x):
+        """Objectives of one individual (1-D, returns a 1-D array) or of the rows of a 2-D array."""
+        X = numpy.asarray(x, dtype=float)
+        if X.ndim == 1:
+            return self.function(X[numpy.newaxis, :], self.n_obj)[0]
+        return self.function(X, self.n_obj)
+
+    def pareto_front(self, n_points=100):
+        """
+        About n_points points of the Pareto front: evenly spaced for ZDT and the DTLZ5/6 curves, for
+        DTLZ1-4 the images of the uniform reference points with the largest number of divisions giving
+        at most n_points, for DTLZ7 the non-dominated points of a grid.
+        """
+        if self.name.startswith("zdt"):
+            return _zdt_front(self.name, n_points)
+        return _dtlz_front(self.name, self.n_obj, n_points)
+
+
+def get_problem(name, n_var, n_obj=None):
+    return Problem(name, n_var, n_obj)
+
+
+def individual_class(n_obj):
+    """
+    creator.Individual{n_obj} (a list with a minimized fitness of n_obj objectives), created on first use
+    so that the drivers can share a process whatever their number of objectives.
+    """
+    name = "Individual{}".format(n_obj)
+    if not hasattr(creator, name):
+        fitness = "FitnessMin{}".format(n_obj)
+        creator.create(fitness, base.Fitness, weights=(-1.0,) * n_obj)
+        creator.create(name, list, fitness=getattr(creator, fitness))
+    return getattr(creator, name)
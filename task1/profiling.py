@@ -0,0 +1,225 @@
+"""
+Timing of the phases of the GA loops, per generation trace and opt-in profilers.
+
+    timer = PhaseTimer(cfg.get('timing', False), ["select", "variate", "evaluate", "hv"])
+    timer.instrument(toolbox, "select", "variate")      # wraps the toolbox functions
+    with timer.phase("hv"):
+        hv = hv_indicator.update(pop)
+    logbook.record(gen=gen, **timer.lap())              # select_time, variate_time, ...
+
+When the timer is disabled, instrument and wrap leave the functions untouched, phase returns a shared
+no-op context manager and lap returns an empty dict, so the loops pay (almost) nothing.
+
+Trace writes one record per generation to a CSV (.csv) or JSON lines file, Profiler runs cProfile
+("cprofile") or a sampling profiler ("sampling") between start() and stop().
+"""
+import cProfile
+import csv
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+
+class _NullPhase(object):
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_PHASE = _NullPhase()
+
+
+class _Phase(object):
+    __slots__ = ("timer", "name", "start")
+
+    def __init__(self, timer, name):
+        self.timer = timer
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.timer.add(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class PhaseTimer(object):
+
+    def __init__(self, enabled=True, phases=()):
+        """
+        enabled : time the phases, otherwise every method is a no-op
+        phases  : names of the phases always reported by lap (0.0 when not run since the last lap)
+        """
+        self.enabled = enabled
+        self.phases = list(phases)
+        self.times = dict.fromkeys(self.phases, 0.0)
+        self.totals = dict.fromkeys(self.phases, 0.0)
+
+    @property
+    def fields(self):
+        """Logbook fields of the phases."""
+        return [name + "_time" for name in self.phases] if self.enabled else []
+
+    def add(self, name, seconds):
+        if not self.enabled:
+            return
+        if name not in self.times:
+            self.phases.append(name)
+            self.times[name] = 0.0
+            self.totals[name] = 0.0
+        self.times[name] += seconds
+        self.totals[name] += seconds
+
+    def phase(self, name):
+        """Context manager timing its block as phase name."""
+        if not self.enabled:
+            return _NULL_PHASE
+        return _Phase(self, name)
+
+    def wrap(self, name, func):
+        """Returns func timed as phase name (func itself when disabled)."""
+        if not self.enabled:
+            return func
+
+        def timed(*args, **kargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kargs)
+            finally:
+                self.add(name, time.perf_counter() - start)
+        return timed
+
+    def instrument(self, obj, *names):
+        """Replaces the functions obj.name (e.g. toolbox.select) by their timed version."""
+        if self.enabled:
+            for name in names:
+                setattr(obj, name, self.wrap(name, getattr(obj, name)))
+
+    def lap(self):
+        """Returns the time of every phase since the previous lap, as {name_time: seconds}."""
+        if not self.enabled:
+            return {}
+        times = {name + "_time": self.times[name] for name in self.phases}
+        self.times = dict.fromkeys(self.phases, 0.0)
+        return times
+
+
+def _jsonable(value):
+    return value.tolist() if hasattr(value, "tolist") else str(value)
+
+
+class Trace(object):
+    """One record (dict) per line of a CSV file (path ending with .csv) or a JSON lines file."""
+
+    def __init__(self, path=None, append=False):
+        """
+        Without path, write and close do nothing. With append (resumed runs) the records are added to
+        an existing file.
+        """
+        self.path = path
+        self.file = None
+        # an existing CSV file already has its header
+        self.header = not (append and path and os.path.exists(path) and os.path.getsize(path) > 0)
+        if path:
+            self.file = open(path, "a" if append else "w", newline="", encoding="utf-8")
+        self.writer = None
+
+    def write(self, record):
+        if self.file is None:
+            return
+        if self.path.endswith(".csv"):
+            if self.writer is None:
+                # the columns are the keys of the first record
+                self.writer = csv.DictWriter(self.file, list(record), extrasaction="ignore")
+                if self.header:
+                    self.writer.writeheader()
+            self.writer.writerow(record)
+        else:
+            self.file.write(json.dumps(record, default=_jsonable) + "\n")
+        self.file.flush()
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+class SamplingProfiler(object):
+    """
+    Samples the call stack of the thread that created it every `interval` seconds from a background
+    thread. The stacks are written in the folded format of flame graphs ("f1;f2;f3 count").
+    """
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.thread_id = threading.get_ident()
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append("{}:{}".format(code.co_filename, code.co_name))
+                frame = frame.f_back
+            self.stacks[";".join(reversed(stack))] += 1
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def dump(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.stacks.most_common():
+                f.write("{} {}\n".format(stack, count))
+
+
+class Profiler(object):
+
+    OUTPUTS = {"cprofile": "profile.prof", "sampling": "profile.folded"}
+
+    def __init__(self, kind=None, output=None, interval=0.005):
+        """
+        kind   : None (no profiling), "cprofile" or "sampling"
+        output : file written by stop(), cProfile stats (pstats) or folded stacks
+        """
+        if kind is not None and kind not in self.OUTPUTS:
+            print("Profiler: unknown profiler", kind)
+            raise ValueError("kind must be None or one of {}".format(sorted(self.OUTPUTS)))
+        self.kind = kind
+        self.output = output or self.OUTPUTS.get(kind)
+        self.profiler = None
+        if kind == "cprofile":
+            self.profiler = cProfile.Profile()
+        elif kind == "sampling":
+            self.profiler = SamplingProfiler(interval)
+
+    def start(self):
+        if self.kind == "cprofile":
+            self.profiler.enable()
+        elif self.kind == "sampling":
+            self.profiler.start()
+
+    def stop(self):
+        if self.kind == "cprofile":
+            self.profiler.disable()
+            self.profiler.dump_stats(self.output)
+        elif self.kind == "sampling":
+            self.profiler.stop()
+            self.profiler.dump(self.output)
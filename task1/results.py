@@ -0,0 +1,164 @@
+"""
+Streaming export of the populations of a run, read back memory-mapped for the analysis.
+
+    writer = ResultWriter("results/nsga2-zdt1", n_var=30, n_obj=2)
+    for gen in ...:
+        writer.write(gen, X, F, record)          # record: logbook entry of the generation
+    writer.close()
+
+    reader = ResultReader("results/nsga2-zdt1")
+    X, F, rank = reader.generation(100)          # views of the memory-mapped columns
+    reader.F[reader.rank == 0]                   # every non-dominated point of every generation
+    reader.logbook()                             # the records, one dict per generation
+
+A result directory holds one raw binary file per column, to which every generation is appended:
+gen (int32), X (float64, n_var per row), F (float64, n_obj per row) and rank (int32, front index
+of the row in its generation, 0 for the non-dominated points), plus meta.json describing the columns
+and log.jsonl with the records. Nothing of the previous generations is kept in memory, and a run
+that is killed leaves the complete generations readable. A writer appending to the directory of a
+resumed run first cuts every column back to the rows complete in all of them.
+"""
+import json
+import os
+
+import numpy
+
+from profiling import Trace
+from sorting import nondominated_ranks
+
+COLUMNS = ("gen", "X", "F", "rank")
+
+
+def _meta(n_var, n_obj):
+    return {"columns": {"gen": ["int32", 1], "X": ["float64", n_var], "F": ["float64", n_obj],
+                        "rank": ["int32", 1]}}
+
+
+def _row_size(columns, name):
+    dtype, width = columns[name]
+    return numpy.dtype(dtype).itemsize * width
+
+
+def _complete_rows(directory, columns):
+    """Number of rows written completely to every column (a killed writer may leave a partial row)."""
+    sizes = []
+    for name in COLUMNS:
+        path = os.path.join(directory, name + ".bin")
+        sizes.append(os.path.getsize(path) // _row_size(columns, name) if os.path.exists(path) else 0)
+    return min(sizes)
+
+
+class ResultWriter(object):
+
+    def __init__(self, directory, n_var, n_obj, append=False, rank=True):
+        """
+        directory : result directory, created if needed
+        append    : add the generations to an existing directory (resumed runs)
+        rank      : compute the front index of the rows, -1 otherwise
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.rank = rank
+        meta = _meta(n_var, n_obj)
+        path = os.path.join(directory, "meta.json")
+        if append and os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                if json.load(f) != meta:
+                    print("ResultWriter: {} holds results of other dimensions".format(directory))
+                    raise ValueError("cannot append {} variables and {} objectives".format(n_var, n_obj))
+        else:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(meta, f)
+        if append:
+            # drop the rows some columns hold ahead of the others, the appended rows stay aligned
+            n_rows = _complete_rows(directory, meta["columns"])
+            for name in COLUMNS:
+                path = os.path.join(directory, name + ".bin")
+                if os.path.exists(path):
+                    os.truncate(path, n_rows * _row_size(meta["columns"], name))
+        mode = "ab" if append else "wb"
+        self.files = {name: open(os.path.join(directory, name + ".bin"), mode) for name in COLUMNS}
+        self.log = Trace(os.path.join(directory, "log.jsonl"), append=append)
+
+    def write(self, gen, X, F, record=None):
+        """Appends the decision variables X and objectives F (one row per individual) of generation gen."""
+        X = numpy.asarray(X, dtype=numpy.float64)
+        F = numpy.asarray(F, dtype=numpy.float64)
+        if self.rank:
+            # objectives are minimized, nondominated_ranks takes maximized values
+            rank = nondominated_ranks(-F)
+        else:
+            rank = numpy.full(len(F), -1)
+        columns = {"gen": numpy.full(len(F), gen, dtype=numpy.int32), "X": X, "F": F,
+                   "rank": numpy.asarray(rank, dtype=numpy.int32)}
+        for name in COLUMNS:
+            self.files[name].write(numpy.ascontiguousarray(columns[name]).tobytes())
+            self.files[name].flush()
+        if record is not None:
+            self.log.write(dict(record, gen=gen))
+
+    def close(self):
+        for f in self.files.values():
+            f.close()
+        self.files = {}
+        self.log.close()
+
+
+class ResultReader(object):
+
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, "meta.json"), encoding="utf-8") as f:
+            self.meta = json.load(f)
+        columns = self.meta["columns"]
+        self.n_rows = _complete_rows(directory, columns)
+        for name in COLUMNS:
+            dtype, width = columns[name]
+            if self.n_rows == 0:
+                array = numpy.empty((0, width), dtype=dtype)
+            else:
+                array = numpy.memmap(os.path.join(directory, name + ".bin"), dtype=dtype, mode="r",
+                                     shape=(self.n_rows, width))
+            setattr(self, name, array if name in ("X", "F") else array[:, 0])
+        # first row of every generation written, computed once from the gen column
+        self.starts = numpy.flatnonzero(numpy.concatenate([[True], numpy.diff(self.gen) != 0]))[:self.n_rows]
+        self.ends = numpy.append(self.starts[1:], self.n_rows)
+
+    def __len__(self):
+        return self.n_rows
+
+    def generations(self):
+        """Generation numbers, in the order they were written."""
+        return self.gen[self.starts].tolist()
+
+    def rows(self, gen):
+        """Slice of the rows of generation gen (the last one written if it was written several times)."""
+        matches = numpy.flatnonzero(self.gen[self.starts] == gen)
+        if not len(matches):
+            raise KeyError(gen)
+        i = matches[-1]
+        return slice(int(self.starts[i]), int(self.ends[i]))
+
+    def generation(self, gen):
+        """Decision variables, objectives and front indexes of generation gen."""
+        rows = self.rows(gen)
+        return self.X[rows], self.F[rows], self.rank[rows]
+
+    def front(self, gen):
+        """Decision variables and objectives of the non-dominated rows of generation gen."""
+        X, F, rank = self.generation(gen)
+        return X[rank == 0], F[rank == 0]
+
+    def logbook(self):
+        path = os.path.join(self.directory, "log.jsonl")
+        if not os.path.exists(path):
+            return []
+        with open(path, encoding="utf-8") as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+
+def writer_from_config(cfg, n_var, n_obj, append=False):
+    """ResultWriter of the `results` directory of a config, None without it."""
+    if not cfg.get('results'):
+        return None
+    return ResultWriter(cfg['results'], n_var, n_obj, append=append, rank=cfg.get('results_rank', True))
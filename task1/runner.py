@@ -0,0 +1,168 @@
+"""
+Runs the drivers from their YAML configs, alone or as a grid of configs x seeds.
+
+    python runner.py NSGA2/base_nsga2.yaml NSGA3/base_nsga3.yaml --seeds 1 2 3 --workers 4 --output results.jsonl
+
+Every config names its algorithm (`algorithm_name`, a key of ALGORITHMS) and its problem
+(`problem_name`, a key of problems.domain). NSGA2/NSGA3 configs with `islands` > 1 run the island
+model of islands.py. The runs of the grid are spread over a process pool and each one is written
+as a JSON line as soon as it is done (see run_config for the fields).
+
+With several seeds, the output paths of a config (checkpoint, results, trace, cache_path,
+profile_output) get the seed before their extension, e.g. run.pkl becomes run_seed1.pkl,
+run_seed2.pkl, ... A grid where two runs would still write to the same path is refused.
+
+From python:
+
+    from runner import load_config, run_config
+    result = run_config(load_config("NSGA2/base_nsga2.yaml"), seed=1)
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import yaml
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from indicators import HypervolumeIndicator
+from profiling import Profiler
+from sorting import sort_nondominated
+from NSGA2 import nsga2
+from NSGA3 import nsga3
+from MOEAD import main as moead
+
+ALGORITHMS = {"NSGA2": nsga2.run,
+              "NSGA3": nsga3.run,
+              "MOEAD": moead.run}
+# config keys of the files and directories written by a run
+PATH_KEYS = ("checkpoint", "results", "trace", "cache_path", "profile_output")
+
+
+def load_config(path):
+    with open(path, encoding='utf-8') as f:
+        cfg = yaml.load(f.read(), Loader=yaml.FullLoader)
+    cfg.setdefault('config', path)
+    return cfg
+
+
+def output_paths(cfg):
+    """Paths written by a run of cfg, by config key (the default output of the profiler included)."""
+    paths = {key: cfg[key] for key in PATH_KEYS if cfg.get(key)}
+    if cfg.get('profile') in Profiler.OUTPUTS and not cfg.get('profile_output'):
+        paths['profile_output'] = Profiler.OUTPUTS[cfg['profile']]
+    return paths
+
+
+def suffixed_path(path, suffix):
+    """path with _suffix before its extension."""
+    root, ext = os.path.splitext(path.rstrip("/\\"))
+    return "{}_{}{}".format(root, suffix, ext)
+
+
+def suffixed_config(cfg, suffix):
+    """Copy of cfg whose output paths are suffixed (e.g. by the seed), its runs write apart."""
+    return dict(cfg, **{key: suffixed_path(path, suffix) for key, path in output_paths(cfg).items()})
+
+
+def run_config(cfg, seed=None, verbose=False):
+    """
+    Runs the algorithm of cfg with the given seed (the `seed` of cfg if None).
+    Returns a dict with the algorithm, problem, config, seed, number of evaluations, wall time,
+    hypervolume of the final front (reference point 11 on every objective), the front objectives and
+    the reason the run stopped (see termination.py, "budget" when it ran its n_gen).
+    """
+    name = cfg.get('algorithm_name')
+    if name not in ALGORITHMS:
+        print("run_config: unknown algorithm", name)
+        raise ValueError("algorithm_name must be one of {}".format(sorted(ALGORITHMS)))
+    if seed is None:
+        seed = cfg.get('seed')
+
+    start = time.perf_counter()
+    if cfg.get('islands', 1) > 1:
+        # island model, pop is the merged front of the islands
+        from islands import run_islands
+        pop, logbook = run_islands(cfg, seed, verbose)
+    else:
+        pop, logbook = ALGORITHMS[name](cfg, seed, verbose)
+    wall_time = time.perf_counter() - start
+
+    front = sort_nondominated(pop, len(pop), first_front_only=True)[0]
+    n_obj = len(front[0].fitness.values)
+    return {'algorithm': name,
+            'problem': cfg['problem_name'],
+            'config': cfg.get('config'),
+            'seed': seed,
+            'evaluations': int(logbook[-1]['evals']),
+            'wall_time': wall_time,
+            'hv': HypervolumeIndicator([11.0] * n_obj).update(front),
+            'front': [list(ind.fitness.values) for ind in front],
+            'stop_reason': getattr(logbook, 'stop_reason', 'budget')}
+
+
+def _run_job(cfg, seed):
+    return run_config(cfg, seed)
+
+
+def run_grid(configs, seeds=None, workers=None):
+    """
+    Runs every config with every seed (the `seed` of each config if seeds is None) on `workers`
+    processes (os.cpu_count() if None, in this process if 1). Yields the results as they complete.
+    With several seeds the output paths of the configs are suffixed by the seed, a ValueError is
+    raised if two runs would write to the same path.
+    """
+    if seeds and len(seeds) > 1:
+        jobs = [(suffixed_config(cfg, "seed{}".format(seed)), seed) for cfg in configs for seed in seeds]
+    else:
+        jobs = [(cfg, seed) for cfg in configs for seed in (seeds or [None])]
+    used = {}
+    for cfg, seed in jobs:
+        for key, path in output_paths(cfg).items():
+            path = os.path.abspath(path)
+            if path in used:
+                print("run_grid: {} {} of {} (seed {}) is also written by {} (seed {})".format(
+                    key, path, cfg.get('config'), seed, *used[path]))
+                raise ValueError("the runs of a grid must write to different paths")
+            used[path] = (cfg.get('config'), seed)
+    if workers == 1:
+        for cfg, seed in jobs:
+            yield run_config(cfg, seed)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = []
+        for cfg, seed in jobs:
+            # the grid already uses every core, no pool is nested inside the runs
+            cfg = dict(cfg, evaluator="serial")
+            futures.append(executor.submit(_run_job, cfg, seed))
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Runs a grid of configs x seeds.")
+    parser.add_argument("configs", nargs="+", help="YAML config files")
+    parser.add_argument("--seeds", type=int, nargs="*", default=None,
+                        help="seeds of every config (default: the seed of the config)")
+    parser.add_argument("--workers", type=int, default=None, help="number of processes (default: all cores)")
+    parser.add_argument("--output", default="results.jsonl", help="JSON lines file, '-' for stdout")
+    args = parser.parse_args(argv)
+
+    configs = [load_config(path) for path in args.configs]
+    out = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    try:
+        for result in run_grid(configs, args.seeds, args.workers):
+            out.write(json.dumps(result) + "\n")
+            out.flush()
+            print("{algorithm} {problem} seed={seed}: hv={hv:.4f}, {evaluations} evaluations in {wall_time:.2f}s"
+                  .format(**result), file=sys.stderr)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+
+if __name__ == "__main__":
+    main()
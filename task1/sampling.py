@@ -0,0 +1,86 @@
+"""
+Random index sampling for the steady-state loops (MOEA/D), from a single numpy.random.Generator.
+
+    sampler = IndexSampler(seed)
+    permutation, types, parents = sampler.sweep(population_size, neighbourhood, delta)
+    perm = sampler.permutation(T)           # update order of a neighbourhood
+
+sweep draws at once the order of the subproblems of a sweep, their mating types and their two
+distinct parents (mates draws new ones for some subproblems), and permutation serves rows of a block of permutations drawn in bulk. The state of
+a sampler (generator and blocks not used yet) is saved with getstate for the checkpoints.
+
+Independent samplers for parallel workers (islands, grid runs) come from the same seed:
+
+    samplers = streams(seed, 4)
+"""
+import numpy
+
+# Number of indexes of a block of permutations drawn at once
+BLOCK_ENTRIES = 2 ** 16
+
+
+class IndexSampler(object):
+
+    def __init__(self, seed=None):
+        """seed : int, numpy.random.SeedSequence or None (fresh entropy)"""
+        self.rng = numpy.random.default_rng(seed)
+        # size -> [block of permutations, next row]
+        self.blocks = {}
+
+    def permutation(self, size):
+        """A random permutation of range(size) (numpy array)."""
+        block = self.blocks.get(size)
+        if block is None or block[1] == len(block[0]):
+            rows = max(1, BLOCK_ENTRIES // size)
+            block = [self.rng.permuted(numpy.tile(numpy.arange(size), (rows, 1)), axis=1), 0]
+            self.blocks[size] = block
+        row = block[0][block[1]]
+        block[1] += 1
+        return row
+
+    def pairs(self, size, n):
+        """n pairs of distinct indexes of range(size), as two arrays."""
+        first = self.rng.integers(size, size=n)
+        second = self.rng.integers(size - 1, size=n)
+        second += second >= first
+        return first, second
+
+    def sweep(self, size, neighbourhood, delta):
+        """
+        size          : number of subproblems
+        neighbourhood : indexes of the neighbours of every subproblem, shape (size, T)
+        delta         : probability of mating in the neighbourhood (type 1) rather than the population (type 2)
+        Returns the permutation of the subproblems (list), the mating type of each subproblem and its two
+        parents (array of shape (size, 2)), indexed by subproblem.
+        """
+        permutation = self.rng.permutation(size).tolist()
+        types, parents = self.mates(size, neighbourhood, delta)
+        return permutation, types, parents
+
+    def mates(self, size, neighbourhood, delta):
+        """
+        Mating types and two distinct parents (array of shape (n, 2)) of n subproblems out of size, whose
+        neighbours are the n rows of neighbourhood, e.g. new parents for subproblems already mated.
+        """
+        neighbourhood = numpy.asarray(neighbourhood)
+        n = len(neighbourhood)
+        types = numpy.where(self.rng.random(n) < delta, 1, 2)
+        rows = numpy.arange(n)
+        first, second = self.pairs(neighbourhood.shape[1], n)
+        local = numpy.column_stack([neighbourhood[rows, first], neighbourhood[rows, second]])
+        first, second = self.pairs(size, n)
+        parents = numpy.where((types == 1)[:, numpy.newaxis], local, numpy.column_stack([first, second]))
+        return types, parents
+
+    def getstate(self):
+        return {"rng": self.rng.bit_generator.state,
+                "blocks": {size: (block.copy(), row) for size, (block, row) in self.blocks.items()}}
+
+    def setstate(self, state):
+        self.rng.bit_generator.state = state["rng"]
+        self.blocks = {size: [block, row] for size, (block, row) in state["blocks"].items()}
+
+
+def streams(seed, n):
+    """n independent samplers spawned from seed."""
+    return [IndexSampler(child) for child in numpy.random.SeedSequence(seed).spawn(n)]
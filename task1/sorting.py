@@ -0,0 +1,489 @@
+"""
+Non-dominated sorting on numpy arrays, with drop-in replacements of the deap operators:
+
+    toolbox.register("select", sel_nsga2)                # tools.selNSGA2
+    toolbox.register("select", sel_nsga3)                # tools.selNSGA3
+    front = sort_nondominated(pop, len(pop))[0]          # tools.emo.sortNondominated
+
+and NSGA-II / NSGA-III selections working on arrays only (NSGA2Selector, NSGA3Selector), keeping
+state from one generation to the next.
+
+The ranks are computed on the unique fitness vectors, with a dominance matrix up to MATRIX_MAX_SIZE
+vectors and with the efficient non-dominated sort (ENS, binary search over the fronts of the
+lexicographically sorted vectors) above. The fronts are returned with the same members in the same
+order as sortNondominated, so the selections are identical to deap's.
+"""
+import bisect
+from itertools import chain
+
+import numpy
+from deap.tools.emo import associate_to_niche, find_extreme_points, find_intercepts, niching
+
+from population import ArrayPopulation
+
+# Number of unique fitness vectors up to which the ranks are computed with a dominance matrix
+MATRIX_MAX_SIZE = 2000
+
+
+def dominance_matrix(W, other=None):
+    """
+    W, other : weighted fitness values (wvalues, maximized), shapes (n, m) and (p, m)
+    Returns the (n, p) boolean matrix D with D[i, j] True when W[i] dominates other[j].
+    """
+    other = W if other is None else other
+    not_worse = numpy.ones((len(W), len(other)), dtype=bool)
+    better = numpy.zeros((len(W), len(other)), dtype=bool)
+    for j in range(W.shape[1]):
+        column = W[:, j, numpy.newaxis]
+        not_worse &= column >= other[numpy.newaxis, :, j]
+        better |= column > other[numpy.newaxis, :, j]
+    return not_worse & better
+
+
+def _ranks_matrix(W):
+    D = dominance_matrix(W)
+    count = D.sum(axis=0)
+    ranks = numpy.full(len(W), -1)
+    front = numpy.flatnonzero(count == 0)
+    rank = 0
+    while len(front):
+        ranks[front] = rank
+        count[front] = -1
+        count -= D[front].sum(axis=0)
+        front = numpy.flatnonzero(count == 0)
+        rank += 1
+    return ranks
+
+
+class _Front(object):
+    """Growing array of the vectors of one front (ENS)."""
+
+    def __init__(self, m):
+        self.W = numpy.empty((16, m))
+        self.size = 0
+
+    def dominates(self, w):
+        W = self.W[:self.size]
+        return numpy.any(numpy.all(W >= w, axis=1) & numpy.any(W > w, axis=1))
+
+    def append(self, w):
+        if self.size == len(self.W):
+            self.W = numpy.concatenate((self.W, numpy.empty_like(self.W)))
+        self.W[self.size] = w
+        self.size += 1
+
+
+def _ranks_ens(W):
+    # vectors in decreasing lexicographic order: a vector can only be dominated by earlier ones
+    order = numpy.lexsort(-W.T[::-1])
+    ranks = numpy.empty(len(W), dtype=int)
+    fronts = []
+    for i in order:
+        w = W[i]
+        # binary search of the first front with no member dominating w
+        low, high = 0, len(fronts)
+        while low < high:
+            mid = (low + high) // 2
+            if fronts[mid].dominates(w):
+                low = mid + 1
+            else:
+                high = mid
+        if low == len(fronts):
+            fronts.append(_Front(W.shape[1]))
+        fronts[low].append(w)
+        ranks[i] = low
+    return ranks
+
+
+def nondominated_ranks(W):
+    """
+    W : weighted fitness values (wvalues, maximized), shape (n, m)
+    Returns the front index (0 for the non-dominated vectors) of each row.
+    """
+    W = numpy.asarray(W, dtype=float)
+    if len(W) <= MATRIX_MAX_SIZE:
+        return _ranks_matrix(W)
+    return _ranks_ens(W)
+
+
+def _fronts(W, k, first_front_only=False):
+    """
+    W : weighted fitness values (wvalues, maximized), shape (n, m)
+    Row indexes of the fronts of tools.emo.sortNondominated (same fronts, same order), one array per front.
+    """
+    if k == 0 or len(W) == 0:
+        return []
+
+    # unique fitnesses in order of first appearance, as deap groups the individuals by fitness
+    _, first, inverse = numpy.unique(W, axis=0, return_index=True, return_inverse=True)
+    inverse = inverse.reshape(-1)
+    appearance = numpy.argsort(first)
+    position = numpy.empty_like(appearance)
+    position[appearance] = numpy.arange(len(appearance))
+    U = W[first[appearance]]
+    group = position[inverse]
+    members = [[] for _ in range(len(U))]
+    for i, g in enumerate(group):
+        members[g].append(i)
+
+    ranks = nondominated_ranks(U)
+    N = 1 if first_front_only else min(len(W), k)
+
+    fronts = []
+    current = numpy.flatnonzero(ranks == 0)
+    pareto_sorted = 0
+    rank = 0
+    while len(current):
+        fronts.append(numpy.fromiter(chain.from_iterable(members[u] for u in current), dtype=int))
+        pareto_sorted += len(fronts[-1])
+        if pareto_sorted >= N:
+            break
+        rank += 1
+        following = numpy.flatnonzero(ranks == rank)
+        if len(following) == 0:
+            break
+        # deap appends a fitness when its last dominator of the current front (in front order) is processed
+        D = dominance_matrix(U[current], U[following])
+        last = len(current) - 1 - numpy.argmax(D[::-1], axis=0)
+        current = following[numpy.lexsort((following, last))]
+    return fronts
+
+
+def sort_nondominated(individuals, k, first_front_only=False):
+    """Same as tools.emo.sortNondominated (same fronts, same order)."""
+    if k == 0 or len(individuals) == 0:
+        return []
+    W = numpy.array([ind.fitness.wvalues for ind in individuals], dtype=float)
+    return [[individuals[i] for i in front] for front in _fronts(W, k, first_front_only)]
+
+
+def crowding_distances(values):
+    """
+    values : fitness values of a front, shape (n, m)
+    Same distances as tools.emo.assignCrowdingDist, returned as an array.
+    """
+    n, nobj = values.shape
+    distances = numpy.zeros(n)
+    if n == 0:
+        return distances
+    order = numpy.arange(n)
+    for i in range(nobj):
+        # successive stable sorts, like deap sorting the same list for every objective
+        order = order[numpy.argsort(values[order, i], kind="stable")]
+        distances[order[0]] = float("inf")
+        distances[order[-1]] = float("inf")
+        if values[order[-1], i] == values[order[0], i]:
+            continue
+        norm = nobj * float(values[order[-1], i] - values[order[0], i])
+        distances[order[1:-1]] += (values[order[2:], i] - values[order[:-2], i]) / norm
+    return distances
+
+
+def assign_crowding_dist(individuals):
+    """Same as tools.emo.assignCrowdingDist."""
+    if len(individuals) == 0:
+        return
+    values = numpy.array([ind.fitness.values for ind in individuals], dtype=float)
+    for ind, dist in zip(individuals, crowding_distances(values)):
+        ind.fitness.crowding_dist = float(dist)
+
+
+def sel_nsga2(individuals, k):
+    """Same as tools.selNSGA2 with the sorting of this module."""
+    pareto_fronts = sort_nondominated(individuals, k)
+    for front in pareto_fronts:
+        assign_crowding_dist(front)
+
+    chosen = list(chain(*pareto_fronts[:-1]))
+    k = k - len(chosen)
+    if k > 0:
+        crowding = numpy.array([ind.fitness.crowding_dist for ind in pareto_fronts[-1]])
+        # stable on equal distances, as sorted(..., reverse=True)
+        order = numpy.argsort(-crowding, kind="stable")
+        chosen.extend(pareto_fronts[-1][i] for i in order[:k])
+    return chosen
+
+
+def _weighted_values(population):
+    if isinstance(population, ArrayPopulation):
+        return population.F * numpy.asarray(population.fitness_class.weights, dtype=float)
+    return numpy.array([ind.fitness.wvalues for ind in population], dtype=float)
+
+
+def _weights(population):
+    if isinstance(population, ArrayPopulation):
+        return numpy.asarray(population.fitness_class.weights, dtype=float)
+    return numpy.asarray(population[0].fitness.weights, dtype=float)
+
+
+def _take(population, index, crowding=None):
+    if isinstance(population, ArrayPopulation):
+        return population.take(index, crowding)
+    chosen = [population[i] for i in index]
+    if crowding is not None:
+        for ind, dist in zip(chosen, crowding):
+            ind.fitness.crowding_dist = float(dist)
+    return chosen
+
+
+class NSGA2Selector(object):
+    """
+    NSGA-II selections on the arrays of the fitness values, for lists of individuals or ArrayPopulations:
+
+        selector = NSGA2Selector(tournsize=2)
+        toolbox.register("select", selector.select)          # in place of sel_nsga2
+        toolbox.register("select_gen", selector.select_mates)  # in place of tools.selTournamentDCD
+
+    select computes the ranks and crowding distances once and keeps those of the survivors, which
+    select_mates reuses when it is given the population select returned (they are computed again
+    for any other population). A tournament is won by the lowest rank, then the largest crowding
+    distance (the crowded-comparison operator of NSGA-II): the candidates are compared through a
+    precomputed order of the population, so larger tournaments cost no dominance check.
+    """
+
+    def __init__(self, tournsize=2, rng=numpy.random):
+        self.tournsize = max(1, int(tournsize))
+        self.rng = rng
+        self.selected = None
+        self.ranks = None
+        self.crowding = None
+
+    def fronts(self, population, k):
+        """
+        Fronts of population up to k individuals, in the order of sort_nondominated, with the crowding
+        distances of their members computed in that order (as assign_crowding_dist).
+        """
+        if len(population) == 0:
+            return [], []
+        W = _weighted_values(population)
+        weights = _weights(population)
+        fronts = _fronts(W, k)
+        return fronts, [crowding_distances(W[front] / weights) for front in fronts]
+
+    def rank_crowding(self, population):
+        """Front index and crowding distance (within its front) of every individual of population."""
+        ranks = numpy.zeros(len(population), dtype=int)
+        crowding = numpy.zeros(len(population))
+        fronts, distances = self.fronts(population, len(population))
+        for rank, (front, distance) in enumerate(zip(fronts, distances)):
+            ranks[front] = rank
+            crowding[front] = distance
+        return ranks, crowding
+
+    def select(self, population, k):
+        """
+        Environmental selection of k individuals: whole fronts, the last one by decreasing crowding
+        distance. The survivors and their order are those of sel_nsga2 (ties in the last front are
+        broken by front order).
+        """
+        fronts, distances = self.fronts(population, k)
+        if not fronts:
+            fronts, distances = [numpy.zeros(0, dtype=int)], [numpy.zeros(0)]
+        chosen = sum(len(front) for front in fronts[:-1])
+        # stable on equal distances, as sorted(..., reverse=True)
+        last = numpy.argsort(-distances[-1], kind="stable")[:k - chosen]
+        index = numpy.concatenate(fronts[:-1] + [fronts[-1][last]])
+        self.ranks = numpy.concatenate([numpy.full(len(front), rank) for rank, front in enumerate(fronts[:-1])]
+                                       + [numpy.full(len(last), len(fronts) - 1)]).astype(int)
+        self.crowding = numpy.concatenate(distances[:-1] + [distances[-1][last]])
+        self.selected = _take(population, index, self.crowding)
+        return self.selected
+
+    def select_mates(self, population, k):
+        """
+        k winners of tournaments among tournsize individuals. The candidates are taken from successive
+        random permutations of the population, so that every individual enters the same number of
+        tournaments (give or take one), as in tools.selTournamentDCD.
+        """
+        if population is self.selected:
+            ranks, crowding = self.ranks, self.crowding
+        else:
+            ranks, crowding = self.rank_crowding(population)
+        n = len(ranks)
+        # position of every individual in the order of the crowded comparison, random among equals
+        order = numpy.lexsort((self.rng.random(n), -crowding, ranks))
+        position = numpy.empty(n, dtype=int)
+        position[order] = numpy.arange(n)
+
+        needed = k * self.tournsize
+        candidates = numpy.concatenate([self.rng.permutation(n) for _ in range(-(-needed // n))])
+        candidates = candidates[:needed].reshape(k, self.tournsize)
+        winners = candidates[numpy.arange(k), numpy.argmin(position[candidates], axis=1)]
+        return _take(population, winners, crowding[winners])
+
+
+def sel_nsga3(individuals, k, ref_points, best_point=None, worst_point=None, extreme_points=None):
+    """Same as tools.selNSGA3 with the sorting of this module (the niching is deap's)."""
+    pareto_fronts = sort_nondominated(individuals, k)
+
+    # minimization problem, as in deap
+    fitnesses = numpy.array([ind.fitness.wvalues for f in pareto_fronts for ind in f])
+    fitnesses *= -1
+
+    if best_point is not None and worst_point is not None:
+        best_point = numpy.min(numpy.concatenate((fitnesses, best_point), axis=0), axis=0)
+        worst_point = numpy.max(numpy.concatenate((fitnesses, worst_point), axis=0), axis=0)
+    else:
+        best_point = numpy.min(fitnesses, axis=0)
+        worst_point = numpy.max(fitnesses, axis=0)
+
+    extreme_points = find_extreme_points(fitnesses, best_point, extreme_points)
+    front_worst = numpy.max(fitnesses[:sum(len(f) for f in pareto_fronts), :], axis=0)
+    intercepts = find_intercepts(extreme_points, best_point, worst_point, front_worst)
+    niches, dist = associate_to_niche(fitnesses, ref_points, best_point, intercepts)
+
+    niche_counts = numpy.zeros(len(ref_points), dtype=numpy.int64)
+    index, counts = numpy.unique(niches[:-len(pareto_fronts[-1])], return_counts=True)
+    niche_counts[index] = counts
+
+    chosen = list(chain(*pareto_fronts[:-1]))
+    sel_count = len(chosen)
+    selected = niching(pareto_fronts[-1], k - sel_count, niches[sel_count:], dist[sel_count:], niche_counts)
+    chosen.extend(selected)
+    return chosen
+
+
+# Number of float entries of the distance block computed at once by NSGA3Selector.associate
+ASSOCIATION_BLOCK = 2 ** 22
+
+
+class NSGA3Selector(object):
+    """
+    NSGA-III environmental selection keeping its normalization from one generation to the next:
+
+        selector = NSGA3Selector()
+        toolbox.register("select", selector.select)          # in place of sel_nsga3
+        pop = toolbox.select(pop, k=N, ref_points=ref_points)
+
+    The ideal and worst points are the best and worst objectives seen so far, the extreme points are
+    searched among the population and the previous extreme points, and intercepts that cannot be
+    computed (degenerate hyperplane) are replaced by the last valid ones. The individuals are associated
+    to the reference lines with one matrix product (perpendicular distances from the projections on
+    the unit directions) and the niches are filled with arrays, one round per niche count.
+    """
+
+    def __init__(self, rng=numpy.random):
+        self.rng = rng
+        self.ref_points = None
+        self.directions = None
+        self.best_point = None
+        self.worst_point = None
+        self.extreme_points = None
+        self.intercepts = None
+
+    def getstate(self):
+        return {"best_point": self.best_point, "worst_point": self.worst_point,
+                "extreme_points": self.extreme_points, "intercepts": self.intercepts}
+
+    def setstate(self, state):
+        self.__dict__.update(state)
+
+    def normalize(self, F, front_worst):
+        """Updates the ideal/worst/extreme points and intercepts with the objectives F, returns the intercepts."""
+        if self.best_point is None:
+            self.best_point = F.min(axis=0)
+            self.worst_point = F.max(axis=0)
+        else:
+            self.best_point = numpy.minimum(self.best_point, F.min(axis=0))
+            self.worst_point = numpy.maximum(self.worst_point, F.max(axis=0))
+
+        candidates = F if self.extreme_points is None else numpy.vstack([F, self.extreme_points])
+        translated = candidates - self.best_point
+        m = F.shape[1]
+        # achievement scalarizing function of every candidate along every axis
+        weights = numpy.full((m, m), 1e6)
+        numpy.fill_diagonal(weights, 1.0)
+        asf = numpy.stack([(translated * weights[j]).max(axis=1) for j in range(m)])
+        self.extreme_points = candidates[asf.argmin(axis=1)]
+
+        A = self.extreme_points - self.best_point
+        b = numpy.ones(m)
+        intercepts = None
+        try:
+            x = numpy.linalg.solve(A, b)
+        except numpy.linalg.LinAlgError:
+            x = None
+        if x is not None and numpy.count_nonzero(x) == len(x):
+            candidate = 1.0 / x
+            if (numpy.allclose(A @ x, b) and numpy.all(candidate > 1e-6)
+                    and numpy.all(candidate + self.best_point <= self.worst_point)):
+                intercepts = candidate + self.best_point
+        if intercepts is None:
+            # last valid intercepts, the worst point of the fronts before the last one
+            intercepts = self.intercepts if self.intercepts is not None else front_worst
+        self.intercepts = intercepts
+        return intercepts
+
+    def associate(self, F, intercepts):
+        """Niche (closest reference line) of every row of F and its perpendicular distance to that line."""
+        fn = (F - self.best_point) / (intercepts - self.best_point + numpy.finfo(float).eps)
+        squared = (fn ** 2).sum(axis=1)
+        niches = numpy.empty(len(fn), dtype=int)
+        distances = numpy.empty(len(fn))
+        rows = max(1, ASSOCIATION_BLOCK // len(self.directions))
+        for start in range(0, len(fn), rows):
+            block = slice(start, start + rows)
+            projections = fn[block] @ self.directions.T
+            perpendicular = squared[block, numpy.newaxis] - projections ** 2
+            niches[block] = perpendicular.argmin(axis=1)
+            closest = perpendicular[numpy.arange(len(projections)), niches[block]]
+            distances[block] = numpy.sqrt(numpy.maximum(closest, 0.0))
+        return niches, distances
+
+    def niching(self, k, niches, distances, niche_counts):
+        """
+        Indexes of k of the candidates (niches and distances of the last front), taken in rounds from the
+        niches of lowest count: the closest candidate for an empty niche, a random one otherwise.
+        """
+        n = len(niches)
+        # candidates grouped by niche in random order, the closest first in the empty niches
+        order = self.rng.permutation(n)
+        order = order[numpy.argsort(niches[order], kind="stable")]
+        grouped = niches[order]
+        starts = numpy.searchsorted(grouped, numpy.arange(len(niche_counts)))
+        ends = numpy.searchsorted(grouped, numpy.arange(len(niche_counts)), side="right")
+        for niche in numpy.flatnonzero((ends > starts) & (niche_counts == 0)):
+            members = slice(starts[niche], ends[niche])
+            closest = starts[niche] + numpy.argmin(distances[order[members]])
+            order[[starts[niche], closest]] = order[[closest, starts[niche]]]
+
+        niche_counts = niche_counts.copy()
+        following = starts.copy()
+        selected = []
+        while len(selected) < k:
+            available = numpy.flatnonzero(following < ends)
+            min_count = niche_counts[available].min()
+            chosen = available[niche_counts[available] == min_count]
+            self.rng.shuffle(chosen)
+            chosen = chosen[:k - len(selected)]
+            selected.extend(order[following[chosen]])
+            following[chosen] += 1
+            niche_counts[chosen] += 1
+        return numpy.array(selected, dtype=int)
+
+    def select(self, population, k, ref_points):
+        """Selects k individuals of population (list of individuals or ArrayPopulation), as sel_nsga3."""
+        if ref_points is not self.ref_points:
+            self.ref_points = ref_points
+            self.directions = ref_points / numpy.linalg.norm(ref_points, axis=1)[:, numpy.newaxis]
+
+        W = _weighted_values(population)
+        ranks = nondominated_ranks(W)
+        order = numpy.argsort(ranks, kind="stable")
+        last = ranks[order[min(k, len(order)) - 1]]
+        fronts = order[ranks[order] <= last]
+        # minimization problem, as in deap
+        F = -W[fronts]
+        if len(fronts) == k:
+            self.normalize(F, F.max(axis=0))
+            return _take(population, fronts)
+
+        chosen = fronts[ranks[fronts] < last]
+        candidates = fronts[ranks[fronts] == last]
+        front_worst = F[:len(chosen)].max(axis=0) if len(chosen) else F.max(axis=0)
+        intercepts = self.normalize(F, front_worst)
+        niches, distances = self.associate(F, intercepts)
+
+        niche_counts = numpy.bincount(niches[:len(chosen)], minlength=len(ref_points))
+        picked = self.niching(k - len(chosen), niches[len(chosen):], distances[len(chosen):], niche_counts)
+        return _take(population, numpy.concatenate([chosen, candidates[picked]]))
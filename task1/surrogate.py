@@ -0,0 +1,158 @@
+"""
+Surrogate models of the objectives, used to pre-screen the offspring before their evaluation.
+
+    surrogate = Surrogate(problem.low, problem.up, model="rbf")
+    surrogate.add(X, F)                             # every evaluated point (minimized objectives)
+    chosen = surrogate.screen(candidates, F_pop, k) # k candidates predicted best against the population
+    best = surrogate.predict(X)                     # predicted objectives, shape (n, n_obj)
+
+The models interpolate the archive of the last `max_points` evaluated points, the decision variables
+scaled to [0, 1] by the bounds and every objective standardized. "rbf" is a cubic radial basis
+function with a linear tail, "gp" the mean of a Gaussian process with a squared exponential kernel
+(length scale: median distance between the training points). All the objectives share the kernel
+matrix and are solved at once, one column each. A model is fitted again once `refit` points have
+been added since the previous fit, on the next prediction.
+
+The drivers generate `surrogate_candidates` times more offspring than they evaluate, rank them with
+the predictions (predicted non-domination against the population for NSGA-II/III, predicted
+Tchebycheff value of the subproblem for MOEA/D) and evaluate the best ones only:
+
+    surrogate: "rbf"            # null (no surrogate), "rbf" or "gp"
+    surrogate_candidates: 4     # candidates generated per evaluated offspring
+    surrogate_fraction: 0.5     # evaluations kept, fraction of the offspring of a generation / subproblem
+    surrogate_points: 500       # size of the training archive
+    surrogate_refit: 1          # new points between two fits (MOEA/D predicts per subproblem, 20 by default)
+"""
+import numpy
+
+from sorting import crowding_distances, nondominated_ranks
+
+MODELS = ("rbf", "gp")
+
+
+def _squared_distances(A, B):
+    d2 = (A ** 2).sum(axis=1)[:, numpy.newaxis] + (B ** 2).sum(axis=1) - 2.0 * A.dot(B.T)
+    return numpy.maximum(d2, 0.0)
+
+
+class Surrogate(object):
+
+    def __init__(self, low, up, model="rbf", max_points=500, refit=1):
+        """
+        low, up    : bounds of the decision variables
+        model      : one of MODELS
+        max_points : number of evaluated points kept to fit the model, the most recent ones
+        refit      : number of new points from which the model is fitted again
+        """
+        if model not in MODELS:
+            print("Surrogate: unknown model", model)
+            raise ValueError("model must be one of {}".format(MODELS))
+        self.low = numpy.asarray(low, dtype=float)
+        self.scale = numpy.asarray(up, dtype=float) - self.low
+        self.model = model
+        self.max_points = max_points
+        self.refit = max(1, int(refit))
+        self.X = None
+        self.F = None
+        # points added since the last fit, training set and coefficients of the fitted model
+        self.pending = 0
+        self.fitted = None
+        self.coefficients = None
+
+    def add(self, X, F):
+        """
+        Adds evaluated points (rows of X and F) to the archive, the points already there (within 1e-6
+        in the scaled space) are skipped.
+        """
+        X = (numpy.asarray(X, dtype=float).reshape(len(F), -1) - self.low) / self.scale
+        F = numpy.asarray(F, dtype=float).reshape(len(X), -1)
+        X, first = numpy.unique(X, axis=0, return_index=True)
+        F = F[first]
+        if self.X is not None:
+            known = (_squared_distances(X, self.X) < 1e-12).any(axis=1)
+            X = numpy.vstack([self.X, X[~known]])
+            F = numpy.vstack([self.F, F[~known]])
+        self.pending += len(X) - (0 if self.X is None else len(self.X))
+        self.X = X[-self.max_points:]
+        self.F = F[-self.max_points:]
+
+    @property
+    def ready(self):
+        """Enough points to fit the model (more than the linear tail of the RBF)."""
+        return self.X is not None and len(self.X) > self.X.shape[1] + 1
+
+    def fit(self, X, F):
+        self.fitted = (X, F)
+        mean, std = F.mean(axis=0), F.std(axis=0)
+        std[std == 0.0] = 1.0
+        Y = (F - mean) / std
+        n, d = X.shape
+        if self.model == "rbf":
+            A = numpy.zeros((n + d + 1, n + d + 1))
+            A[:n, :n] = _squared_distances(X, X) ** 1.5
+            A[:n, n:] = numpy.column_stack([numpy.ones(n), X])
+            A[n:, :n] = A[:n, n:].T
+            b = numpy.vstack([Y, numpy.zeros((d + 1, Y.shape[1]))])
+        else:
+            d2 = _squared_distances(X, X)
+            self.length = numpy.sqrt(numpy.median(d2[numpy.triu_indices(n, 1)])) or 1.0
+            A = numpy.exp(-d2 / (2.0 * self.length ** 2)) + 1e-8 * numpy.eye(n)
+            b = Y
+        try:
+            weights = numpy.linalg.solve(A, b)
+        except numpy.linalg.LinAlgError:
+            weights = numpy.linalg.lstsq(A, b, rcond=None)[0]
+        self.coefficients = (weights, mean, std)
+        self.pending = 0
+
+    def predict(self, X):
+        """Predicted objectives of the rows of X (decision variables)."""
+        if self.coefficients is None or self.pending >= self.refit:
+            self.fit(self.X, self.F)
+        X = (numpy.asarray(X, dtype=float).reshape(-1, len(self.low)) - self.low) / self.scale
+        train, _ = self.fitted
+        weights, mean, std = self.coefficients
+        d2 = _squared_distances(X, train)
+        if self.model == "rbf":
+            Y = (d2 ** 1.5).dot(weights[:len(train)]) + weights[len(train)] + X.dot(weights[len(train) + 1:])
+        else:
+            Y = numpy.exp(-d2 / (2.0 * self.length ** 2)).dot(weights)
+        return Y * std + mean
+
+    def screen(self, X, F, k):
+        """
+        Indexes of the k rows of X (candidates) predicted best: lowest front index among the candidates
+        and the population of objectives F, then largest crowding distance in the front.
+        """
+        if k >= len(X):
+            return numpy.arange(len(X))
+        predicted = self.predict(X)
+        ranks = nondominated_ranks(-numpy.vstack([predicted, F]))[:len(X)]
+        crowding = numpy.empty(len(X))
+        for rank in numpy.unique(ranks):
+            front = numpy.flatnonzero(ranks == rank)
+            crowding[front] = crowding_distances(predicted[front])
+        return numpy.lexsort((-crowding, ranks))[:k]
+
+    def getstate(self):
+        return {"X": self.X, "F": self.F, "pending": self.pending, "fitted": self.fitted}
+
+    def setstate(self, state):
+        self.X, self.F = state["X"], state["F"]
+        self.coefficients = None
+        if state["fitted"] is not None:
+            self.fit(*state["fitted"])
+        self.pending = state["pending"]
+
+
+def surrogate_from_config(cfg, problem, refit=1):
+    """Surrogate of the `surrogate` model of a config, None without it. refit is the default of surrogate_refit."""
+    if not cfg.get('surrogate'):
+        return None
+    return Surrogate(problem.low, problem.up, cfg['surrogate'], cfg.get('surrogate_points', 500),
+                     cfg.get('surrogate_refit', refit))
+
+
+def screened_size(cfg, size):
+    """Number of offspring evaluated out of size with the surrogate of cfg (at least one)."""
+    return max(1, int(round(cfg.get('surrogate_fraction', 0.5) * size)))
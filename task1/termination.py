@@ -0,0 +1,192 @@
+"""
+Early termination of the loops of the drivers, checked at the end of every generation (every sweep
+for MOEA/D) on top of their fixed budget (n_gen):
+
+    termination = termination_from_config(cfg)        # None when no criterion is set
+    for gen in ...:
+        ...
+        if termination is not None and termination.update(gen, evals, hv, F):
+            break
+    termination.reason, termination.message           # e.g. "hv", "hypervolume improved by ..."
+
+The criteria and their config keys (a window of 0 or a null budget disables a criterion):
+
+    hv        hv_window, hv_tolerance        relative hypervolume improvement over the last hv_window
+                                             generations below hv_tolerance
+    points    point_window, point_tolerance  largest move of the ideal and nadir points of the
+                                             non-dominated front over point_window generations, relative
+                                             to the extent of the front, below point_tolerance
+    front     front_window, front_tolerance  distance between the non-dominated front and the one of
+                                             front_window generations before (symmetric IGD on the
+                                             normalized fronts) below front_tolerance
+    time      max_time                       wall-clock seconds of the loop
+    evals     max_evaluations                number of evaluations, exact: the drivers only evaluate the
+                                             offspring within the budget (remaining) in the last
+                                             generation (sweep), the others are dropped
+
+The first criterion met stops the run, a run reaching its budget has no reason (the drivers report
+"budget"). The state of the criteria is saved with getstate in the checkpoints, a resumed run keeps
+its histories and its elapsed time.
+"""
+import time
+from collections import deque
+
+import numpy
+
+from indicators import igd
+from sorting import nondominated_ranks
+
+# config keys of the criteria, ignored by the island model (an island stopping alone would keep the
+# others waiting for its migrants)
+TERMINATION_KEYS = ("hv_window", "hv_tolerance", "point_window", "point_tolerance", "front_window",
+                    "front_tolerance", "max_time", "max_evaluations")
+
+
+class _Window(object):
+    """Criterion comparing the current generation with the one `window` generations before."""
+
+    def __init__(self, window, tolerance):
+        self.window = int(window)
+        self.tolerance = tolerance
+        self.history = deque(maxlen=self.window + 1)
+
+    def update(self, value):
+        """Adds the value of the generation, returns the message of the criterion if it is met."""
+        self.history.append(value)
+        if len(self.history) <= self.window:
+            return None
+        return self.check(self.history[0], value)
+
+    def getstate(self):
+        return list(self.history)
+
+    def setstate(self, state):
+        self.history.clear()
+        self.history.extend(state)
+
+
+class HypervolumeWindow(_Window):
+    name = "hv"
+    needs = "hv"
+
+    def check(self, old, new):
+        improvement = (new - old) / max(abs(old), numpy.finfo(float).tiny)
+        if improvement < self.tolerance:
+            return "hypervolume improved by {:.3g} over {} generations (tolerance {:g})".format(
+                improvement, self.window, self.tolerance)
+        return None
+
+
+class PointMovement(_Window):
+    name = "points"
+    needs = "front"
+
+    def update(self, front):
+        return _Window.update(self, numpy.vstack([front.min(axis=0), front.max(axis=0)]))
+
+    def check(self, old, new):
+        extent = numpy.maximum(new[1] - new[0], numpy.finfo(float).eps)
+        movement = float(numpy.max(numpy.abs(new - old) / extent))
+        if movement < self.tolerance:
+            return "ideal and nadir points moved by {:.3g} over {} generations (tolerance {:g})".format(
+                movement, self.window, self.tolerance)
+        return None
+
+
+class FrontChange(_Window):
+    name = "front"
+    needs = "front"
+
+    def check(self, old, new):
+        low = new.min(axis=0)
+        extent = numpy.maximum(new.max(axis=0) - low, numpy.finfo(float).eps)
+        old = (old - low) / extent
+        new = (new - low) / extent
+        change = max(igd(old, new), igd(new, old))
+        if change < self.tolerance:
+            return "front changed by {:.3g} over {} generations (tolerance {:g})".format(
+                change, self.window, self.tolerance)
+        return None
+
+
+class Termination(object):
+
+    def __init__(self, criteria=(), max_time=None, max_evaluations=None):
+        """
+        criteria        : window criteria (HypervolumeWindow, PointMovement, FrontChange)
+        max_time        : wall-clock budget of the loop in seconds
+        max_evaluations : evaluation budget
+        """
+        self.criteria = list(criteria)
+        self.max_time = max_time
+        self.max_evaluations = max_evaluations
+        # wall time of the previous runs of a resumed loop
+        self.elapsed = 0.0
+        self.started = time.perf_counter()
+        self.reason = None
+        self.message = None
+        self.gen = None
+
+    def update(self, gen, evals, hv, F):
+        """
+        Adds the generation gen (evaluations so far, hypervolume of the population and its objectives F,
+        minimized) to the criteria. Returns True when one of them is met, with its reason and message.
+        """
+        front = None
+        if any(criterion.needs == "front" for criterion in self.criteria):
+            F = numpy.asarray(F, dtype=float)
+            front = F[nondominated_ranks(-F) == 0]
+        for criterion in self.criteria:
+            message = criterion.update(hv if criterion.needs == "hv" else front)
+            if message is not None and self.reason is None:
+                self.stop(gen, criterion.name, message)
+
+        if self.reason is None and self.max_evaluations is not None and evals >= self.max_evaluations:
+            self.stop(gen, "evals", "{} evaluations (budget {})".format(evals, self.max_evaluations))
+        if self.reason is None and self.max_time is not None and self.time() >= self.max_time:
+            self.stop(gen, "time", "{:.1f}s of wall time (budget {}s)".format(self.time(), self.max_time))
+        return self.reason is not None
+
+    def remaining(self, evals):
+        """Evaluations left in the max_evaluations budget after evals, None without it."""
+        if self.max_evaluations is None:
+            return None
+        return max(0, self.max_evaluations - evals)
+
+    def stop(self, gen, reason, message):
+        self.gen = gen
+        self.reason = reason
+        self.message = message
+
+    def time(self):
+        return self.elapsed + time.perf_counter() - self.started
+
+    def getstate(self):
+        return {"elapsed": self.time(), "criteria": [criterion.getstate() for criterion in self.criteria]}
+
+    def setstate(self, state):
+        self.elapsed = state["elapsed"]
+        self.started = time.perf_counter()
+        for criterion, history in zip(self.criteria, state["criteria"]):
+            criterion.setstate(history)
+
+
+def termination_from_config(cfg):
+    """Termination of the criteria set in cfg (see the module docstring), None without any."""
+    criteria = []
+    if cfg.get('hv_window'):
+        criteria.append(HypervolumeWindow(cfg['hv_window'], cfg.get('hv_tolerance', 1e-4)))
+    if cfg.get('point_window'):
+        criteria.append(PointMovement(cfg['point_window'], cfg.get('point_tolerance', 1e-3)))
+    if cfg.get('front_window'):
+        criteria.append(FrontChange(cfg['front_window'], cfg.get('front_tolerance', 1e-3)))
+    if not criteria and cfg.get('max_time') is None and cfg.get('max_evaluations') is None:
+        return None
+    return Termination(criteria, cfg.get('max_time'), cfg.get('max_evaluations'))
+
+
+def stop_reason(termination):
+    """Reason reported for a run: the criterion that stopped it, "budget" when it ran to its end."""
+    if termination is None or termination.reason is None:
+        return "budget"
+    return termination.reason
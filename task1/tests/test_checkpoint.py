@@ -0,0 +1,46 @@
+"""
+A run resumed from a checkpoint follows the same trajectory as the run done at once.
+
+    python -m pytest task1/tests
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from runner import ALGORITHMS, load_config
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CONFIGS = {"NSGA2": dict(pop_size=20, n_gen=8),
+           "NSGA3": dict(pop_size=20, ref_p=5, n_gen=8),
+           "MOEAD": dict(pop_size=21, T=5, n_gen=16)}
+# generation (sweep for MOEA/D) of the checkpoint, and the shorter budget of the interrupted run
+EVERY = 4
+INTERRUPTED = {"NSGA2": 6, "NSGA3": 6, "MOEAD": 12}
+
+
+def config(name, **kargs):
+    cfg = load_config(os.path.join(ROOT, name, "base_{}.yaml".format(name.lower())))
+    cfg.update(CONFIGS[name], NDIM=6, **kargs)
+    return cfg
+
+
+def trajectory(logbook):
+    return [(record['gen'], record['evals'], record['hv']) for record in logbook]
+
+
+@pytest.mark.parametrize("name, options", [("NSGA2", dict(population="list")),
+                                           ("NSGA2", dict(population="array")),
+                                           ("NSGA3", dict()),
+                                           ("MOEAD", dict()),
+                                           ("MOEAD", dict(sampler="python"))])
+def test_resume(tmp_path, name, options):
+    run = ALGORITHMS[name]
+    _, expected = run(config(name, **options), 1, False)
+
+    path = str(tmp_path / "run.npz")
+    run(config(name, checkpoint=path, checkpoint_every=EVERY, n_gen=INTERRUPTED[name], **options), 1, False)
+    # another seed: only the restored state can give the same trajectory
+    _, resumed = run(config(name, checkpoint=path, checkpoint_every=EVERY, resume=True, **options), 2, False)
+    assert trajectory(resumed) == trajectory(expected)
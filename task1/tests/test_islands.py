@@ -0,0 +1,57 @@
+"""
+Island model: a failing island stops the whole run (no island left waiting for its migrants).
+
+    python -m pytest task1/tests
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import islands
+from runner import load_config
+
+CONFIG = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "NSGA2", "base_nsga2.yaml")
+SEED = 10
+
+
+def config():
+    cfg = load_config(CONFIG)
+    cfg.update(n_gen=6, pop_size=12, NDIM=5)
+    return cfg
+
+
+def failing(index, how):
+    """
+    NSGA2 driver whose island index fails at its start (how: "raise" or "exit"), the other islands
+    waiting for its migrants at their first migration.
+    """
+    run = islands.ALGORITHMS["NSGA2"]
+
+    def driver(cfg, seed, verbose, migration=None):
+        if seed == SEED + index:
+            if how == "raise":
+                raise ValueError("island failure")
+            os._exit(3)
+        return run(cfg, seed, verbose, migration=migration)
+    return driver
+
+
+def test_islands():
+    front, logbook = islands.run_islands(config(), SEED, False, islands=3, interval=2, migrants=2)
+    assert len(front) > 0
+    assert len(logbook) == 6
+
+
+@pytest.mark.parametrize("topology", ["ring", "full"])
+def test_failing_island_raises(monkeypatch, topology):
+    monkeypatch.setitem(islands.ALGORITHMS, "NSGA2", failing(1, "raise"))
+    with pytest.raises(ValueError, match="island failure"):
+        islands.run_islands(config(), SEED, False, islands=3, topology=topology, interval=2)
+
+
+def test_killed_island_raises(monkeypatch):
+    monkeypatch.setitem(islands.ALGORITHMS, "NSGA2", failing(0, "exit"))
+    with pytest.raises(RuntimeError, match="exited with code 3"):
+        islands.run_islands(config(), SEED, False, islands=3, interval=2)
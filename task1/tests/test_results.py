@@ -0,0 +1,59 @@
+"""
+ResultWriter / ResultReader round trip, and the resume of a writer killed in the middle of a row.
+
+    python -m pytest task1/tests
+"""
+import os
+import sys
+
+import numpy
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from results import ResultReader, ResultWriter
+
+N_VAR = 3
+N_OBJ = 2
+
+
+def generation(rng, n=8):
+    return rng.rand(n, N_VAR), rng.rand(n, N_OBJ)
+
+
+def test_round_trip(tmp_path):
+    rng = numpy.random.RandomState(1)
+    written = {gen: generation(rng) for gen in range(3)}
+    writer = ResultWriter(str(tmp_path), N_VAR, N_OBJ)
+    for gen, (X, F) in written.items():
+        writer.write(gen, X, F, {"evals": 8 * (gen + 1)})
+    writer.close()
+
+    reader = ResultReader(str(tmp_path))
+    assert reader.generations() == [0, 1, 2]
+    for gen, (X, F) in written.items():
+        X_read, F_read, rank = reader.generation(gen)
+        numpy.testing.assert_array_equal(X_read, X)
+        numpy.testing.assert_array_equal(F_read, F)
+        assert (rank >= 0).all() and (rank == 0).any()
+    assert [record["evals"] for record in reader.logbook()] == [8, 16, 24]
+
+
+def test_resume_after_partial_row(tmp_path):
+    rng = numpy.random.RandomState(2)
+    X0, F0 = generation(rng)
+    writer = ResultWriter(str(tmp_path), N_VAR, N_OBJ)
+    writer.write(0, X0, F0)
+    # killed while writing generation 1: its gen column only
+    writer.files["gen"].write(numpy.full(8, 1, dtype=numpy.int32).tobytes())
+    writer.close()
+    assert ResultReader(str(tmp_path)).generations() == [0]
+
+    X2, F2 = generation(rng)
+    writer = ResultWriter(str(tmp_path), N_VAR, N_OBJ, append=True)
+    writer.write(2, X2, F2)
+    writer.close()
+
+    reader = ResultReader(str(tmp_path))
+    assert reader.generations() == [0, 2]
+    numpy.testing.assert_array_equal(reader.generation(0)[1], F0)
+    numpy.testing.assert_array_equal(reader.generation(2)[0], X2)
+    numpy.testing.assert_array_equal(reader.generation(2)[1], F2)
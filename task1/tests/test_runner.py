@@ -0,0 +1,43 @@
+"""
+Grid of configs x seeds: every run writes its own checkpoint, trace and results.
+
+    python -m pytest task1/tests
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from runner import load_config, run_grid
+
+CONFIG = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "NSGA2", "base_nsga2.yaml")
+
+
+def config(tmp_path, name="run"):
+    cfg = load_config(CONFIG)
+    cfg.update(n_gen=3, pop_size=12, NDIM=5, checkpoint=str(tmp_path / (name + ".pkl")), checkpoint_every=1,
+               trace=str(tmp_path / (name + ".jsonl")), results=str(tmp_path / name))
+    return cfg
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_paths_by_seed(tmp_path, workers):
+    results = list(run_grid([config(tmp_path)], seeds=[1, 2], workers=workers))
+    assert sorted(result['seed'] for result in results) == [1, 2]
+    assert sorted(os.listdir(str(tmp_path))) == ["run_seed1", "run_seed1.jsonl", "run_seed1.pkl",
+                                                 "run_seed2", "run_seed2.jsonl", "run_seed2.pkl"]
+
+
+def test_single_seed_keeps_paths(tmp_path):
+    list(run_grid([config(tmp_path)], seeds=[1], workers=1))
+    assert sorted(os.listdir(str(tmp_path))) == ["run", "run.jsonl", "run.pkl"]
+
+
+def test_shared_path_refused(tmp_path):
+    with pytest.raises(ValueError):
+        list(run_grid([config(tmp_path), config(tmp_path)], workers=1))
+    other = dict(config(tmp_path, "other"), trace=str(tmp_path / "run.jsonl"))
+    with pytest.raises(ValueError):
+        list(run_grid([config(tmp_path), other], seeds=[1, 2], workers=1))
+    assert os.listdir(str(tmp_path)) == []
@@ -0,0 +1,71 @@
+"""
+NSGA2Selector against deap's selNSGA2 on populations with ties (duplicate fitnesses, equal crowding
+distances, infinite distances of the boundary points).
+
+    python -m pytest task1/tests
+"""
+import copy
+import os
+import random
+import sys
+
+import numpy
+import pytest
+from deap import tools
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from population import ArrayPopulation
+from problems import individual_class
+from sorting import NSGA2Selector, sel_nsga2
+
+TRIALS = 100
+
+
+def population(rng, n, n_obj, integer):
+    Individual = individual_class(n_obj)
+    F = rng.randint(0, 5, size=(n, n_obj)).astype(float) if integer else rng.rand(n, n_obj)
+    if not integer:
+        # duplicated fitnesses
+        F[rng.randint(n, size=n // 4)] = F[rng.randint(n, size=n // 4)]
+    pop = []
+    for i, f in enumerate(F):
+        ind = Individual([float(i)])
+        ind.fitness.values = tuple(f)
+        pop.append(ind)
+    return pop
+
+
+@pytest.mark.parametrize("integer", [False, True])
+@pytest.mark.parametrize("n_obj", [2, 3])
+def test_select_as_sel_nsga2(integer, n_obj):
+    rng = numpy.random.RandomState(2022)
+    for _ in range(TRIALS):
+        pop = population(rng, 40, n_obj, integer)
+        k = rng.randint(1, len(pop))
+        expected = tools.selNSGA2(copy.deepcopy(pop), k)
+        chosen = NSGA2Selector().select(pop, k)
+        assert [ind[0] for ind in chosen] == [ind[0] for ind in expected]
+        assert [ind.fitness.crowding_dist for ind in chosen] == [ind.fitness.crowding_dist for ind in expected]
+        assert [ind[0] for ind in sel_nsga2(copy.deepcopy(pop), k)] == [ind[0] for ind in expected]
+
+
+@pytest.mark.parametrize("integer", [False, True])
+def test_select_array_population(integer):
+    rng = numpy.random.RandomState(7)
+    for _ in range(TRIALS):
+        pop = population(rng, 40, 2, integer)
+        k = rng.randint(1, len(pop))
+        expected = tools.selNSGA2(copy.deepcopy(pop), k)
+        chosen = NSGA2Selector().select(ArrayPopulation.from_individuals(pop), k)
+        assert chosen.X[:, 0].tolist() == [ind[0] for ind in expected]
+
+
+def test_select_mates_from_survivors():
+    random.seed(1)
+    rng = numpy.random.RandomState(3)
+    pop = population(rng, 40, 2, True)
+    selector = NSGA2Selector(tournsize=2, rng=rng)
+    survivors = selector.select(pop, 20)
+    mates = selector.select_mates(survivors, 20)
+    assert len(mates) == 20
+    assert all(any(mate is ind for ind in survivors) for mate in mates)
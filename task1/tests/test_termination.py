@@ -0,0 +1,49 @@
+"""
+The max_evaluations budget is exact in every driver, the last generation (sweep) is cut to the
+evaluations left.
+
+    python -m pytest task1/tests
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from runner import load_config, run_config
+from termination import Termination
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CONFIGS = {"NSGA2": dict(pop_size=20),
+           "NSGA3": dict(pop_size=20, ref_p=5),
+           "MOEAD": dict(pop_size=21, T=5)}
+BUDGET = 97
+
+
+def config(name, **kargs):
+    cfg = load_config(os.path.join(ROOT, name, "base_{}.yaml".format(name.lower())))
+    cfg.update(CONFIGS[name], n_gen=50, NDIM=6, max_evaluations=BUDGET, **kargs)
+    return cfg
+
+
+def test_remaining():
+    termination = Termination(max_evaluations=10)
+    assert termination.remaining(4) == 6
+    assert termination.remaining(12) == 0
+    assert Termination().remaining(4) is None
+
+
+@pytest.mark.parametrize("population", ["list", "array"])
+@pytest.mark.parametrize("name", ["NSGA2", "NSGA3"])
+def test_nsga_budget(name, population):
+    result = run_config(config(name, population=population), seed=1)
+    assert result['evaluations'] == BUDGET
+    assert result['stop_reason'] == "evals"
+
+
+@pytest.mark.parametrize("options", [dict(), dict(batch_size=4),
+                                     dict(in_flight=3, evaluator="thread", workers=2)])
+def test_moead_budget(options):
+    result = run_config(config("MOEAD", **options), seed=1)
+    assert result['evaluations'] == BUDGET
+    assert result['stop_reason'] == "evals"
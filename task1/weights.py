@@ -0,0 +1,302 @@
+"""
+Weight vector sets for the decomposition based algorithms (MOEA/D).
+
+A weight set is stored one vector per row, either as a whitespace separated text file
+(like MOEAD/test.csv or the jMetal "W3D_100.dat" files) or as a .npy file, which is memory-mapped.
+Files are read once per process and kept in an LRU cache.
+
+New sets are generated with one of METHODS, all returning exactly the requested number of vectors:
+
+- "sample": random sample of the smallest simplex-lattice holding more vectors (legacy MOEA/D)
+- "lattice": Das-Dennis simplex-lattice, thinned to the size by a greedy max-min distance selection
+- "two_layer": boundary lattice plus an inner lattice shrunk towards the centre (Deb & Jain, NSGA-III),
+  for many objectives where a single lattice of the size only has vectors on the boundary
+- "uniform_design": Hammersley points of the unit hypercube mapped uniformly onto the simplex
+  (uniform design, Tan et al., MOEA/D-UD)
+- "energy": greedy Riesz s-energy selection among random points of the simplex
+- "auto": "lattice" while the lattice of the size has inner vectors, "two_layer" otherwise
+
+Writing a new set:
+    python weights.py 5 1820 weights --method lattice
+"""
+import argparse
+import functools
+import itertools
+import math
+import os
+import random
+
+import numpy
+from deap.tools.emo import uniform_reference_points
+
+
+def weights_path(directory, n_obj, size):
+    """Path of the weight set of `size` vectors with `n_obj` objectives in `directory` (jMetal naming)."""
+    return os.path.join(directory, "W{}D_{}.dat".format(n_obj, size))
+
+
+@functools.lru_cache(maxsize=32)
+def _read_weights(path, mtime):
+    if path.endswith(".npy"):
+        return numpy.load(path, mmap_mode="r")
+    weights = numpy.loadtxt(path, ndmin=2)
+    # the array is shared by every caller through the cache
+    weights.setflags(write=False)
+    return weights
+
+
+def load_weights(path):
+    """
+    Returns the (read-only) weight set stored in `path`. A file is only parsed again when it has been
+    modified since it was last loaded.
+    """
+    path = os.path.abspath(path)
+    return _read_weights(path, os.path.getmtime(path))
+
+
+def save_weights(path, weights):
+    """Writes a weight set in the format read by load_weights."""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    if path.endswith(".npy"):
+        numpy.save(path, numpy.asarray(weights, dtype=float))
+    else:
+        numpy.savetxt(path, numpy.asarray(weights, dtype=float))
+
+
+def sample_weights(n_obj, size, p):
+    """
+    Samples `size` vectors of the simplex-lattice with `p` divisions (as done by MOEAD.initUniformWeight).
+    Uses the global random module, like the rest of the algorithms.
+    """
+    all_weights = uniform_reference_points(n_obj, p)
+    weights = sorted((list(x) for x in all_weights), key=lambda x: sum(x), reverse=True)
+    return random.sample(weights, size)
+
+
+def lattice_size(n_obj, p):
+    """Number of vectors of the simplex-lattice with `p` divisions, C(p + n_obj - 1, n_obj - 1)."""
+    return math.comb(p + n_obj - 1, n_obj - 1)
+
+
+def lattice_divisions(n_obj, size):
+    """Smallest number of divisions p whose simplex-lattice has more than `size` vectors."""
+    if n_obj < 2:
+        return 1
+    # lattice_size(n_obj, p) ~ (p + n_obj / 2) ** (n_obj - 1) / (n_obj - 1)!, then a few exact steps
+    p = max(1, int((math.factorial(n_obj - 1) * (size + 1)) ** (1.0 / (n_obj - 1)) - n_obj / 2.0))
+    while p > 1 and lattice_size(n_obj, p - 1) > size:
+        p -= 1
+    while lattice_size(n_obj, p) <= size:
+        p += 1
+    return p
+
+
+def das_dennis(n_obj, p):
+    """
+    The lattice_size(n_obj, p) vectors of the simplex-lattice with `p` divisions (components multiple
+    of 1 / p summing to 1), one per row. Same set as deap's uniform_reference_points, in another order.
+    """
+    if n_obj == 1:
+        return numpy.ones((1, 1))
+    # stars and bars: the positions of the n_obj - 1 bars among p + n_obj - 1 slots
+    bars = numpy.fromiter(itertools.chain.from_iterable(itertools.combinations(range(p + n_obj - 1), n_obj - 1)),
+                          dtype=numpy.int64).reshape(-1, n_obj - 1)
+    n = len(bars)
+    edges = numpy.hstack([numpy.full((n, 1), -1), bars, numpy.full((n, 1), p + n_obj - 1)])
+    return (numpy.diff(edges, axis=1) - 1) / float(p)
+
+
+def two_layer_divisions(n_obj, size):
+    """
+    Divisions (p_boundary, p_inner) of the smallest two-layer set with at least `size` vectors: the
+    boundary lattice with at most `size` vectors, completed by the inner one (p_inner <= p_boundary).
+    """
+    p_boundary = max(1, lattice_divisions(n_obj, size) - 1)
+    missing = size - lattice_size(n_obj, p_boundary)
+    if missing <= 0:
+        return p_boundary, 0
+    p_inner = lattice_divisions(n_obj, missing - 1)
+    if p_inner > p_boundary:
+        return p_boundary + 1, 0
+    return p_boundary, p_inner
+
+
+def two_layer(n_obj, p_boundary, p_inner, scale=0.5):
+    """
+    Boundary lattice and inner lattice scaled by `scale` around the centre of the simplex, without the
+    inner vectors falling on boundary ones.
+    """
+    weights = das_dennis(n_obj, p_boundary)
+    if p_inner > 0:
+        inner = das_dennis(n_obj, p_inner) * scale + (1.0 - scale) / n_obj
+        weights = numpy.vstack([weights, inner])
+        _, first = numpy.unique(numpy.round(weights, 9), axis=0, return_index=True)
+        weights = weights[numpy.sort(first)]
+    return weights
+
+
+def _corners(weights):
+    return numpy.flatnonzero(numpy.isclose(weights.max(axis=1), 1.0))
+
+
+def spread_subset(candidates, size, first=()):
+    """
+    `size` rows of candidates chosen greedily, each one the farthest from the rows already chosen
+    (starting with the rows `first`). The rows keep their order in candidates.
+    """
+    if size >= len(candidates):
+        return candidates
+    chosen = numpy.zeros(len(candidates), dtype=bool)
+    distance = numpy.full(len(candidates), numpy.inf)
+    first = list(first)[:size] or [0]
+    for i in first:
+        chosen[i] = True
+        numpy.minimum(distance, numpy.linalg.norm(candidates - candidates[i], axis=1), out=distance)
+    for _ in range(size - len(first)):
+        distance[chosen] = -1.0
+        i = int(numpy.argmax(distance))
+        chosen[i] = True
+        numpy.minimum(distance, numpy.linalg.norm(candidates - candidates[i], axis=1), out=distance)
+    return candidates[chosen]
+
+
+def lattice_weights(n_obj, size):
+    """Smallest simplex-lattice with at least `size` vectors, thinned to `size` keeping its corners."""
+    weights = das_dennis(n_obj, lattice_divisions(n_obj, size - 1))
+    return spread_subset(weights, size, _corners(weights))
+
+
+def two_layer_weights(n_obj, size, scale=0.5):
+    """Smallest two-layer set with at least `size` vectors, thinned to `size` keeping its corners."""
+    p_boundary, p_inner = two_layer_divisions(n_obj, size)
+    weights = two_layer(n_obj, p_boundary, p_inner, scale)
+    while len(weights) < size:
+        # the inner layer repeated boundary vectors
+        if p_inner < p_boundary:
+            p_inner += 1
+        else:
+            p_boundary, p_inner = p_boundary + 1, 0
+        weights = two_layer(n_obj, p_boundary, p_inner, scale)
+    return spread_subset(weights, size, _corners(weights))
+
+
+def _primes(n):
+    primes = []
+    candidate = 2
+    while len(primes) < n:
+        if all(candidate % q for q in primes if q * q <= candidate):
+            primes.append(candidate)
+        candidate += 1
+    return primes
+
+
+def _radical_inverse(index, base):
+    result = numpy.zeros(len(index))
+    factor = 1.0 / base
+    index = index.copy()
+    while numpy.any(index > 0):
+        index, digit = numpy.divmod(index, base)
+        result += digit * factor
+        factor /= base
+    return result
+
+
+def simplex_map(U):
+    """
+    Maps points of the unit hypercube [0, 1]^(m - 1) (one per row) to the simplex of dimension m,
+    uniformly distributed points going to uniformly distributed weights (Fang & Wang).
+    """
+    n, d = U.shape
+    m = d + 1
+    weights = numpy.empty((n, m))
+    remaining = numpy.ones(n)
+    for k in range(d):
+        root = U[:, k] ** (1.0 / (m - k - 1))
+        weights[:, k] = remaining * (1.0 - root)
+        remaining = remaining * root
+    weights[:, d] = remaining
+    return weights
+
+
+def uniform_design_weights(n_obj, size):
+    """`size` weights of the Hammersley set of [0, 1]^(n_obj - 1), mapped onto the simplex."""
+    index = numpy.arange(size)
+    columns = [(index + 0.5) / size]
+    columns += [_radical_inverse(index + 1, base) for base in _primes(n_obj - 2)]
+    return simplex_map(numpy.column_stack(columns)[:, :n_obj - 1])
+
+
+def energy_weights(n_obj, size, candidates=None, s=None, rng=numpy.random):
+    """
+    `size` weights chosen greedily among `candidates` random points of the simplex (and its corners),
+    each one adding the least Riesz s-energy sum(1 / d ** s) to the weights already chosen.
+    Uses numpy.random by default, seeded by the drivers.
+    """
+    candidates = candidates or max(10 * size, 1000)
+    s = s or max(1, n_obj - 1)
+    points = numpy.vstack([numpy.eye(n_obj), rng.dirichlet(numpy.ones(n_obj), candidates)])
+    if size >= len(points):
+        return points
+    chosen = numpy.zeros(len(points), dtype=bool)
+    energy = numpy.zeros(len(points))
+    for i in range(size):
+        j = i if i < n_obj else int(numpy.argmin(numpy.where(chosen, numpy.inf, energy)))
+        chosen[j] = True
+        distance = numpy.linalg.norm(points - points[j], axis=1)
+        energy += 1.0 / numpy.maximum(distance, 1e-12) ** s
+    return points[chosen]
+
+
+METHODS = ("auto", "sample", "lattice", "two_layer", "uniform_design", "energy")
+
+
+def generate_weights(n_obj, size, method="auto"):
+    """`size` weight vectors with `n_obj` objectives generated with one of METHODS."""
+    if method not in METHODS:
+        print("generate_weights: unknown method", method)
+        raise ValueError("method must be one of {}".format(METHODS))
+    if method == "auto":
+        # a lattice with less divisions than objectives has no inner vector
+        method = "lattice" if lattice_divisions(n_obj, size - 1) >= n_obj else "two_layer"
+    if method == "sample":
+        return sample_weights(n_obj, size, lattice_divisions(n_obj, size))
+    if method == "lattice":
+        return lattice_weights(n_obj, size)
+    if method == "two_layer":
+        return two_layer_weights(n_obj, size)
+    if method == "uniform_design":
+        return uniform_design_weights(n_obj, size)
+    return energy_weights(n_obj, size)
+
+
+def get_weights(n_obj, size, directory=None, save=False, method="auto"):
+    """
+    Returns `size` weight vectors with `n_obj` objectives. The set is loaded from `directory` when a file
+    exists for it, otherwise it is generated with `method` and, with `save`, written there for the next runs.
+    """
+    path = weights_path(directory, n_obj, size) if directory else None
+    if path is not None and os.path.exists(path):
+        return load_weights(path)
+
+    weights = generate_weights(n_obj, size, method)
+    if path is not None and save:
+        save_weights(path, weights)
+    return weights
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a weight set file.")
+    parser.add_argument("n_obj", type=int)
+    parser.add_argument("size", type=int)
+    parser.add_argument("directory", nargs="?", default="weights")
+    parser.add_argument("--method", choices=METHODS, default="auto")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    numpy.random.seed(args.seed)
+    path = weights_path(args.directory, args.n_obj, args.size)
+    save_weights(path, generate_weights(args.n_obj, args.size, args.method))
+    print("Saved", path)